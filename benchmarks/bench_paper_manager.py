@@ -0,0 +1,90 @@
+"""PaperManager 写入吞吐与索引查询延迟基准
+
+用法: python -m benchmarks.bench_paper_manager --rows 1000000
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from src.paper_manager import PaperManager
+
+
+def synthetic_paper(i):
+    return {
+        'id': f'10.1000_bench.{i}',
+        'title': f'Synthetic study {i} of kinase inhibitor response',
+        'authors': [f'Author{i % 997} A', f'Author{i % 991} B'],
+        'year': 1990 + i % 35,
+        'doi': f'10.1000/bench.{i}',
+        'pmid': str(30000000 + i),
+        'pmcid': str(7000000 + i) if i % 3 == 0 else '',
+        'api_source': ('crossref', 'pubmed', 'pmc')[i % 3],
+        'citation_count': i % 500,
+    }
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def time_lookups(label, fn, keys):
+    samples = []
+    for key in keys:
+        start = time.perf_counter()
+        fn(key)
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<28} p50 {statistics.median(samples):8.3f} ms   p99 {percentile(samples, 99):8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch', type=int, default=10_000)
+    parser.add_argument('--single-rows', type=int, default=2_000, help='逐条 add_paper 对照组的行数')
+    parser.add_argument('--lookups', type=int, default=1_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_pm_')
+    try:
+        manager = PaperManager(os.path.join(workdir, 'papers.db'))
+
+        start = time.perf_counter()
+        for i in range(args.single_rows):
+            manager.add_paper(synthetic_paper(args.rows + i), 'crossref')
+        elapsed = time.perf_counter() - start
+        print(f"add_paper (逐条提交)        {args.single_rows / elapsed:12,.0f} 行/秒")
+
+        start = time.perf_counter()
+        for offset in range(0, args.rows, args.batch):
+            manager.add_papers([synthetic_paper(i) for i in range(offset, min(offset + args.batch, args.rows))])
+        elapsed = time.perf_counter() - start
+        print(f"add_papers (批量 {args.batch})    {args.rows / elapsed:12,.0f} 行/秒  共 {args.rows:,} 行 {elapsed:.1f} 秒")
+        # 合成论文的标题只差编号，不应被近似重复检测标记
+        duplicates = manager.db.reader().execute('SELECT COUNT(*) FROM papers WHERE duplicate_of IS NOT NULL').fetchone()[0]
+        print(f"近似重复标记               {duplicates:12,} 篇")
+
+        sample = random.sample(range(args.rows), min(args.lookups, args.rows))
+        time_lookups('get_paper_by_id', lambda i: manager.get_paper_by_id(f'10.1000_bench.{i}'), sample)
+        time_lookups('按 DOI 查找', lambda i: manager.get_paper_by_identifier(doi=f'10.1000/bench.{i}'), sample)
+        time_lookups('按 PMID 查找', lambda i: manager.get_paper_by_identifier(pmid=str(30000000 + i)), sample)
+        time_lookups('按 PMCID 查找', lambda i: manager.get_paper_by_identifier(pmcid=str(7000000 + i)),
+                     [i for i in sample if i % 3 == 0])
+        cursor = manager.db.reader().cursor()
+        time_lookups('api_source 计数',
+                     lambda source: cursor.execute('SELECT COUNT(*) FROM papers WHERE api_source = ?', (source,)).fetchone(),
+                     ['crossref', 'pubmed', 'pmc'] * 3)
+        time_lookups('全文检索 search_library', lambda i: manager.search_library(f'"study {i}" kinase', limit=50),
+                     sample[:200])
+        manager.close()
+        print(f"数据库大小                   {os.path.getsize(os.path.join(workdir, 'papers.db')) / 2 ** 20:12,.1f} MB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""近似重复判定的检查：一组已知应当 / 不应当判为重复的论文对，以及 bench_paper_manager 的合成论文
+
+用法: python -m benchmarks.check_near_duplicates
+判定与预期不符时列出这些论文对并以非零状态退出。
+"""
+import sys
+
+from benchmarks.bench_paper_manager import synthetic_paper
+from src.near_duplicates import NearDuplicateIndex
+
+NSCLC = 'Pembrolizumab versus chemotherapy for previously untreated, PD-L1-positive, advanced NSCLC'
+ABSTRACT = ('Background: Pembrolizumab has shown activity in advanced non-small-cell lung cancer. '
+            'Methods: In this open-label trial, 305 patients with previously untreated advanced NSCLC and PD-L1 '
+            'expression on at least 50% of tumor cells were randomly assigned to pembrolizumab or platinum-based '
+            'chemotherapy. Results: Median progression-free survival was 10.3 months versus 6.0 months.')
+
+# (说明, 论文, 另一篇论文, 是否应判为重复)
+PAIRS = [
+    ('分册编号不同', {'title': f'{NSCLC}: Part 1', 'year': 2016}, {'title': f'{NSCLC}: Part 2', 'year': 2016}, False),
+    ('试验分期不同',
+     {'title': 'A phase II trial of pembrolizumab in patients with advanced melanoma', 'year': 2015},
+     {'title': 'A phase III trial of pembrolizumab in patients with advanced melanoma', 'year': 2015}, False),
+    ('分期不同（有摘要）',
+     {'title': f'A phase II trial of {NSCLC}', 'abstract': ABSTRACT, 'year': 2016},
+     {'title': f'A phase III trial of {NSCLC}', 'abstract': ABSTRACT, 'year': 2016}, False),
+    ('仅标题相同、年份相差较远', {'title': NSCLC, 'year': 2006}, {'title': NSCLC, 'year': 2016}, False),
+    ('大小写和标点不同', {'title': f'{NSCLC}: Part 1', 'year': 2016},
+     {'title': f'{NSCLC.upper()} - part 1.', 'year': 2016}, True),
+    ('罗马数字与阿拉伯数字', {'title': f'{NSCLC}: Part I', 'year': 2016}, {'title': f'{NSCLC}: Part 1', 'year': 2016}, True),
+    ('预印本与正式发表', {'title': NSCLC, 'abstract': ABSTRACT, 'year': 2016},
+     {'title': f'{NSCLC}.', 'abstract': ABSTRACT.replace('Median', 'The median'), 'year': 2017}, True),
+    ('一方没有摘要', {'title': NSCLC, 'abstract': ABSTRACT, 'year': 2016}, {'title': NSCLC, 'year': None}, True),
+    ('合成论文', synthetic_paper(1), synthetic_paper(2), False),
+]
+
+
+def main():
+    index = NearDuplicateIndex(db=None)
+    failures = [(label, paper['title'], other['title'], expected)
+                for label, paper, other, expected in PAIRS if index.is_duplicate(paper, other) != expected]
+    # bench_paper_manager 的合成论文标题只差编号，互相之间都不应判为重复
+    papers = [synthetic_paper(i) for i in range(200)]
+    synthetic = sum(index.is_duplicate(paper, other) for i, paper in enumerate(papers) for other in papers[i + 1:])
+    print(f"论文对                  {len(PAIRS) - len(failures)}/{len(PAIRS)} 符合预期")
+    print(f"合成论文误判            {synthetic} 对（{len(papers)} 篇）")
+    for label, title, other_title, expected in failures:
+        print(f"  {label}: 预期{'重复' if expected else '不重复'}\n    {title}\n    {other_title}")
+    return 1 if failures or synthetic else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""检索 → 入库 → 下载 → 分析 全流程负载测试
+
+生成指定规模的合成论文，批量写入 PaperManager；再为每篇论文提交下载任务（下载后自动提交初筛 + 分析任务），
+由进程内的多个 Worker 线程从任务队列执行。下载走 PaperSearcher.download_pdf，文件来自本地 HTTP 服务提供的
+合成 PDF；AI分析走 AIProcessor + LLMClient，模型由 MockGeneration 模拟（可设延迟和错误率）。
+
+报告各阶段吞吐、任务排队延迟、内存峰值和数据库增长；--json 保存结果，--baseline 与之前的结果比较，
+吞吐下降或内存 / 数据库增长超过 --tolerance 时以非零状态退出。
+
+用法: python -m benchmarks.load_test --papers 2000 --workers 8 --llm-latency 0.05 --llm-error-rate 0.02
+"""
+import argparse
+import functools
+import json
+import logging
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.bench_paper_manager import percentile, synthetic_paper
+from src.ai_processor import AIProcessor
+from src.job_queue import JobQueue
+from src.llm_client import CircuitBreaker, LLMClient
+from src.mock_services import MockGeneration
+from src.paper_manager import PaperManager
+from src.paper_searcher import PaperSearcher
+from src.worker import Worker
+
+# 越大越好的指标；其余指标（内存、数据库大小、延迟）越小越好
+HIGHER_IS_BETTER = ('throughput',)
+
+
+def make_pdf(path, pages, lines_per_page=40):
+    """写一个每页带若干行文本的最小 PDF（Helvetica），PyPDF2 可以正常提取文本"""
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None,
+               '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for page in range(pages):
+        lines = ''.join(f'(Page {page + 1} line {line}: kinase inhibitor response in synthetic cohort) Tj T* '
+                        for line in range(lines_per_page))
+        stream = f'BT /F1 9 Tf 12 TL 36 800 Td {lines}ET'
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+                       f'/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>')
+        kids.append(f'{len(objects)} 0 R')
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+    body = b'%PDF-1.4\n'
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(body))
+        body += f'{number} 0 obj\n{obj}\nendobj\n'.encode('latin-1')
+    xref = len(body)
+    body += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('latin-1')
+    body += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode('latin-1')
+    body += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode('latin-1')
+    with open(path, 'wb') as f:
+        f.write(body)
+
+
+class _QuietFileHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureSearcher(PaperSearcher):
+    """下载时从本地服务取合成 PDF，其余行为与 PaperSearcher 相同"""
+
+    def __init__(self, download_dir, fixture_url, fixtures):
+        super().__init__(download_dir)
+        self.fixture_url = fixture_url
+        self.fixtures = fixtures
+
+    def download_or_get_abstract(self, paper, api_source):
+        fixture = self.fixtures[hash(paper['id']) % len(self.fixtures)]
+        return self.download_pdf(f"{self.fixture_url}/{fixture}", paper['doi'], api_source, paper['id'])
+
+
+class TimedWorker(Worker):
+    """记录每个任务第一次开始执行的时间和执行耗时"""
+
+    def __init__(self, *args, timings=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = timings
+
+    def run_job(self, job):
+        start = time.time()
+        super().run_job(job)
+        self.timings.append((job['id'], job['type'], job['attempts'], start, time.time()))
+
+
+def db_size(path):
+    return sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.exists(path + suffix))
+
+
+def peak_rss_mb():
+    # Linux 上 ru_maxrss 的单位是 KB，macOS 上是字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def summarize(samples):
+    if not samples:
+        return {'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    return {'p50': statistics.median(samples), 'p95': percentile(samples, 95), 'max': max(samples)}
+
+
+def run(args, workdir):
+    fixture_dir = os.path.join(workdir, 'fixtures')
+    download_dir = os.path.join(workdir, 'downloads')
+    os.makedirs(fixture_dir)
+    os.makedirs(download_dir)
+    fixtures = []
+    for i in range(args.fixtures):
+        name = f'fixture_{i}.pdf'
+        make_pdf(os.path.join(fixture_dir, name), args.fixture_pages)
+        fixtures.append(name)
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(_QuietFileHandler, directory=fixture_dir))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    fixture_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+
+    db_path = os.path.join(workdir, 'papers.db')
+    manager = PaperManager(db_path)
+    report = {'papers': args.papers, 'workers': args.workers, 'stages': {}}
+    base_size = db_size(db_path)
+
+    # 阶段一：入库
+    start = time.perf_counter()
+    for offset in range(0, args.papers, args.batch):
+        batch = [synthetic_paper(i) for i in range(offset, min(offset + args.batch, args.papers))]
+        for paper in batch:
+            paper['api_source'] = 'crossref'
+            paper['abstract'] = f"Synthetic abstract {paper['id']}: EGFR kinase inhibitor response in a mouse model."
+        manager.add_papers(batch)
+    elapsed = time.perf_counter() - start
+    persisted_size = db_size(db_path)
+    report['stages']['persist'] = {'seconds': elapsed, 'throughput': args.papers / elapsed,
+                                   'db_growth_mb': (persisted_size - base_size) / 2 ** 20,
+                                   'peak_rss_mb': peak_rss_mb()}
+
+    # 阶段二：下载 + 初筛 + 分析，任务链与界面相同（下载完成后提交分析任务）
+    generation = MockGeneration(args.llm_latency, args.llm_jitter, args.llm_error_rate,
+                                timeout_rate=args.llm_timeout_rate, seed=args.seed)
+    llm = LLMClient(generation=generation, timeout=30, backoff_base=args.retry_base, backoff_max=args.retry_base * 4,
+                    breaker=CircuitBreaker(failure_threshold=0.9, reset_timeout=args.retry_base))
+    ai_processor = AIProcessor('mock', llm=llm)
+    queue = JobQueue(manager.db, retry_base=args.retry_base, retry_max=args.retry_base * 8)
+    cursor = manager.db.reader().cursor()
+    cursor.execute('SELECT id FROM papers')
+    paper_ids = [row[0] for row in cursor.fetchall()]
+    batch = queue.new_batch('loadtest')
+    queue.enqueue_many([{'type': 'download', 'dedupe_key': f'download:{paper_id}',
+                         'payload': {'paper_id': paper_id, 'analyze': True}} for paper_id in paper_ids], batch)
+
+    timings = []
+    stop = threading.Event()
+    threads = []
+    for i in range(args.workers):
+        worker = TimedWorker(manager, f'loadtest-{i}', lease_seconds=120, poll_interval=0.05, timings=timings)
+        worker.queue.retry_base = args.retry_base
+        worker._paper_searcher = FixtureSearcher(download_dir, fixture_url, fixtures)
+        worker._ai_processor = ai_processor
+        threads.append(threading.Thread(target=worker.run, args=(stop,), name=f'loadtest-{i}'))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    deadline = time.time() + args.timeout
+    while time.time() < deadline:
+        progress = queue.batch_progress(batch)
+        if progress['queued'] == 0 and progress['running'] == 0:
+            break
+        time.sleep(0.2)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    httpd.shutdown()
+    httpd.server_close()
+
+    cursor.execute('SELECT id, created_at FROM jobs WHERE batch = ?', (batch,))
+    created = dict(cursor.fetchall())
+    cursor.execute('SELECT type, state, COUNT(*) FROM jobs WHERE batch = ? GROUP BY type, state', (batch,))
+    states = {}
+    for job_type, state, count in cursor.fetchall():
+        states.setdefault(job_type, {})[state] = count
+    first_start = {}
+    for job_id, job_type, attempts, job_start, job_end in timings:
+        first_start.setdefault(job_id, job_start)
+    for job_type in ('download', 'analyze'):
+        runs = [t for t in timings if t[1] == job_type]
+        if not runs:
+            continue
+        span = max(t[4] for t in runs) - min(t[3] for t in runs)
+        done = states.get(job_type, {}).get('done', 0)
+        report['stages'][job_type] = {
+            'jobs': states.get(job_type, {}),
+            'attempts': len(runs),
+            'throughput': done / span if span > 0 else 0.0,
+            'queue_delay_s': summarize([first_start[job_id] - created[job_id]
+                                        for job_id in {t[0] for t in runs} if job_id in created]),
+            'run_time_s': summarize([t[4] - t[3] for t in runs]),
+        }
+    report['stages']['pipeline'] = {'seconds': elapsed, 'throughput': args.papers / elapsed,
+                                    'timed_out': time.time() >= deadline,
+                                    'db_growth_mb': (db_size(db_path) - persisted_size) / 2 ** 20,
+                                    'peak_rss_mb': peak_rss_mb()}
+    report['llm'] = {'calls': generation.calls, 'errors': generation.errors, 'timeouts': generation.timeouts,
+                     'calls_by_model': generation.calls_by_model}
+    report['db_size_mb'] = db_size(db_path) / 2 ** 20
+    report['db_bytes_per_paper'] = db_size(db_path) / max(1, args.papers)
+    report['download_mb'] = sum(os.path.getsize(os.path.join(download_dir, name))
+                                for name in os.listdir(download_dir)) / 2 ** 20
+    manager.close()
+    return report
+
+
+def print_report(report):
+    print(f"论文数 {report['papers']:,}，工作线程 {report['workers']}")
+    stages = report['stages']
+    persist = stages['persist']
+    print(f"入库          {persist['throughput']:10,.0f} 篇/秒   {persist['seconds']:8.2f} 秒   "
+          f"数据库 +{persist['db_growth_mb']:.1f} MB")
+    for job_type in ('download', 'analyze'):
+        stage = stages.get(job_type)
+        if not stage:
+            continue
+        delay, run_time = stage['queue_delay_s'], stage['run_time_s']
+        print(f"{job_type:<12}  {stage['throughput']:10,.1f} 任务/秒   排队 p50 {delay['p50']:.2f}s p95 {delay['p95']:.2f}s "
+              f"max {delay['max']:.2f}s   执行 p50 {run_time['p50'] * 1000:.0f}ms p95 {run_time['p95'] * 1000:.0f}ms   "
+              f"{stage['jobs']}")
+    pipeline = stages['pipeline']
+    print(f"全流程        {pipeline['throughput']:10,.1f} 篇/秒   {pipeline['seconds']:8.2f} 秒"
+          + ('   （超时，未全部完成）' if pipeline['timed_out'] else ''))
+    print(f"内存峰值      {pipeline['peak_rss_mb']:10,.1f} MB")
+    print(f"数据库        {report['db_size_mb']:10,.1f} MB   每篇 {report['db_bytes_per_paper']:,.0f} 字节   "
+          f"下载文件 {report['download_mb']:.1f} MB")
+    llm = report['llm']
+    print(f"模拟模型调用  {llm['calls']:10,}   注入错误 {llm['errors']}   超时 {llm['timeouts']}   {llm['calls_by_model']}")
+
+
+def flatten(report, prefix=''):
+    metrics = {}
+    for key, value in report.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+
+def compare(report, baseline, tolerance):
+    """返回退化的指标列表：吞吐低于基线，或内存、数据库大小、排队延迟高于基线超过 tolerance"""
+    current, previous = flatten(report), flatten(baseline)
+    regressions = []
+    for name, old in previous.items():
+        new = current.get(name)
+        if new is None or old <= 0:
+            continue
+        if not any(key in name for key in ('throughput', 'peak_rss_mb', 'db_size_mb', 'db_bytes_per_paper',
+                                           'queue_delay_s.p95')):
+            continue
+        if any(key in name for key in HIGHER_IS_BETTER):
+            if new < old * (1 - tolerance):
+                regressions.append(f"{name}: {old:.3f} -> {new:.3f}")
+        elif new > old * (1 + tolerance):
+            regressions.append(f"{name}: {old:.3f} -> {new:.3f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--papers', type=int, default=1000)
+    parser.add_argument('--batch', type=int, default=500, help='入库时每批的论文数')
+    parser.add_argument('--workers', type=int, default=8, help='执行任务的线程数')
+    parser.add_argument('--fixtures', type=int, default=20, help='合成 PDF 的数量')
+    parser.add_argument('--fixture-pages', type=int, default=12)
+    parser.add_argument('--llm-latency', type=float, default=0.02, help='模拟模型每次调用的基础延迟（秒）')
+    parser.add_argument('--llm-jitter', type=float, default=0.02)
+    parser.add_argument('--llm-error-rate', type=float, default=0.02)
+    parser.add_argument('--llm-timeout-rate', type=float, default=0.0)
+    parser.add_argument('--retry-base', type=float, default=0.2, help='任务和模型调用重试的基础等待（秒）')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=1800, help='流水线阶段的最长运行时间（秒）')
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    parser.add_argument('--baseline', help='与之前 --json 保存的结果比较')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--keep', action='store_true', help='保留临时目录（数据库、下载文件）')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(threadName)s - %(levelname)s - %(message)s')
+    workdir = tempfile.mkdtemp(prefix='loadtest_')
+    try:
+        report = run(args, workdir)
+    finally:
+        if args.keep:
+            print(f"临时目录: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("性能退化:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("与基线相比没有超出容差的退化")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,15 @@
 import sys
 import logging
+import multiprocessing
 from PyQt6.QtWidgets import QApplication
+from src.log_config import setup_logging
 from src.main_window import MainWindow
 
-def setup_logging():
-    logging.basicConfig(level=logging.INFO,
-                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                        filename='app.log',
-                        filemode='w')
-    console = logging.StreamHandler()
-    console.setLevel(logging.INFO)
-    formatter = logging.Formatter('%(name)-12s: %(levelname)-8s %(message)s')
-    console.setFormatter(formatter)
-    logging.getLogger('').addHandler(console)
-
 if __name__ == "__main__":
-    setup_logging()
+    # 打包后的程序启动工作进程时需要
+    multiprocessing.freeze_support()
+    # 文件和控制台输出在后台线程完成，级别和限流见 src/log_config.py
+    setup_logging(log_file='app.log')
     logging.info("Starting application")
     
     try:
@@ -1,103 +1,204 @@
 import dashscope
-from dashscope import Generation
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 import os
+import re
+import json
+from .llm_client import LLMClient, LLMError, CircuitOpenError
+from .pdf_text import PDFTextError, extract_text, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+STUDY_TYPES = ('basic', 'translational', 'clinical')
+
+TRIAGE_PROMPT = """你是一个生物医药领域的投资经理。下面是若干篇论文的标题和摘要，请快速判断每篇论文对创新药投资决策的参考价值。
+对每篇论文给出：
+- score: 0到10的整数，越高表示越值得精读；
+- study_type: basic（基础研究）、translational（转化研究）或 clinical（临床研究）之一。
+只返回一个JSON数组，不要任何其他文字，格式如下：
+[{"id": "论文ID", "score": 7, "study_type": "clinical"}]
+"""
+
+class PaperProcessingError(Exception):
+    """论文文件缺失、为空或无法读取"""
 
 class AIProcessor:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, analysis_model: str = 'qwen-max',
+                 triage_model: Optional[str] = None, triage_threshold: Optional[int] = None,
+                 triage_batch_size: int = 20, llm: Optional[LLMClient] = None):
         self.api_key = api_key
         dashscope.api_key = api_key
+        self.llm = llm or LLMClient(timeout=int(os.getenv('LLM_TIMEOUT', '120')),
+                                    base_url=os.getenv('DASHSCOPE_BASE_URL'))
+        self.analysis_model = analysis_model
+        # 初筛使用更便宜、更快的模型，只有高于阈值的论文才进入 qwen-max 全文分析
+        self.triage_model = triage_model or os.getenv('TRIAGE_MODEL', 'qwen-turbo')
+        self.triage_threshold = triage_threshold if triage_threshold is not None else int(os.getenv('TRIAGE_THRESHOLD', '6'))
+        self.triage_batch_size = triage_batch_size
+        self.triage_abstract_chars = 1500  # 每篇摘要送入初筛的最大字符数
+        # 全文分析送入模型的最大 token 数；PDF 读到这个预算就停止，不解析剩余页面（如补充材料）
+        self.max_input_tokens = int(os.getenv('LLM_MAX_INPUT_TOKENS', '24000'))
 
     def process_paper(self, paper_path: str) -> str:
-        """处理单篇论文并返回AI分析结果"""
-        logging.info(f"开始处理论文文件: {paper_path}")
+        """处理单篇论文并返回AI分析结果
+
+        读取失败时抛出 PaperProcessingError，模型调用失败时抛出 LLMError，错误信息不会作为结果返回
+        """
+        logger.info("开始处理论文文件: %s", paper_path)
+        # 读取文件内容：PDF 按页提取到 token 预算为止
         try:
-            # 读取文件内容
-            with open(paper_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                logging.info(f"成功读取论文内容，内容长度: {len(content)}")
-                if not content.strip():
-                    return "文件内容为空"
-
-            # 构建提示词
-            prompt = """你是一个生物医药领域的投资经理，你对创新药有着深刻的理解。这篇文章可能是基础研究，可能是转化研究，也可能是临床研究。请分析这篇文章，并提供以下信息：
+            if paper_path.lower().endswith('.pdf'):
+                content = extract_text(paper_path, token_budget=self.max_input_tokens)
+            else:
+                with open(paper_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+        except (OSError, UnicodeDecodeError, PDFTextError) as e:
+            raise PaperProcessingError(f"读取论文文件失败: {str(e)}") from e
+        logger.info("成功读取论文内容，内容长度: %s", len(content))
+        return self.analyze_text(content)
+
+    def analyze_text(self, content: str) -> str:
+        """分析论文文本（例如已提取并保存在库中的全文），返回AI分析结果"""
+        if not content.strip():
+            raise PaperProcessingError("文件内容为空")
+        content = truncate_to_tokens(content, self.max_input_tokens)
+
+        # 构建提示词
+        prompt = """你是一个生物医药领域的投资经理，你对创新药有着深刻的理解。这篇文章可能是基础研究，可能是转化研究，也可能是临床研究。请分析这篇文章，并提供以下信息：
 1. 这篇文章是基础研究、转化研究还是临床研究？
 2. 这篇文章的创新点是什么？
 3. 这篇文章的局限性是什么？
 4. 这篇文章对于一个生物医药投资经理来说，可以对他未来的决策产生怎样的帮助？
 """
-            logging.info("正在调用通义千问API...")
-            
-            # 调用通义千问API
-            response = Generation.call(
-                model='qwen-max',
-                prompt=prompt + "\n论文内容：\n" + content,
-                max_tokens=1500,
-                temperature=0.7,
-                result_format='message'
+        logger.info("正在调用通义千问API...")
+        result = self.llm.complete(
+            self.analysis_model,
+            prompt + "\n论文内容：\n" + content,
+            max_tokens=1500,
+            temperature=0.7
+        )
+        logger.info("成功提取AI分析结果，长度: %s", len(result))
+        return result
+
+    def triage_papers(self, papers: List[Dict]) -> Dict[str, Dict]:
+        """用廉价模型按批次初筛摘要，返回 {paper_id: {'score': int, 'study_type': str}}
+
+        每次请求包含 triage_batch_size 篇摘要；没有摘要或初筛失败的论文不出现在结果中
+        """
+        candidates = [p for p in papers if p.get('abstract')]
+        logger.info("开始摘要初筛，共 %s 篇有摘要（模型: %s）", len(candidates), self.triage_model)
+        triage = {}
+        for start in range(0, len(candidates), self.triage_batch_size):
+            batch = candidates[start:start + self.triage_batch_size]
+            triage.update(self._triage_batch(batch))
+        logger.info("摘要初筛完成，获得 %s 个评分", len(triage))
+        return triage
+
+    def _triage_batch(self, batch: List[Dict]) -> Dict[str, Dict]:
+        entries = []
+        for paper in batch:
+            abstract = re.sub(r'<[^>]+>', '', paper['abstract'])[:self.triage_abstract_chars]  # 去掉Crossref摘要中的JATS标签
+            entries.append(f"ID: {paper['id']}\n标题: {paper.get('title', '')}\n摘要: {abstract}")
+        prompt = TRIAGE_PROMPT + "\n论文列表：\n\n" + "\n\n".join(entries)
+        try:
+            content = self.llm.complete(
+                self.triage_model,
+                prompt,
+                max_tokens=40 * len(batch) + 100,
+                temperature=0
             )
-            
-            if response and response.status_code == 200:
-                # 从choices中获取内容
-                if (hasattr(response, 'output') and 
-                    hasattr(response.output, 'choices') and 
-                    response.output.choices and 
-                    len(response.output.choices) > 0 and 
-                    'message' in response.output.choices[0] and 
-                    'content' in response.output.choices[0]['message']):
-                    
-                    result = response.output.choices[0]['message']['content']
-                    logging.info(f"成功提取AI分析结果，长度: {len(result)}")
-                    return result
-                else:
-                    error_msg = "API响应格式不符合预期"
-                    logging.error(f"{error_msg}: {response}")
-                    return error_msg
-            else:
-                error_msg = f"API调用失败: {response.status_code if response else 'No response'}"
-                logging.error(error_msg)
-                return error_msg
-
-        except Exception as e:
-            error_msg = f"处理论文时发生错误: {str(e)}"
-            logging.error(error_msg, exc_info=True)
-            return error_msg
-
-    def batch_process_papers(self, papers: List[Dict]) -> Dict[str, str]:
-        """批量处理论文并返回结果字典"""
-        logging.info(f"开始批量处理论文，共 {len(papers)} 篇")
+        except LLMError as e:
+            logger.error("摘要初筛调用失败: %s", e)
+            return {}
+        return self._parse_triage(content, {str(p['id']) for p in batch})
+
+    @staticmethod
+    def _parse_triage(content: str, batch_ids) -> Dict[str, Dict]:
+        # 模型偶尔会用```json代码块包裹结果，只取第一个 [...] 片段
+        match = re.search(r'\[.*\]', content, re.S)
+        if not match:
+            logger.error("无法解析初筛结果: %s", content[:200])
+            return {}
+        try:
+            items = json.loads(match.group(0))
+        except ValueError:
+            logger.error("无法解析初筛结果: %s", content[:200])
+            return {}
+        triage = {}
+        for item in items:
+            if not isinstance(item, dict) or str(item.get('id')) not in batch_ids:
+                continue
+            try:
+                score = int(item.get('score', 0))
+            except (TypeError, ValueError):
+                continue
+            study_type = str(item.get('study_type', '')).lower()
+            triage[str(item['id'])] = {
+                'score': max(0, min(10, score)),
+                'study_type': study_type if study_type in STUDY_TYPES else ''
+            }
+        return triage
+
+    def shortlist_papers(self, papers: List[Dict]) -> List[Dict]:
+        """初筛并返回需要全文分析的论文，初筛结果写回论文字典的 triage_score / study_type
+
+        没有摘要或初筛失败的论文无法判断，保守地保留进入全文分析
+        """
+        triage = self.triage_papers(papers)
+        shortlisted = []
+        for paper in papers:
+            result = triage.get(str(paper.get('id')))
+            if result is None:
+                shortlisted.append(paper)
+                continue
+            paper['triage_score'] = result['score']
+            paper['study_type'] = result['study_type']
+            if result['score'] >= self.triage_threshold:
+                shortlisted.append(paper)
+        logger.info("初筛后保留 %s/%s 篇论文进行全文分析（阈值: %s）", len(shortlisted), len(papers), self.triage_threshold)
+        return shortlisted
+
+    def batch_process_papers(self, papers: List[Dict], paper_files: Dict[str, str], triage: bool = True,
+                             errors: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """批量处理论文并返回结果字典
+
+        paper_files 为下载文件清单中的 {paper_id: 文件路径}，由 PaperManager.get_paper_files 一次查询得到；
+        triage 为 True 时先用廉价模型初筛摘要，只对入选论文调用全文分析。
+        结果只包含成功的分析；失败原因写入 errors（如果提供），熔断打开后剩余论文直接记为失败。
+        """
+        if errors is None:
+            errors = {}
+        if triage:
+            papers = self.shortlist_papers(papers)
+        logger.info("开始批量处理论文，共 %s 篇", len(papers))
         results = {}
         
         for i, paper in enumerate(papers, 1):
             paper_id = paper.get('id')
-            logging.info(f"处理第 {i}/{len(papers)} 篇论文")
-            logging.info(f"论文信息: ID={paper_id}, 标题={paper.get('title')}")
+            logger.info("处理第 %s/%s 篇论文", i, len(papers))
+            logger.debug("论文信息: ID=%s, 标题=%s", paper_id, paper.get('title'))
             
             if paper.get('downloaded', False):
-                # 尝试不同的可能文件名
-                possible_paths = [
-                    os.path.join('downloads', paper_id),  # 无后缀
-                    os.path.join('downloads', f"{paper_id}.pdf"),
-                    os.path.join('downloads', f"{paper_id}.txt")
-                ]
-                
-                # 查找存在的文件
-                paper_path = None
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        paper_path = path
+                paper_path = paper_files.get(paper_id)
+                if paper_path and os.path.exists(paper_path):
+                    logger.info("找到论文文件: %s", paper_path)
+                    try:
+                        result = self.process_paper(paper_path)
+                    except CircuitOpenError as e:
+                        logger.error("AI服务不可用，停止本批处理: %s", e)
+                        for remaining in papers[i - 1:]:
+                            errors[remaining.get('id')] = str(e)
                         break
-                
-                if paper_path:
-                    logging.info(f"找到论文文件: {paper_path}")
-                    result = self.process_paper(paper_path)
+                    except (LLMError, PaperProcessingError) as e:
+                        logger.error("论文处理失败，ID=%s: %s", paper_id, e)
+                        errors[paper_id] = str(e)
+                        continue
                     results[paper_id] = result
-                    logging.info(f"论文处理完成，结果长度: {len(result)} 字符")
+                    logger.info("论文处理完成，结果长度: %s 字符", len(result))
                 else:
-                    logging.warning(f"未找到论文文件，尝试过以下路径: {possible_paths}")
+                    logger.warning("下载清单中没有可用文件，ID=%s, 记录路径: %s", paper_id, paper_path)
             else:
-                logging.warning(f"论文未下载，跳过处理: ID={paper_id}")
+                logger.warning("论文未下载，跳过处理: ID=%s", paper_id)
         
-        logging.info(f"批量处理完成，成功处理 {len(results)} 篇论文")
+        logger.info("批量处理完成，成功处理 %s 篇论文，失败 %s 篇", len(results), len(errors))
         return results
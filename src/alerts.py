@@ -0,0 +1,277 @@
+"""保存的检索与新论文提醒
+
+保存的检索存放在 saved_searches 表中，每个检索有自己的执行间隔。AlertScheduler 每轮取出到期的检索，
+并发执行 esearch（共享 NCBI 限速器，只查上次执行以来新收录的论文），把所有检索的结果合并去重、
+排除库中已有的论文后，用批量 efetch 获取详情并入库，再为这些新论文提交下载 / 分析任务。
+
+用法:
+    python -m src.alerts add "EGFR 抑制剂" "EGFR inhibitor" --every 720 --analyze
+    python -m src.alerts list
+    python -m src.alerts run            # 常驻，每分钟检查一次到期的检索
+    python -m src.alerts run --once
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .job_queue import JobQueue
+from .log_config import setup_logging
+from .paper_manager import PaperManager
+
+logger = logging.getLogger(__name__)
+
+ALERT_SOURCES = ('pubmed',)
+
+# 按收录日期查询时与上次执行重叠的时间，避免 PubMed 延迟收录造成遗漏；重复的结果会被去重
+OVERLAP_SECONDS = 2 * 86400
+
+
+class SavedSearches:
+    """saved_searches 表的增删改查"""
+
+    def __init__(self, db):
+        self.db = db  # ConnectionManager
+
+    def add(self, name, query, interval_minutes=1440, api_source='pubmed', options=None):
+        """新增或更新同名检索，返回 ID；新检索在下一轮立即执行"""
+        if api_source not in ALERT_SOURCES:
+            raise ValueError(f"不支持的提醒来源: {api_source}")
+        options = json.dumps(options or {'download': True}, ensure_ascii=False)
+        return self.db.write(lambda conn: conn.execute('''
+            INSERT INTO saved_searches (name, api_source, query, interval_minutes, options, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET api_source = excluded.api_source, query = excluded.query,
+                interval_minutes = excluded.interval_minutes, options = excluded.options, enabled = 1
+            RETURNING id
+        ''', (name, api_source, query, interval_minutes, options, time.time())).fetchone()[0])
+
+    def remove(self, name):
+        def write(conn):
+            conn.execute('''
+                DELETE FROM saved_search_hits WHERE search_id = (SELECT id FROM saved_searches WHERE name = ?)
+            ''', (name,))
+            return conn.execute('DELETE FROM saved_searches WHERE name = ?', (name,)).rowcount
+        return bool(self.db.write(write))
+
+    def set_enabled(self, name, enabled):
+        return bool(self.db.write(lambda conn: conn.execute(
+            'UPDATE saved_searches SET enabled = ? WHERE name = ?', (int(bool(enabled)), name)).rowcount))
+
+    def list(self):
+        return self._select('ORDER BY name')
+
+    def due(self, now=None, limit=None):
+        """到期的检索，按到期时间排序"""
+        return self._select('WHERE enabled = 1 AND next_run_at <= ? ORDER BY next_run_at LIMIT ?',
+                            (now or time.time(), limit if limit is not None else -1))
+
+    def next_due_at(self):
+        cursor = self.db.reader().cursor()
+        cursor.execute('SELECT MIN(next_run_at) FROM saved_searches WHERE enabled = 1')
+        return cursor.fetchone()[0]
+
+    def _select(self, clause, params=()):
+        cursor = self.db.reader().cursor()
+        cursor.execute(f'''
+            SELECT id, name, api_source, query, interval_minutes, enabled, options, next_run_at, last_run_at,
+                   last_hits, last_error
+            FROM saved_searches {clause}
+        ''', params)
+        return [{'id': row[0], 'name': row[1], 'api_source': row[2], 'query': row[3], 'interval_minutes': row[4],
+                 'enabled': bool(row[5]), 'options': json.loads(row[6]), 'next_run_at': row[7],
+                 'last_run_at': row[8], 'last_hits': row[9], 'last_error': row[10]} for row in cursor.fetchall()]
+
+    def record_runs(self, runs):
+        """runs 为 [(检索, 执行时间, 命中数, 错误)]；失败的检索 15 分钟后重试"""
+        self.db.write(lambda conn: conn.executemany('''
+            UPDATE saved_searches SET last_run_at = CASE WHEN ?4 IS NULL THEN ?2 ELSE last_run_at END,
+                next_run_at = ?2 + CASE WHEN ?4 IS NULL THEN interval_minutes * 60 ELSE MIN(interval_minutes * 60, 900) END,
+                last_hits = ?3, last_error = ?4
+            WHERE id = ?1
+        ''', [(search['id'], ran_at, hits, error) for search, ran_at, hits, error in runs]))
+
+
+class AlertScheduler:
+    def __init__(self, paper_manager, paper_searcher=None, max_workers=4, lookback_days=7):
+        self.paper_manager = paper_manager
+        self.searches = SavedSearches(paper_manager.db)
+        self.queue = JobQueue(paper_manager.db)
+        self._paper_searcher = paper_searcher
+        self.max_workers = max_workers
+        self.lookback_days = lookback_days
+
+    @property
+    def paper_searcher(self):
+        if self._paper_searcher is None:
+            from .paper_searcher import PaperSearcher
+            self._paper_searcher = PaperSearcher()
+        return self._paper_searcher
+
+    def run_due(self, now=None):
+        """执行所有到期的检索，返回 {'searches', 'hits', 'new_papers', 'errors', 'batch'}"""
+        now = now or time.time()
+        due = self.searches.due(now)
+        if not due:
+            return {'searches': 0, 'hits': 0, 'new_papers': 0, 'errors': 0, 'batch': None}
+        # 请求速率由 PaperSearcher 的共享限速器控制，线程数只决定同时等待响应的请求数
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='alert') as pool:
+            results = list(pool.map(self._poll, due))
+
+        hits = {}  # pmid -> 命中它的检索
+        for search, (pmids, error) in zip(due, results):
+            for pmid in pmids:
+                hits.setdefault(pmid, []).append(search)
+        new_pmids = self._unknown_pmids(list(hits))
+        papers, batch = [], None
+        try:
+            if new_pmids:
+                papers = self._unknown_papers(self.paper_searcher.fetch_pubmed_details(new_pmids))
+                self.paper_searcher.fetch_citation_counts(papers, 'pubmed')
+                self.paper_manager.add_papers(papers, 'pubmed')
+            batch = self._enqueue(papers, hits)
+            self._record_hits(hits, now)
+        except Exception as e:
+            # 命中了新论文的检索记为失败：不推进 last_run_at，按失败间隔重试，下次重新查询这段时间
+            logger.error("提醒检索的新论文入库失败: %s", e, exc_info=True)
+            error = f"{type(e).__name__}: {str(e)}"
+            new = set(new_pmids)
+            results = [(pmids, search_error or (error if new.intersection(pmids) else None))
+                       for pmids, search_error in results]
+        self.searches.record_runs([(search, now, len(pmids), error) for search, (pmids, error) in zip(due, results)])
+        summary = {'searches': len(due), 'hits': len(hits), 'new_papers': len(papers),
+                   'errors': sum(1 for _, error in results if error), 'batch': batch}
+        logger.info("提醒检索完成: %s", summary)
+        return summary
+
+    def _poll(self, search):
+        """只查询上次执行以来新收录的论文，返回 (PMID 列表, 错误信息)"""
+        since = search['last_run_at'] - OVERLAP_SECONDS if search['last_run_at'] else \
+            time.time() - self.lookback_days * 86400
+        try:
+            pmids = self.paper_searcher.esearch_pubmed(
+                search['query'], search['options'].get('max_results', 200),
+                mindate=datetime.fromtimestamp(since).strftime('%Y/%m/%d'))
+            return pmids, None
+        except Exception as e:
+            logger.warning("提醒检索失败 [%s]: %s", search['name'], e)
+            return [], f"{type(e).__name__}: {str(e)}"
+
+    def _unknown_pmids(self, pmids):
+        cursor = self.paper_manager.db.reader().cursor()
+        cursor.execute('SELECT pmid FROM papers WHERE pmid IN (SELECT value FROM json_each(?))', (json.dumps(pmids),))
+        known = {row[0] for row in cursor.fetchall()}
+        return [pmid for pmid in pmids if pmid not in known]
+
+    def _unknown_papers(self, papers):
+        """efetch 之后再按论文ID和DOI（不区分大小写）排除库中已有的论文，例如先从 Crossref 入库、没有 PMID 的论文"""
+        if not papers:
+            return papers
+        ids = [str(paper['id']) for paper in papers]
+        dois = [paper['doi'].lower() for paper in papers if paper.get('doi')]
+        cursor = self.paper_manager.db.reader().cursor()
+        cursor.execute('''
+            SELECT id, lower(doi) FROM papers
+            WHERE id IN (SELECT value FROM json_each(?)) OR lower(doi) IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(ids), json.dumps(dois)))
+        known_ids, known_dois = set(), set()
+        for paper_id, doi in cursor.fetchall():
+            known_ids.add(paper_id)
+            if doi:
+                known_dois.add(doi)
+        return [paper for paper in papers
+                if str(paper['id']) not in known_ids and (paper.get('doi') or '').lower() not in known_dois]
+
+    def _enqueue(self, papers, hits):
+        jobs = []
+        for paper in papers:
+            options = [search['options'] for search in hits.get(paper['pmid'], [])]
+            if not any(option.get('download', True) for option in options):
+                continue
+            analyze = any(option.get('analyze') for option in options)
+            jobs.append({'type': 'download', 'dedupe_key': f"download:{paper['id']}",
+                         'payload': {'paper_id': str(paper['id']), 'analyze': analyze}})
+        if not jobs:
+            return None
+        batch = self.queue.new_batch('alert')
+        self.queue.enqueue_many(jobs, batch)
+        return batch
+
+    def _record_hits(self, hits, now):
+        rows = [(search['id'], pmid, now) for pmid, searches in hits.items() for search in searches]
+        self.paper_manager.db.write(lambda conn: conn.executemany(
+            'INSERT OR IGNORE INTO saved_search_hits (search_id, pmid, first_seen) VALUES (?, ?, ?)', rows))
+
+    def run_forever(self, stop_event, tick=60):
+        """每 tick 秒检查一次到期的检索，直到 stop_event 被设置"""
+        while not stop_event.is_set():
+            try:
+                self.run_due()
+                next_due = self.searches.next_due_at()
+                wait = tick if next_due is None else min(tick, max(1, next_due - time.time()))
+            except Exception as e:
+                # 出错时到期时间可能没有更新，按 tick 等待，避免连续重试
+                logger.error("提醒检索出错: %s", e, exc_info=True)
+                wait = tick
+            stop_event.wait(wait)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="保存的检索与新论文提醒")
+    parser.add_argument('--db', default='data/papers.db')
+    sub = parser.add_subparsers(dest='action', required=True)
+    add = sub.add_parser('add', help='新增或更新保存的检索')
+    add.add_argument('name')
+    add.add_argument('query', help='PubMed 检索式')
+    add.add_argument('--every', type=int, default=1440, help='执行间隔（分钟）')
+    add.add_argument('--max-results', type=int, default=200)
+    add.add_argument('--no-download', action='store_true', help='新论文只入库，不下载')
+    add.add_argument('--analyze', action='store_true', help='下载后提交AI分析')
+    remove = sub.add_parser('remove')
+    remove.add_argument('name')
+    sub.add_parser('list')
+    run = sub.add_parser('run', help='执行到期的检索')
+    run.add_argument('--once', action='store_true', help='只执行一轮')
+    run.add_argument('--tick', type=int, default=60, help='检查间隔（秒）')
+    run.add_argument('--workers', type=int, default=4, help='同时进行的检索请求数')
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    setup_logging()
+    paper_manager = PaperManager(args.db)
+    searches = SavedSearches(paper_manager.db)
+    try:
+        if args.action == 'add':
+            searches.add(args.name, args.query, args.every,
+                         options={'download': not args.no_download, 'analyze': args.analyze,
+                                  'max_results': args.max_results})
+        elif args.action == 'remove':
+            if not searches.remove(args.name):
+                print(f"没有名为 {args.name} 的检索")
+        elif args.action == 'list':
+            for search in searches.list():
+                last_run = datetime.fromtimestamp(search['last_run_at']).strftime('%Y-%m-%d %H:%M') \
+                    if search['last_run_at'] else '未执行'
+                print(f"{search['name']}\t每 {search['interval_minutes']} 分钟\t上次 {last_run}"
+                      f"\t命中 {search['last_hits'] or 0}\t{search['query']}"
+                      + (f"\t错误: {search['last_error']}" if search['last_error'] else ''))
+        else:
+            scheduler = AlertScheduler(paper_manager, max_workers=args.workers)
+            if args.once:
+                print(scheduler.run_due())
+            else:
+                stop = threading.Event()
+                try:
+                    scheduler.run_forever(stop, args.tick)
+                except KeyboardInterrupt:
+                    stop.set()
+    finally:
+        paper_manager.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""PubMed 引用关系图
+
+从种子论文出发逐层（广度优先）抓取"被引用"和"参考文献"两个方向的关联，每层用批量 elink 请求，
+引用边保存在 citations 表中。已展开过的节点记录在 citation_crawl 表，重复抓取时只展开新节点，
+已展开节点的邻居直接从数据库读取。
+
+用法:
+    python -m src.citation_graph crawl 12345678 23456789 --depth 2
+    python -m src.citation_graph hops 12345678 --hops 2
+    python -m src.citation_graph top --limit 20
+"""
+import argparse
+import json
+import logging
+import time
+
+from .log_config import setup_logging
+from .paper_manager import PaperManager
+from .paper_searcher import PUBMED_CITED_BY, PUBMED_REFERENCES
+
+logger = logging.getLogger(__name__)
+
+# 方向 -> (elink 关联类型, citation_crawl 中的时间列)
+DIRECTIONS = {
+    'cited_by': (PUBMED_CITED_BY, 'cited_by_at'),
+    'references': (PUBMED_REFERENCES, 'refs_at'),
+}
+
+
+class CitationGraph:
+    def __init__(self, db, paper_searcher=None):
+        self.db = db  # ConnectionManager
+        self._paper_searcher = paper_searcher
+
+    @property
+    def paper_searcher(self):
+        if self._paper_searcher is None:
+            from .paper_searcher import PaperSearcher
+            self._paper_searcher = PaperSearcher()
+        return self._paper_searcher
+
+    def crawl(self, seed_pmids, depth=1, directions=('cited_by', 'references'), max_nodes=None, refresh_after=None):
+        """从种子 PMID 逐层展开 depth 层，返回 {'expanded': 本次请求的节点数, 'edges': 新增边数, 'nodes': 访问的节点数}
+
+        refresh_after 为秒数时，超过该时间的节点会重新展开（被引用列表会随时间增长）；
+        max_nodes 限制访问的节点总数，避免高被引论文使抓取范围失控。
+        """
+        for direction in directions:
+            if direction not in DIRECTIONS:
+                raise ValueError(f"未知的方向: {direction}")
+        frontier = list(dict.fromkeys(str(pmid) for pmid in seed_pmids if pmid))
+        visited = set(frontier)
+        stats = {'expanded': 0, 'edges': 0, 'nodes': len(visited)}
+        for level in range(depth):
+            if not frontier:
+                break
+            for direction in directions:
+                pending = self._unexpanded(frontier, direction, refresh_after)
+                if pending:
+                    stats['edges'] += self._expand(pending, direction, level)
+                    stats['expanded'] += len(pending)
+            # 下一层：本层节点的所有邻居（包括以前抓取时已保存的边）
+            next_frontier = []
+            for pmid in self._neighbors(frontier, directions):
+                if pmid in visited:
+                    continue
+                if max_nodes is not None and len(visited) >= max_nodes:
+                    break
+                visited.add(pmid)
+                next_frontier.append(pmid)
+            logger.info("引用图第 %s 层: 展开 %s 个节点，发现 %s 个新节点", level + 1, len(frontier), len(next_frontier))
+            frontier = next_frontier
+        stats['nodes'] = len(visited)
+        return stats
+
+    def _unexpanded(self, pmids, direction, refresh_after):
+        column = DIRECTIONS[direction][1]
+        cutoff = time.time() - refresh_after if refresh_after is not None else 0
+        cursor = self.db.reader().cursor()
+        cursor.execute(f'''
+            SELECT pmid FROM citation_crawl
+            WHERE pmid IN (SELECT value FROM json_each(?)) AND {column} IS NOT NULL AND {column} > ?
+        ''', (json.dumps(pmids), cutoff))
+        done = {row[0] for row in cursor.fetchall()}
+        return [pmid for pmid in pmids if pmid not in done]
+
+    def _expand(self, pmids, direction, level):
+        linkname, column = DIRECTIONS[direction]
+        links = self.paper_searcher.fetch_pubmed_links(pmids, linkname)
+        if direction == 'cited_by':
+            edges = [(citing, pmid) for pmid, linked in links.items() for citing in linked]
+        else:
+            edges = [(pmid, cited) for pmid, linked in links.items() for cited in linked]
+        now = time.time()
+
+        def write(conn):
+            added = conn.executemany('''
+                INSERT OR IGNORE INTO citations (citing_pmid, cited_pmid, source, first_seen) VALUES (?, ?, ?, ?)
+            ''', [(citing, cited, linkname, now) for citing, cited in edges]).rowcount
+            conn.executemany(f'''
+                INSERT INTO citation_crawl (pmid, depth, {column}) VALUES (?, ?, ?)
+                ON CONFLICT(pmid) DO UPDATE SET {column} = excluded.{column}, depth = MIN(depth, excluded.depth)
+            ''', [(pmid, level, now) for pmid in links])
+            if direction == 'cited_by':
+                # 顺便更新库中 PubMed 论文的被引次数，不必再单独请求
+                conn.executemany('''
+                    UPDATE papers SET citation_count = ? WHERE pmid = ? AND api_source = 'pubmed'
+                ''', [(len(linked), pmid) for pmid, linked in links.items()])
+            return added
+        return self.db.write(write)
+
+    def _neighbors(self, pmids, directions):
+        cursor = self.db.reader().cursor()
+        ids = json.dumps(pmids)
+        neighbors = []
+        if 'cited_by' in directions:
+            cursor.execute('SELECT citing_pmid FROM citations WHERE cited_pmid IN (SELECT value FROM json_each(?))',
+                           (ids,))
+            neighbors.extend(row[0] for row in cursor.fetchall())
+        if 'references' in directions:
+            cursor.execute('SELECT cited_pmid FROM citations WHERE citing_pmid IN (SELECT value FROM json_each(?))',
+                           (ids,))
+            neighbors.extend(row[0] for row in cursor.fetchall())
+        return list(dict.fromkeys(neighbors))
+
+    def cited_by(self, pmid):
+        cursor = self.db.reader().cursor()
+        cursor.execute('SELECT citing_pmid FROM citations WHERE cited_pmid = ?', (str(pmid),))
+        return [row[0] for row in cursor.fetchall()]
+
+    def references(self, pmid):
+        cursor = self.db.reader().cursor()
+        cursor.execute('SELECT cited_pmid FROM citations WHERE citing_pmid = ?', (str(pmid),))
+        return [row[0] for row in cursor.fetchall()]
+
+    def papers_within_hops(self, pmid, hops=2):
+        """库中与该论文相距不超过 hops 步（沿引用或被引用）的论文，按距离排序
+
+        返回 [{'id', 'title', 'pmid', 'hops'}]；只返回库中已有的论文，中间节点可以不在库中。
+        """
+        cursor = self.db.reader().cursor()
+        cursor.execute('''
+            WITH RECURSIVE reach(pmid, hops) AS (
+                SELECT ?, 0
+                UNION
+                SELECT c.cited_pmid, reach.hops + 1 FROM reach JOIN citations c ON c.citing_pmid = reach.pmid
+                WHERE reach.hops < ?
+                UNION
+                SELECT c.citing_pmid, reach.hops + 1 FROM reach JOIN citations c ON c.cited_pmid = reach.pmid
+                WHERE reach.hops < ?
+            )
+            SELECT papers.id, papers.title, papers.pmid, MIN(reach.hops) AS distance
+            FROM reach JOIN papers ON papers.pmid = reach.pmid
+            WHERE reach.pmid != ?
+            GROUP BY papers.id
+            ORDER BY distance, papers.citation_count DESC
+        ''', (str(pmid), hops, hops, str(pmid)))
+        return [{'id': row[0], 'title': row[1], 'pmid': row[2], 'hops': row[3]} for row in cursor.fetchall()]
+
+    def most_cited_in_library(self, limit=20):
+        """库中被库内其他论文引用最多的论文，返回 [{'id', 'title', 'pmid', 'cited_by'}]"""
+        cursor = self.db.reader().cursor()
+        cursor.execute('''
+            SELECT papers.id, papers.title, papers.pmid, COUNT(*) AS cited_by
+            FROM citations
+            JOIN papers ON papers.pmid = citations.cited_pmid
+            WHERE citations.citing_pmid IN (SELECT pmid FROM papers WHERE pmid IS NOT NULL)
+            GROUP BY papers.id
+            ORDER BY cited_by DESC
+            LIMIT ?
+        ''', (limit,))
+        return [{'id': row[0], 'title': row[1], 'pmid': row[2], 'cited_by': row[3]} for row in cursor.fetchall()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PubMed 引用关系图")
+    parser.add_argument('--db', default='data/papers.db')
+    sub = parser.add_subparsers(dest='action', required=True)
+    crawl = sub.add_parser('crawl', help='从种子 PMID 抓取引用关系')
+    crawl.add_argument('pmids', nargs='*', help='默认使用库中所有 PubMed 论文')
+    crawl.add_argument('--depth', type=int, default=1)
+    crawl.add_argument('--directions', nargs='+', choices=list(DIRECTIONS), default=list(DIRECTIONS))
+    crawl.add_argument('--max-nodes', type=int)
+    crawl.add_argument('--refresh-days', type=float, help='超过该天数的节点重新展开')
+    hops = sub.add_parser('hops', help='库中与某篇论文相距若干步的论文')
+    hops.add_argument('pmid')
+    hops.add_argument('--hops', type=int, default=2)
+    top = sub.add_parser('top', help='库内被引最多的论文')
+    top.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    setup_logging()
+    paper_manager = PaperManager(args.db)
+    graph = CitationGraph(paper_manager.db)
+    try:
+        if args.action == 'crawl':
+            seeds = args.pmids
+            if not seeds:
+                cursor = paper_manager.db.reader().cursor()
+                cursor.execute('SELECT pmid FROM papers WHERE pmid IS NOT NULL')
+                seeds = [row[0] for row in cursor.fetchall()]
+            refresh_after = args.refresh_days * 86400 if args.refresh_days is not None else None
+            print(graph.crawl(seeds, args.depth, args.directions, args.max_nodes, refresh_after))
+        elif args.action == 'hops':
+            for paper in graph.papers_within_hops(args.pmid, args.hops):
+                print(f"{paper['hops']}\t{paper['pmid']}\t{paper['title']}")
+        else:
+            for paper in graph.most_cited_in_library(args.limit):
+                print(f"{paper['cited_by']}\t{paper['pmid']}\t{paper['title']}")
+    finally:
+        paper_manager.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""全库被引次数刷新
+
+按 papers.seq 分块读取有 DOI 的论文，每块拆成多 DOI 的 Crossref 请求（filter=doi:...，select 只取 DOI 和被引次数），
+几个请求并发进行（共享 Crossref 限速器），每块的结果用一次 executemany 写回。
+刷新过的论文记录 citation_refreshed_at，中断后用同样的参数重新运行会跳过已刷新的论文。
+
+用法:
+    python -m src.citation_refresh                 # 刷新超过 7 天未刷新的论文
+    python -m src.citation_refresh --max-age-days 0
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .log_config import setup_logging
+from .paper_manager import PaperManager
+
+logger = logging.getLogger(__name__)
+
+
+class CitationRefresher:
+    def __init__(self, paper_manager, paper_searcher=None, chunk_size=1000, batch_size=100, max_workers=3):
+        self.db = paper_manager.db
+        self._paper_searcher = paper_searcher
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    @property
+    def paper_searcher(self):
+        if self._paper_searcher is None:
+            from .paper_searcher import PaperSearcher
+            self._paper_searcher = PaperSearcher()
+        return self._paper_searcher
+
+    def pending_count(self, max_age_days=7, now=None):
+        cursor = self.db.reader().cursor()
+        cursor.execute(f'SELECT COUNT(*) FROM papers WHERE {self._stale_clause()}',
+                       (self._cutoff(max_age_days, now),))
+        return cursor.fetchone()[0]
+
+    def run(self, max_age_days=7, limit=None, progress=None, now=None):
+        """刷新 max_age_days 天内没有刷新过的论文，返回 {'papers', 'found', 'updated', 'errors': 失败的请求数}
+
+        progress(已处理, 总数) 在每块写回后调用；查询失败的批次不记录刷新时间，下次运行时重试。
+        """
+        cutoff = self._cutoff(max_age_days, now)
+        total = self.pending_count(max_age_days, now)
+        if limit is not None:
+            total = min(total, limit)
+        summary = {'papers': 0, 'found': 0, 'updated': 0, 'errors': 0}
+        after = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='crossref') as pool:
+            while summary['papers'] < total:
+                rows = self._next_chunk(after, cutoff, min(self.chunk_size, total - summary['papers']))
+                if not rows:
+                    break
+                after = rows[-1][0]
+                dois = [row[2] for row in rows]
+                batches = [dois[i:i + self.batch_size] for i in range(0, len(dois), self.batch_size)]
+                counts, failed = {}, set()
+                for batch, result in zip(batches, pool.map(self._fetch_batch, batches)):
+                    if result is None:
+                        failed.update(doi.lower() for doi in batch)
+                        summary['errors'] += 1
+                    else:
+                        counts.update(result)
+                updated = self._write(rows, counts, failed)
+                summary['papers'] += len(rows)
+                summary['found'] += sum(1 for row in rows if row[2].lower() in counts)
+                summary['updated'] += updated
+                if progress:
+                    progress(summary['papers'], total)
+        logger.info("被引次数刷新完成: %s", summary)
+        return summary
+
+    @staticmethod
+    def _cutoff(max_age_days, now=None):
+        return (now or time.time()) - max_age_days * 86400
+
+    @staticmethod
+    def _stale_clause():
+        return "doi IS NOT NULL AND doi != '' AND (citation_refreshed_at IS NULL OR citation_refreshed_at <= ?)"
+
+    def _next_chunk(self, after_seq, cutoff, limit):
+        cursor = self.db.reader().cursor()
+        cursor.execute(f'''
+            SELECT seq, id, doi, citation_count FROM papers
+            WHERE seq > ? AND {self._stale_clause()}
+            ORDER BY seq LIMIT ?
+        ''', (after_seq, cutoff, limit))
+        return cursor.fetchall()
+
+    def _fetch_batch(self, dois):
+        try:
+            return self.paper_searcher.fetch_crossref_citation_counts(dois, self.batch_size)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logger.warning("Crossref 批量查询失败（%s 个DOI，下次运行时重试）: %s", len(dois), e)
+            return None
+
+    def _write(self, rows, counts, failed):
+        """被引次数有变化的论文更新计数；Crossref 查不到的 DOI 只记录刷新时间，下次不再重复查询"""
+        now = time.time()
+        changed = [(counts[doi.lower()], now, paper_id) for _, paper_id, doi, count in rows
+                   if doi.lower() in counts and counts[doi.lower()] != count]
+        touched = [(now, paper_id) for _, paper_id, doi, count in rows
+                   if doi.lower() not in failed and counts.get(doi.lower(), count) == count]
+
+        def write(conn):
+            conn.executemany('UPDATE papers SET citation_count = ?, citation_refreshed_at = ? WHERE id = ?', changed)
+            conn.executemany('UPDATE papers SET citation_refreshed_at = ? WHERE id = ?', touched)
+        self.db.write(write)
+        return len(changed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从 Crossref 刷新全库被引次数")
+    parser.add_argument('--db', default='data/papers.db')
+    parser.add_argument('--max-age-days', type=float, default=7, help='只刷新超过该天数未刷新的论文')
+    parser.add_argument('--limit', type=int, help='本次最多刷新的论文数')
+    parser.add_argument('--workers', type=int, default=3, help='同时进行的 Crossref 请求数')
+    parser.add_argument('--batch-size', type=int, default=100, help='每个请求包含的 DOI 数')
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    paper_manager = PaperManager(args.db)
+    refresher = CitationRefresher(paper_manager, batch_size=args.batch_size, max_workers=args.workers)
+    started = time.time()
+    try:
+        summary = refresher.run(args.max_age_days, args.limit,
+                                progress=lambda done, total: print(f"\r{done}/{total}", end='', flush=True))
+        print(f"\n{summary}，耗时 {time.time() - started:.1f} 秒")
+    finally:
+        paper_manager.close()
+
+
+if __name__ == '__main__':
+    main()
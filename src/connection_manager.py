@@ -0,0 +1,129 @@
+import logging
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionManager:
+    """SQLite 连接管理：每个线程一个读连接，所有写操作交给单一写线程串行执行
+
+    写线程从队列中一次取出多个写任务，放在同一个事务里执行并只提交一次；
+    每个任务用 SAVEPOINT 隔离，单个任务失败只回滚它自己。
+    这样多个工作线程可以并发提交结果，而不会出现 "database is locked"。
+    """
+
+    def __init__(self, db_path, configure=None, max_batch=256):
+        self.db_path = db_path
+        self.configure = configure
+        self.max_batch = max_batch
+        self.local = threading.local()
+        self.readers = []
+        self.readers_lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.closed = False
+        self.writer_conn = self._connect()
+        self.writer_thread = threading.Thread(target=self._writer_loop, name='sqlite-writer', daemon=True)
+        self.writer_thread.start()
+
+    def _connect(self):
+        # isolation_level=None：由我们显式管理事务，读连接不会长期持有快照
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        if self.configure:
+            self.configure(conn)
+        return conn
+
+    def reader(self):
+        """返回当前线程专用的读连接"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self.local.conn = conn
+            with self.readers_lock:
+                self.readers.append(conn)
+        return conn
+
+    def submit(self, fn, *args, **kwargs):
+        """提交写任务 fn(conn, *args, **kwargs)，返回在提交后完成的 Future"""
+        if self.closed:
+            raise RuntimeError("数据库连接已关闭")
+        future = Future()
+        self.queue.put((fn, args, kwargs, future))
+        return future
+
+    def write(self, fn, *args, **kwargs):
+        """提交写任务并等待事务提交，返回 fn 的返回值"""
+        if threading.current_thread() is self.writer_thread:
+            # 写任务内部再次写入时直接执行，避免等待自己
+            return fn(self.writer_conn, *args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _writer_loop(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            batch = [job]
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    job = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                batch.append(job)
+            self._run_batch(batch)
+            if stop:
+                break
+        self.writer_conn.close()
+
+    def _run_batch(self, batch):
+        conn = self.writer_conn
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for fn, args, kwargs, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT job')
+                try:
+                    result = fn(conn, *args, **kwargs)
+                except BaseException as e:
+                    conn.execute('ROLLBACK TO job')
+                    conn.execute('RELEASE job')
+                    outcomes.append((future, None, e))
+                else:
+                    conn.execute('RELEASE job')
+                    outcomes.append((future, result, None))
+            conn.execute('COMMIT')
+        except BaseException as e:
+            logger.error("批量写入事务失败: %s", e, exc_info=True)
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            for fn, args, kwargs, future in batch:
+                if future.done():
+                    continue
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return
+        # 提交后才通知调用方，保证调用方随后读取时能看到写入结果
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.writer_thread.join(timeout=10)
+        with self.readers_lock:
+            for conn in self.readers:
+                conn.close()
+            self.readers.clear()
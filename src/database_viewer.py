@@ -1,7 +1,9 @@
-from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QTableWidget, 
-                           QTableWidgetItem, QHeaderView, QPushButton, QHBoxLayout,
-                           QDialog, QTextEdit, QMessageBox)
+from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QTableView,
+                           QHeaderView, QPushButton, QHBoxLayout, QLabel,
+                           QDialog, QTextEdit, QMessageBox, QLineEdit)
 from PyQt6.QtCore import Qt
+from .table_models import PaperTableModel
+from .delegates import ButtonDelegate
 import logging
 
 class NotesDialog(QDialog):
@@ -33,79 +35,91 @@ class DatabaseViewer(QMainWindow):
         self.setCentralWidget(central_widget)
         layout = QVBoxLayout(central_widget)
 
-        # 创建表格
-        self.paper_table = QTableWidget()
-        self.paper_table.setColumnCount(11)
-        self.paper_table.setHorizontalHeaderLabels([
-            "ID", "标题", "作者", "年份", "引用次数", 
-            "API来源", "DOI", "下载状态", "笔记", "AI笔记", "操作"
-        ])
-        self.paper_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        # 全文检索框：标题、作者、摘要、笔记、AI笔记
+        search_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText('全文检索，支持 "短语"、前缀* 和 OR')
+        self.search_input.returnPressed.connect(self.load_papers)
+        search_button = QPushButton("检索")
+        search_button.clicked.connect(self.load_papers)
+        search_layout.addWidget(self.search_input)
+        search_layout.addWidget(search_button)
+        layout.addLayout(search_layout)
+
+        # 创建表格：模型按页懒加载，按钮由委托绘制，不为每行创建控件
+        self.paper_table = QTableView()
+        self.paper_table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.paper_table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        self.paper_table.setMouseTracking(True)
+        self.paper_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.paper_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.paper_table.horizontalHeader().setStretchLastSection(True)
+        self.button_delegate = ButtonDelegate(self.paper_table)
+        self.button_delegate.clicked.connect(self.on_button_clicked)
+        for key in ('has_notes', 'has_ai_notes', 'actions'):
+            self.paper_table.setItemDelegateForColumn(PaperTableModel.column_index(key), self.button_delegate)
         layout.addWidget(self.paper_table)
+        self.model = None
 
         # 按钮区域
         button_layout = QHBoxLayout()
         refresh_button = QPushButton("刷新")
         refresh_button.clicked.connect(self.load_papers)
         button_layout.addWidget(refresh_button)
+        self.count_label = QLabel()
+        button_layout.addWidget(self.count_label)
         layout.addLayout(button_layout)
 
     def load_papers(self):
-        # 从数据库获取所有论文
-        papers = self.paper_manager.get_all_papers()
-        self.paper_table.setRowCount(len(papers))
-
-        for row, paper in enumerate(papers):
-            # ID
-            self.paper_table.setItem(row, 0, QTableWidgetItem(str(paper['id'])))
-            # 标题
-            self.paper_table.setItem(row, 1, QTableWidgetItem(paper['title']))
-            # 作者
-            self.paper_table.setItem(row, 2, QTableWidgetItem(paper['authors']))
-            # 年份
-            self.paper_table.setItem(row, 3, QTableWidgetItem(str(paper['year'])))
-            # 引用次数
-            self.paper_table.setItem(row, 4, QTableWidgetItem(str(paper['citation_count'])))
-            # API来源
-            self.paper_table.setItem(row, 5, QTableWidgetItem(paper['api_source']))
-            # DOI
-            self.paper_table.setItem(row, 6, QTableWidgetItem(paper['doi']))
-            # 下载状态
-            download_status = "已下载" if paper['downloaded'] else "未下载"
-            self.paper_table.setItem(row, 7, QTableWidgetItem(download_status))
-            
-            # 笔记状态
-            notes_status = "有" if paper['notes'] else "无"
-            notes_button = QPushButton(notes_status)
-            notes_button.clicked.connect(lambda checked, p=paper: self.view_notes(p))
-            self.paper_table.setCellWidget(row, 8, notes_button)
-            
-            # AI笔记状态
-            ai_notes_status = "有" if paper['ai_notes'] else "无"
-            ai_notes_button = QPushButton(ai_notes_status)
-            ai_notes_button.clicked.connect(lambda checked, p=paper: self.view_ai_notes(p))
-            self.paper_table.setCellWidget(row, 9, ai_notes_button)
+        if self.model is not None:
+            self.model.deleteLater()
+        query = self.search_input.text().strip()
+        if query:
+            # 全文检索结果按相关度排序，并带有高亮片段
+            def fetch_page(offset, limit):
+                papers = self.paper_manager.search_library(query, limit=limit, offset=offset)
+                return papers, (offset + len(papers) if len(papers) == limit else None)
+            self.model = PaperTableModel(fetch_page, parent=self)
+            self.count_label.setText("")
+        else:
+            # 按 seq 键集分页浏览全部论文
+            self.model = PaperTableModel(
+                lambda after, limit: self.paper_manager.get_papers_page(after, limit), parent=self)
+            self.count_label.setText(f"共 {self.paper_manager.count_papers()} 篇论文")
+        self.paper_table.setModel(self.model)
+        self.paper_table.setColumnHidden(self.model.column_index('snippet'), not query)
+        self.paper_table.setColumnWidth(self.model.column_index('title'), 400)
+        self.paper_table.setColumnWidth(self.model.column_index('authors'), 200)
+        if self.model.canFetchMore():
+            self.model.fetchMore()
 
-            # 删除按钮
-            delete_button = QPushButton("删除")
-            delete_button.clicked.connect(lambda checked, p=paper: self.delete_paper(p))
-            self.paper_table.setCellWidget(row, 10, delete_button)
+    def on_button_clicked(self, index):
+        paper = self.model.paper(index.row())
+        key = self.model.COLUMNS[index.column()][0]
+        if key == 'has_notes':
+            self.view_notes(paper)
+        elif key == 'has_ai_notes':
+            self.view_ai_notes(paper)
+        elif key == 'actions':
+            self.delete_paper(index.row(), paper)
 
     def view_notes(self, paper):
-        if paper['notes']:
-            dialog = NotesDialog(self, paper['notes'], "论文笔记")
+        notes = self.paper_manager.get_paper_notes(paper['id'])
+        if notes:
+            dialog = NotesDialog(self, notes, "论文笔记")
             dialog.exec()
         else:
             QMessageBox.information(self, "提示", "该论文暂无笔记")
 
     def view_ai_notes(self, paper):
-        if paper['ai_notes']:
-            dialog = NotesDialog(self, paper['ai_notes'], "AI笔记")
+        ai_notes = self.paper_manager.get_paper_ai_notes(paper['id'])
+        if ai_notes:
+            dialog = NotesDialog(self, ai_notes, "AI笔记")
             dialog.exec()
         else:
             QMessageBox.information(self, "提示", "该论文暂无AI笔记")
 
-    def delete_paper(self, paper):
+    def delete_paper(self, row, paper):
         reply = QMessageBox.question(self, '确认删除', 
                                    f"确定要删除论文 '{paper['title']}' 吗？",
                                    QMessageBox.StandardButton.Yes | 
@@ -114,7 +128,7 @@ class DatabaseViewer(QMainWindow):
         if reply == QMessageBox.StandardButton.Yes:
             try:
                 self.paper_manager.delete_paper(paper['id'])
-                self.load_papers()  # 重新加载数据
+                self.model.remove_paper(row)  # 只移除这一行，不重新加载
                 QMessageBox.information(self, "成功", "论文已删除")
             except Exception as e:
                 QMessageBox.warning(self, "错误", f"删除失败: {str(e)}")
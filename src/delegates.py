@@ -0,0 +1,99 @@
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyle, QStyleOptionButton, QStyleOptionViewItem, QApplication
+from PyQt6.QtCore import Qt, QEvent, pyqtSignal, QModelIndex, QPointF
+from PyQt6.QtGui import QColor, QTextLayout, QTextCharFormat, QPalette
+from functools import lru_cache
+import re
+
+
+@lru_cache(maxsize=64)
+def compile_keywords(query):
+    """把查询中的关键词编译成一个不区分大小写的正则（多关键词交替），按查询缓存
+
+    较长的关键词排在前面，使 "egfr inhibitor" 与 "egfr" 重叠时优先匹配更长的一个。
+    没有关键词时返回 None。
+    """
+    keywords = sorted({keyword for keyword in query.lower().split() if keyword}, key=len, reverse=True)
+    if not keywords:
+        return None
+    return re.compile('|'.join(re.escape(keyword) for keyword in keywords), re.IGNORECASE)
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    """把单元格绘制成按钮，点击时发出 clicked(index)
+
+    只在绘制可见单元格时画按钮，不为每一行创建 QPushButton 控件。
+    """
+
+    clicked = pyqtSignal(QModelIndex)
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = str(index.data(Qt.ItemDataRole.DisplayRole) or '')
+        button.state = QStyle.StateFlag.State_Enabled
+        if option.state & QStyle.StateFlag.State_MouseOver:
+            button.state |= QStyle.StateFlag.State_MouseOver
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.Type.MouseButtonRelease and
+                event.button() == Qt.MouseButton.LeftButton and
+                option.rect.contains(event.position().toPoint())):
+            self.clicked.emit(index)
+            return True
+        return super().editorEvent(event, model, option, index)
+
+
+class HighlightDelegate(QStyledItemDelegate):
+    """绘制时高亮单元格中匹配关键词的片段
+
+    只有视图实际绘制的（可见）单元格才会做匹配，且只给匹配到的文字加背景色。
+    """
+
+    def __init__(self, parent=None, color=QColor(255, 255, 0, 140)):
+        super().__init__(parent)
+        self.pattern = None
+        self.highlight_format = QTextCharFormat()
+        self.highlight_format.setBackground(color)
+
+    def set_query(self, query):
+        self.pattern = compile_keywords(query or '')
+
+    def paint(self, painter, option, index):
+        text = index.data(Qt.ItemDataRole.DisplayRole)
+        spans = [m.span() for m in self.pattern.finditer(str(text))] if self.pattern and text is not None else []
+        if not spans:
+            super().paint(painter, option, index)
+            return
+
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        text = opt.text
+        opt.text = ''
+        style = opt.widget.style() if opt.widget else QApplication.style()
+        # 先按样式画背景、选中状态等，再自己画带高亮的文字
+        style.drawControl(QStyle.ControlElement.CE_ItemViewItem, opt, painter, opt.widget)
+        text_rect = style.subElementRect(QStyle.SubElement.SE_ItemViewItemText, opt, opt.widget)
+
+        ranges = []
+        for start, end in spans:
+            text_range = QTextLayout.FormatRange()
+            text_range.start = start
+            text_range.length = end - start
+            text_range.format = self.highlight_format
+            ranges.append(text_range)
+        layout = QTextLayout(text, opt.font)
+        layout.setFormats(ranges)
+        layout.beginLayout()
+        line = layout.createLine()
+        line.setLineWidth(1e6)  # 单行显示，超出部分由裁剪处理
+        layout.endLayout()
+
+        painter.save()
+        painter.setClipRect(text_rect)
+        selected = opt.state & QStyle.StateFlag.State_Selected
+        painter.setPen(opt.palette.color(QPalette.ColorRole.HighlightedText if selected else QPalette.ColorRole.Text))
+        y = text_rect.top() + (text_rect.height() - line.height()) / 2
+        layout.draw(painter, QPointF(text_rect.left() + 2, y))
+        painter.restore()
@@ -0,0 +1,251 @@
+"""期刊 RSS / 目录（TOC）订阅入库
+
+每个订阅保存上次响应的 ETag 和 Last-Modified，轮询时发送条件请求，订阅没有更新时服务器返回 304，
+不需要下载和解析。有更新时只处理以前没见过的条目：从条目中提取 DOI，排除库中已有的论文后
+按 DOI 批量查询 Crossref 获取完整元数据，最后一次性写入 PaperManager。
+
+用法:
+    python -m src.feed_ingest add https://www.nature.com/nrd.rss --every 360
+    python -m src.feed_ingest list
+    python -m src.feed_ingest run --once
+"""
+import argparse
+import html
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import feedparser
+import requests
+
+from .log_config import setup_logging
+from .paper_manager import PaperManager
+
+logger = logging.getLogger(__name__)
+
+DOI_RE = re.compile(r'\b(10\.\d{4,9}/[^\s"<>&]+)', re.IGNORECASE)
+
+
+def extract_doi(entry):
+    """从订阅条目中提取 DOI：优先 prism:doi / dc:identifier，其次链接、ID 和摘要"""
+    candidates = [entry.get('prism_doi'), entry.get('dc_identifier'), entry.get('id'), entry.get('link')]
+    candidates += [link.get('href') for link in entry.get('links', [])]
+    candidates.append(entry.get('summary'))
+    for text in candidates:
+        if not text:
+            continue
+        match = DOI_RE.search(html.unescape(text))
+        if match:
+            return match.group(1).rstrip('.,;)]').lower()
+    return None
+
+
+class FeedIngestor:
+    def __init__(self, paper_manager, paper_searcher=None, max_workers=4, timeout=30):
+        self.paper_manager = paper_manager
+        self.db = paper_manager.db
+        self._paper_searcher = paper_searcher
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    @property
+    def paper_searcher(self):
+        if self._paper_searcher is None:
+            from .paper_searcher import PaperSearcher
+            self._paper_searcher = PaperSearcher()
+        return self._paper_searcher
+
+    def add_feed(self, url, title=None, interval_minutes=360):
+        return self.db.write(lambda conn: conn.execute('''
+            INSERT INTO feeds (url, title, interval_minutes, created_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET title = COALESCE(excluded.title, title),
+                interval_minutes = excluded.interval_minutes
+            RETURNING id
+        ''', (url, title, interval_minutes, time.time())).fetchone()[0])
+
+    def remove_feed(self, url):
+        def write(conn):
+            conn.execute('DELETE FROM feed_entries WHERE feed_id = (SELECT id FROM feeds WHERE url = ?)', (url,))
+            return conn.execute('DELETE FROM feeds WHERE url = ?', (url,)).rowcount
+        return bool(self.db.write(write))
+
+    def list_feeds(self, due_before=None):
+        cursor = self.db.reader().cursor()
+        clause, params = ('WHERE next_check_at <= ? ORDER BY next_check_at', (due_before,)) \
+            if due_before is not None else ('ORDER BY url', ())
+        cursor.execute(f'''
+            SELECT id, url, title, etag, last_modified, interval_minutes, last_checked_at, last_status, last_error
+            FROM feeds {clause}
+        ''', params)
+        return [{'id': row[0], 'url': row[1], 'title': row[2], 'etag': row[3], 'last_modified': row[4],
+                 'interval_minutes': row[5], 'last_checked_at': row[6], 'last_status': row[7], 'last_error': row[8]}
+                for row in cursor.fetchall()]
+
+    def run_due(self, now=None):
+        """检查所有到期的订阅，返回 {'feeds', 'not_modified', 'new_entries', 'new_papers', 'errors'}"""
+        now = now or time.time()
+        feeds = self.list_feeds(due_before=now)
+        if not feeds:
+            return {'feeds': 0, 'not_modified': 0, 'new_entries': 0, 'new_papers': 0, 'errors': 0}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='feed') as pool:
+            results = list(pool.map(self.fetch_feed, feeds))
+
+        entries = [entry for result in results for entry in result['entries']]
+        papers = self._lookup_papers(entries)
+        if papers:
+            self.paper_manager.add_papers(papers)
+        self._record(feeds, results, now)
+        summary = {'feeds': len(feeds), 'not_modified': sum(1 for r in results if r['status'] == 304),
+                   'new_entries': len(entries), 'new_papers': len(papers),
+                   'errors': sum(1 for r in results if r['error'])}
+        logger.info("订阅检查完成: %s", summary)
+        return summary
+
+    def fetch_feed(self, feed):
+        """条件请求一个订阅，返回 {'status', 'etag', 'last_modified', 'entries': 新条目, 'error'}"""
+        result = {'status': None, 'etag': feed['etag'], 'last_modified': feed['last_modified'], 'entries': [],
+                  'title': None, 'error': None}
+        headers = {}
+        if feed['etag']:
+            headers['If-None-Match'] = feed['etag']
+        if feed['last_modified']:
+            headers['If-Modified-Since'] = feed['last_modified']
+        try:
+            response = self.session.get(feed['url'], headers=headers, timeout=self.timeout)
+            result['status'] = response.status_code
+            if response.status_code == 304:
+                return result
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.warning("获取订阅失败 %s: %s", feed['url'], e)
+            result['error'] = f"{type(e).__name__}: {str(e)}"
+            return result
+        parsed = feedparser.parse(response.content)
+        if parsed.bozo and not parsed.entries:
+            # 保留旧的 ETag / Last-Modified，下次轮询重新下载这一版本
+            result['error'] = f"无法解析订阅: {parsed.bozo_exception}"
+            return result
+        result['etag'] = response.headers.get('ETag')
+        result['last_modified'] = response.headers.get('Last-Modified')
+        result['title'] = parsed.feed.get('title')
+        keyed = [(entry.get('id') or entry.get('link') or entry.get('title'), entry) for entry in parsed.entries]
+        seen = self._seen_keys(feed['id'], [key for key, _ in keyed if key])
+        for key, entry in keyed:
+            if not key or key in seen:
+                continue
+            result['entries'].append({'feed_id': feed['id'], 'key': key, 'doi': extract_doi(entry),
+                                      'title': entry.get('title', ''), 'link': entry.get('link', ''),
+                                      'authors': [author.get('name', '') for author in entry.get('authors', [])],
+                                      'year': (entry.get('published_parsed') or entry.get('updated_parsed') or [''])[0]})
+        logger.info("订阅 %s: %s 个条目，其中 %s 个新条目", feed['url'], len(parsed.entries), len(result['entries']))
+        return result
+
+    def _seen_keys(self, feed_id, keys):
+        cursor = self.db.reader().cursor()
+        cursor.execute('''
+            SELECT entry_key FROM feed_entries WHERE feed_id = ? AND entry_key IN (SELECT value FROM json_each(?))
+        ''', (feed_id, json.dumps(keys)))
+        return {row[0] for row in cursor.fetchall()}
+
+    def _lookup_papers(self, entries):
+        """新条目中库里还没有的 DOI，批量查询 Crossref；Crossref 查不到时用条目自身的信息"""
+        dois = list(dict.fromkeys(entry['doi'] for entry in entries if entry['doi']))
+        if not dois:
+            return []
+        cursor = self.db.reader().cursor()
+        # DOI 不区分大小写，库里的 DOI 可能是任意大小写形式；lower(doi) 有表达式索引
+        cursor.execute('SELECT lower(doi) FROM papers WHERE lower(doi) IN (SELECT value FROM json_each(?))',
+                       (json.dumps([doi.lower() for doi in dois]),))
+        known = {row[0] for row in cursor.fetchall()}
+        dois = [doi for doi in dois if doi.lower() not in known]
+        if not dois:
+            return []
+        try:
+            works = self.paper_searcher.fetch_crossref_works(dois)
+        except requests.RequestException as e:
+            logger.warning("Crossref 批量查询失败，使用订阅条目信息入库: %s", e)
+            works = {}
+        papers = []
+        for entry in entries:
+            doi = entry['doi']
+            if doi not in dois:
+                continue
+            dois.remove(doi)
+            papers.append(works.get(doi) or {
+                'id': self.paper_searcher.generate_unique_id(doi), 'title': entry['title'], 'authors': entry['authors'],
+                'year': entry['year'], 'doi': doi, 'url': entry['link'], 'citation_count': 0,
+                'api_source': 'crossref'})
+        return papers
+
+    def _record(self, feeds, results, now):
+        def write(conn):
+            for feed, result in zip(feeds, results):
+                retry = result['error'] is not None
+                conn.execute('''
+                    UPDATE feeds SET etag = ?, last_modified = ?, title = COALESCE(title, ?), last_checked_at = ?,
+                        last_status = ?, last_error = ?,
+                        next_check_at = ? + CASE WHEN ? THEN MIN(interval_minutes * 60, 900) ELSE interval_minutes * 60 END
+                    WHERE id = ?
+                ''', (result['etag'], result['last_modified'], result['title'], now, result['status'],
+                      result['error'], now, retry, feed['id']))
+                conn.executemany('''
+                    INSERT OR IGNORE INTO feed_entries (feed_id, entry_key, doi, seen_at) VALUES (?, ?, ?, ?)
+                ''', [(entry['feed_id'], entry['key'], entry['doi'], now) for entry in result['entries']])
+        self.db.write(write)
+
+    def run_forever(self, stop_event, tick=60):
+        while not stop_event.is_set():
+            try:
+                self.run_due()
+            except Exception as e:
+                logger.error("订阅检查出错: %s", e, exc_info=True)
+            stop_event.wait(tick)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="期刊订阅入库")
+    parser.add_argument('--db', default='data/papers.db')
+    sub = parser.add_subparsers(dest='action', required=True)
+    add = sub.add_parser('add')
+    add.add_argument('url')
+    add.add_argument('--title')
+    add.add_argument('--every', type=int, default=360, help='检查间隔（分钟）')
+    remove = sub.add_parser('remove')
+    remove.add_argument('url')
+    sub.add_parser('list')
+    run = sub.add_parser('run')
+    run.add_argument('--once', action='store_true')
+    run.add_argument('--tick', type=int, default=60)
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    paper_manager = PaperManager(args.db)
+    ingestor = FeedIngestor(paper_manager)
+    try:
+        if args.action == 'add':
+            ingestor.add_feed(args.url, args.title, args.every)
+        elif args.action == 'remove':
+            if not ingestor.remove_feed(args.url):
+                print(f"没有订阅 {args.url}")
+        elif args.action == 'list':
+            for feed in ingestor.list_feeds():
+                print(f"{feed['url']}\t{feed['title'] or ''}\t每 {feed['interval_minutes']} 分钟"
+                      f"\t状态 {feed['last_status']}" + (f"\t错误: {feed['last_error']}" if feed['last_error'] else ''))
+        elif args.once:
+            print(ingestor.run_due())
+        else:
+            stop = threading.Event()
+            try:
+                ingestor.run_forever(stop, args.tick)
+            except KeyboardInterrupt:
+                stop.set()
+    finally:
+        paper_manager.close()
+
+
+if __name__ == '__main__':
+    main()
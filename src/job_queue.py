@@ -0,0 +1,195 @@
+import json
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# 任务类型：检索入库、下载全文、提取文本、AI分析
+JOB_TYPES = ('search', 'download', 'extract', 'analyze')
+
+# 任务状态：queued 等待执行，running 已被某个工作进程租用，done 完成，failed 重试耗尽或不可重试，cancelled 已取消
+JOB_STATES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+
+class JobQueue:
+    """保存在 SQLite 中的持久任务队列
+
+    工作进程用 claim() 租用一个任务（带租约期限），执行期间用 heartbeat() 续约，
+    完成后调用 complete() 或 fail()。进程崩溃后租约过期，任务会被其他工作进程重新领取，
+    因此程序中途退出后批处理可以继续。jobs 表由 PaperManager 的迁移创建。
+    """
+
+    def __init__(self, db, retry_base=30, retry_max=3600):
+        self.db = db  # ConnectionManager
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+
+    @staticmethod
+    def new_batch(label):
+        """生成批次号，同一次操作提交的任务共用一个批次，便于查看进度"""
+        return f"{label}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+    def enqueue(self, job_type, payload, priority=0, batch=None, dedupe_key=None, max_attempts=3, delay=0):
+        ids = self.enqueue_many([{'type': job_type, 'payload': payload, 'priority': priority,
+                                  'dedupe_key': dedupe_key, 'max_attempts': max_attempts, 'delay': delay}], batch)
+        return ids[0] if ids else None
+
+    def enqueue_many(self, jobs, batch=None):
+        """一个事务提交多个任务，返回新任务的 ID 列表
+
+        dedupe_key 相同且仍在排队或执行中的任务只保留一个（例如同一篇论文的下载）。
+        """
+        now = time.time()
+        rows = []
+        for job in jobs:
+            if job['type'] not in JOB_TYPES:
+                raise ValueError(f"未知的任务类型: {job['type']}")
+            rows.append((job['type'], json.dumps(job.get('payload') or {}, ensure_ascii=False), job.get('priority', 0),
+                         job.get('max_attempts', 3), now + job.get('delay', 0), batch, job.get('dedupe_key'), now, now))
+
+        def write(conn):
+            ids = []
+            for row in rows:
+                cursor = conn.execute('''
+                    INSERT OR IGNORE INTO jobs
+                    (type, payload, priority, max_attempts, run_after, batch, dedupe_key, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', row)
+                if cursor.rowcount:
+                    ids.append(cursor.lastrowid)
+            return ids
+        ids = self.db.write(write)
+        logger.info("已提交 %s 个任务，批次: %s", len(ids), batch)
+        return ids
+
+    def claim(self, worker_id, job_types=None, lease_seconds=300):
+        """租用优先级最高的一个可执行任务，没有时返回 None
+
+        可执行的任务包括到期的排队任务和租约已过期（工作进程崩溃）的执行中任务。
+        """
+        types = json.dumps(list(job_types or JOB_TYPES))
+
+        def write(conn):
+            now = time.time()
+            # 租约过期且重试次数已用完的任务不再领取
+            conn.execute('''
+                UPDATE jobs SET state = 'failed', error = '租约过期，重试次数已用完', lease_owner = NULL, updated_at = ?
+                WHERE state = 'running' AND lease_until < ? AND attempts >= max_attempts
+            ''', (now, now))
+            row = conn.execute('''
+                UPDATE jobs SET state = 'running', attempts = attempts + 1,
+                    lease_owner = ?, lease_until = ?, updated_at = ?
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE ((state = 'queued' AND run_after <= ?) OR (state = 'running' AND lease_until < ?))
+                      AND type IN (SELECT value FROM json_each(?))
+                    ORDER BY priority DESC, id
+                    LIMIT 1)
+                RETURNING id, type, payload, attempts, max_attempts, batch
+            ''', (worker_id, now + lease_seconds, now, now, now, types)).fetchall()
+            return row[0] if row else None
+        row = self.db.write(write)
+        if row is None:
+            return None
+        return {'id': row[0], 'type': row[1], 'payload': json.loads(row[2]),
+                'attempts': row[3], 'max_attempts': row[4], 'batch': row[5]}
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=300):
+        """延长租约，返回 False 表示任务已不属于该工作进程"""
+        return bool(self.db.write(lambda conn: conn.execute('''
+            UPDATE jobs SET lease_until = ?, updated_at = ?
+            WHERE id = ? AND lease_owner = ? AND state = 'running'
+        ''', (time.time() + lease_seconds, time.time(), job_id, worker_id)).rowcount))
+
+    def complete(self, job_id, worker_id, result=None):
+        self.db.write(lambda conn: conn.execute('''
+            UPDATE jobs SET state = 'done', result = ?, error = NULL, lease_owner = NULL, lease_until = NULL, updated_at = ?
+            WHERE id = ? AND lease_owner = ?
+        ''', (json.dumps(result, ensure_ascii=False) if result is not None else None, time.time(), job_id, worker_id)))
+
+    def fail(self, job_id, worker_id, error, retryable=True):
+        """记录失败：可重试且未超过次数时按指数退避重新排队，否则标记为 failed"""
+        def write(conn):
+            row = conn.execute('SELECT attempts, max_attempts FROM jobs WHERE id = ? AND lease_owner = ?',
+                               (job_id, worker_id)).fetchone()
+            if row is None:
+                return None
+            attempts, max_attempts = row
+            now = time.time()
+            if retryable and attempts < max_attempts:
+                delay = min(self.retry_base * 2 ** (attempts - 1), self.retry_max)
+                conn.execute('''
+                    UPDATE jobs SET state = 'queued', run_after = ?, error = ?, lease_owner = NULL, lease_until = NULL,
+                        updated_at = ?
+                    WHERE id = ?
+                ''', (now + delay, error, now, job_id))
+                return 'queued'
+            conn.execute('''
+                UPDATE jobs SET state = 'failed', error = ?, lease_owner = NULL, lease_until = NULL, updated_at = ?
+                WHERE id = ?
+            ''', (error, now, job_id))
+            return 'failed'
+        return self.db.write(write)
+
+    def cancel_batch(self, batch):
+        """取消批次中尚未开始的任务，返回取消的数量"""
+        return self.db.write(lambda conn: conn.execute('''
+            UPDATE jobs SET state = 'cancelled', updated_at = ? WHERE batch = ? AND state = 'queued'
+        ''', (time.time(), batch)).rowcount)
+
+    def retry_failed(self, batch):
+        """把批次中失败的任务重新排队（重置重试次数），返回数量
+
+        与 enqueue_many 一样按 dedupe_key 去重：已有相同 dedupe_key 的任务在排队或执行中时不重新排队，
+        批次中多个相同 dedupe_key 的失败任务只重新排队最早的一个。
+        """
+        return self.db.write(lambda conn: conn.execute('''
+            UPDATE jobs SET state = 'queued', attempts = 0, run_after = ?, updated_at = ?
+            WHERE batch = ? AND state = 'failed' AND (dedupe_key IS NULL OR (
+                NOT EXISTS (SELECT 1 FROM jobs j2 WHERE j2.dedupe_key = jobs.dedupe_key
+                            AND j2.state IN ('queued', 'running'))
+                AND id = (SELECT MIN(id) FROM jobs j3 WHERE j3.dedupe_key = jobs.dedupe_key
+                          AND j3.batch = jobs.batch AND j3.state = 'failed')))
+        ''', (time.time(), time.time(), batch)).rowcount)
+
+    def batch_progress(self, batch):
+        """返回 {状态: 任务数}，包含所有状态（没有任务的状态为 0）"""
+        cursor = self.db.reader().cursor()
+        cursor.execute('SELECT state, COUNT(*) FROM jobs WHERE batch = ? GROUP BY state', (batch,))
+        progress = dict.fromkeys(JOB_STATES, 0)
+        progress.update(cursor.fetchall())
+        return progress
+
+    def batch_jobs(self, batch, states=None):
+        """返回批次中的任务（可按状态过滤），包含结果和错误信息"""
+        cursor = self.db.reader().cursor()
+        cursor.execute('''
+            SELECT id, type, payload, state, attempts, result, error FROM jobs
+            WHERE batch = ? AND state IN (SELECT value FROM json_each(?))
+            ORDER BY id
+        ''', (batch, json.dumps(list(states or JOB_STATES))))
+        return [{'id': row[0], 'type': row[1], 'payload': json.loads(row[2]), 'state': row[3], 'attempts': row[4],
+                 'result': json.loads(row[5]) if row[5] else None, 'error': row[6]} for row in cursor.fetchall()]
+
+    def unfinished_batches(self):
+        """还有排队或执行中任务的批次，程序重启后据此恢复进度显示"""
+        cursor = self.db.reader().cursor()
+        cursor.execute('''
+            SELECT DISTINCT batch FROM jobs WHERE state IN ('queued', 'running') AND batch IS NOT NULL
+        ''')
+        return [row[0] for row in cursor.fetchall()]
+
+    def pending_count(self, job_types=None):
+        cursor = self.db.reader().cursor()
+        cursor.execute('''
+            SELECT COUNT(*) FROM jobs WHERE state IN ('queued', 'running') AND type IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(list(job_types or JOB_TYPES)),))
+        return cursor.fetchone()[0]
+
+    def purge(self, older_than_days=30):
+        """删除早于指定天数的已完成/已取消任务"""
+        cutoff = time.time() - older_than_days * 86400
+        return self.db.write(lambda conn: conn.execute('''
+            DELETE FROM jobs WHERE state IN ('done', 'cancelled') AND updated_at < ?
+        ''', (cutoff,)).rowcount)
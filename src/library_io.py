@@ -0,0 +1,174 @@
+"""论文库的流式导出与导入
+
+导出按块读取数据库（PaperManager.iter_papers），逐块写出 JSONL / CSV / Parquet；
+导入按块读取文件，每块在一个写事务中合并（PaperManager.import_papers）。两者的内存占用都只与块大小有关。
+
+用法:
+    python -m src.library_io export library.jsonl --db data/papers.db
+    python -m src.library_io import library.jsonl --db data/papers.db
+    python -m src.library_io reindex --db data/papers.db     # 用库中全部论文重建向量索引
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+
+from .log_config import setup_logging
+from .paper_manager import PaperManager
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('jsonl', 'csv', 'parquet')
+
+# CSV 的列；作者用 "; " 分隔，来源和文件清单以 JSON 字符串保存
+CSV_FIELDS = ['id', 'title', 'authors', 'year', 'doi', 'pmid', 'pmcid', 'api_source', 'citation_count',
+              'downloaded', 'abstract', 'notes', 'ai_notes', 'sources', 'files']
+
+
+def detect_format(path, fmt=None):
+    fmt = (fmt or os.path.splitext(path)[1].lstrip('.')).lower()
+    if fmt == 'json':
+        fmt = 'jsonl'
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的格式: {fmt}，可选 {', '.join(FORMATS)}")
+    return fmt
+
+
+def _parquet_schema():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise RuntimeError("Parquet 格式需要安装 pyarrow") from None
+    source = pa.struct([('api_source', pa.string()), ('first_seen', pa.float64()), ('last_seen', pa.float64())])
+    file = pa.struct([('path', pa.string()), ('file_type', pa.string()), ('size', pa.int64()),
+                      ('sha256', pa.string()), ('mtime', pa.float64()), ('recorded_at', pa.float64())])
+    return pa.schema([
+        ('id', pa.string()), ('title', pa.string()), ('authors', pa.list_(pa.string())),
+        ('year', pa.int64()), ('doi', pa.string()), ('pmid', pa.string()), ('pmcid', pa.string()),
+        ('api_source', pa.string()), ('citation_count', pa.int64()), ('downloaded', pa.bool_()),
+        ('abstract', pa.string()), ('notes', pa.string()), ('ai_notes', pa.string()),
+        ('sources', pa.list_(source)), ('files', pa.list_(file)),
+    ])
+
+
+def _to_csv_row(paper):
+    row = dict(paper)
+    row['authors'] = '; '.join(paper['authors'])
+    row['downloaded'] = int(paper['downloaded'])
+    row['sources'] = json.dumps(paper['sources'], ensure_ascii=False)
+    row['files'] = json.dumps(paper['files'], ensure_ascii=False)
+    return row
+
+
+def _from_csv_row(row):
+    paper = {key: (value if value != '' else None) for key, value in row.items()}
+    paper['authors'] = [name for name in (row.get('authors') or '').split('; ') if name]
+    for key in ('year', 'citation_count'):
+        paper[key] = int(row[key]) if row.get(key) else None
+    paper['downloaded'] = row.get('downloaded') in ('1', 'true', 'True')
+    paper['sources'] = json.loads(row['sources']) if row.get('sources') else []
+    paper['files'] = json.loads(row['files']) if row.get('files') else []
+    return paper
+
+
+def export_library(paper_manager, path, fmt=None, chunk_size=5000):
+    """把整个论文库流式写到 path，返回导出的论文数"""
+    fmt = detect_format(path, fmt)
+    total = 0
+    start = time.perf_counter()
+    if fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = _parquet_schema()
+        with pq.ParquetWriter(path, schema) as writer:
+            for chunk in paper_manager.iter_papers(chunk_size):
+                writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                total += len(chunk)
+    else:
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS) if fmt == 'csv' else None
+            if writer:
+                writer.writeheader()
+            for chunk in paper_manager.iter_papers(chunk_size):
+                if writer:
+                    writer.writerows(_to_csv_row(paper) for paper in chunk)
+                else:
+                    f.writelines(json.dumps(paper, ensure_ascii=False) + '\n' for paper in chunk)
+                total += len(chunk)
+    elapsed = time.perf_counter() - start
+    logger.info("已导出 %s 篇论文到 %s，耗时 %.1f 秒", total, path, elapsed)
+    return total
+
+
+def read_library(path, fmt=None, chunk_size=5000):
+    """按块读取导出文件，每次产出一个论文字典列表"""
+    fmt = detect_format(path, fmt)
+    if fmt == 'parquet':
+        _parquet_schema()
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+        return
+    chunk = []
+    with open(path, encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            rows = (_from_csv_row(row) for row in csv.DictReader(f))
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for paper in rows:
+            chunk.append(paper)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_library(paper_manager, path, fmt=None, chunk_size=5000, index_vectors=True):
+    """把导出文件合并进论文库，每块一个写事务，返回导入的论文数"""
+    total = 0
+    start = time.perf_counter()
+    for chunk in read_library(path, fmt, chunk_size):
+        total += paper_manager.import_papers(chunk, index_vectors=index_vectors)
+    elapsed = time.perf_counter() - start
+    logger.info("已从 %s 导入 %s 篇论文，耗时 %.1f 秒", path, total, elapsed)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="论文库导出 / 导入")
+    parser.add_argument('action', choices=['export', 'import', 'reindex'])
+    parser.add_argument('path', nargs='?', help='导出或导入的文件（.jsonl / .csv / .parquet）')
+    parser.add_argument('--db', default='data/papers.db')
+    parser.add_argument('--format', choices=FORMATS, help='默认按文件扩展名判断')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--no-vectors', action='store_true', help='导入时不更新向量索引')
+    args = parser.parse_args(argv)
+    if args.action != 'reindex' and not args.path:
+        parser.error(f"{args.action} 需要指定文件")
+
+    setup_logging()
+    vector_index = None
+    if args.action == 'reindex' or args.action == 'import' and not args.no_vectors:
+        from .vector_index import VectorIndex
+        vector_index = VectorIndex(os.path.join(os.path.dirname(args.db) or '.', 'vector_index'))
+    paper_manager = PaperManager(args.db, vector_index=vector_index)
+    try:
+        if args.action == 'reindex':
+            paper_manager.rebuild_vector_index(args.chunk_size)
+            print(f"向量索引共 {len(vector_index)} 篇论文")
+            return
+        if args.action == 'export':
+            count = export_library(paper_manager, args.path, args.format, args.chunk_size)
+        else:
+            count = import_library(paper_manager, args.path, args.format, args.chunk_size,
+                                   index_vectors=not args.no_vectors)
+    finally:
+        paper_manager.close()
+    print(f"{'导出' if args.action == 'export' else '导入'} {count} 篇论文")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import dashscope
+from dashscope import Generation
+from requests.exceptions import Timeout
+
+logger = logging.getLogger(__name__)
+
+
+class LLMError(Exception):
+    """大模型调用失败的基类；这些错误不应作为AI笔记保存"""
+    retryable = False
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMTimeoutError(LLMError):
+    retryable = True
+
+
+class LLMRateLimitError(LLMError):
+    retryable = True
+
+
+class LLMServiceError(LLMError):
+    """服务端 5xx 或网络错误"""
+    retryable = True
+
+
+class LLMRequestError(LLMError):
+    """请求本身有问题（4xx），重试没有意义"""
+
+
+class LLMResponseError(LLMError):
+    """响应格式不符合预期"""
+
+
+class CircuitOpenError(LLMError):
+    """熔断器打开，直接失败而不再请求服务"""
+
+
+class CircuitBreaker:
+    """基于最近调用错误率的熔断器
+
+    最近 window 次调用中至少有 min_calls 次且错误率达到 failure_threshold 时打开；
+    打开 reset_timeout 秒后进入半开状态，放行一次试探调用，成功则关闭，失败则重新打开。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=0.5, window=20, min_calls=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.outcomes = deque(maxlen=window)
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                logger.info("熔断器试探调用成功，恢复正常")
+                self.state = self.CLOSED
+                self.outcomes.clear()
+            self.outcomes.append(True)
+
+    def record_failure(self):
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return
+            self.outcomes.append(False)
+            failures = self.outcomes.count(False)
+            if (self.state == self.CLOSED and len(self.outcomes) >= self.min_calls and
+                    failures / len(self.outcomes) >= self.failure_threshold):
+                self._open()
+
+    def _open(self):
+        logger.warning("大模型服务错误率过高，熔断器打开 %s 秒", self.reset_timeout)
+        self.state = self.OPEN
+        self.opened_at = self.clock()
+        self.probe_in_flight = False
+
+
+class LLMClient:
+    """带超时、抖动重试和熔断的通义千问调用封装
+
+    generation 默认为 dashscope 的 Generation，可替换为任何带有相同 call 接口的对象；
+    base_url 可指向本地模拟服务（见 mock_services.MockDashScopeServer）。
+    """
+
+    def __init__(self, generation=None, timeout=60, max_retries=3, backoff_base=1.0, backoff_max=20.0,
+                 breaker: Optional[CircuitBreaker] = None, base_url: Optional[str] = None, sleep=time.sleep):
+        self.generation = generation or Generation
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+        if base_url:
+            dashscope.base_http_api_url = base_url
+
+    def complete(self, model: str, prompt: str, **kwargs) -> str:
+        """调用模型并返回文本内容，失败时抛出 LLMError 的子类"""
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError("大模型服务暂时不可用（熔断中）")
+            try:
+                content = self._call_once(model, prompt, **kwargs)
+            except LLMError as e:
+                if e.retryable:
+                    self.breaker.record_failure()
+                else:
+                    # 4xx 等请求错误说明服务本身是通的
+                    self.breaker.record_success()
+                if not e.retryable or attempt >= self.max_retries:
+                    raise
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                attempt += 1
+                logger.warning("大模型调用失败（%s），%.1f 秒后第 %s 次重试", e, delay, attempt)
+                self.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return content
+
+    def _call_once(self, model, prompt, **kwargs):
+        try:
+            response = self.generation.call(
+                model=model,
+                prompt=prompt,
+                result_format='message',
+                request_timeout=self.timeout,
+                **kwargs
+            )
+        except Timeout as e:
+            raise LLMTimeoutError(f"大模型调用超时: {e}") from e
+        except Exception as e:
+            raise LLMServiceError(f"大模型调用异常: {e}") from e
+
+        if response is None:
+            raise LLMServiceError("大模型无响应")
+        status = response.status_code
+        if status != 200:
+            message = f"API调用失败: {status} {getattr(response, 'code', '')} {getattr(response, 'message', '')}".strip()
+            if status == 429:
+                raise LLMRateLimitError(message, status)
+            if status == 408:
+                raise LLMTimeoutError(message, status)
+            if status >= 500:
+                raise LLMServiceError(message, status)
+            raise LLMRequestError(message, status)
+
+        try:
+            return response.output.choices[0]['message']['content']
+        except (AttributeError, IndexError, KeyError, TypeError) as e:
+            raise LLMResponseError(f"API响应格式不符合预期: {response}") from e
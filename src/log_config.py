@@ -0,0 +1,117 @@
+"""日志配置：队列化输出、按模块设置级别、热点路径限流
+
+根记录器只挂一个 QueueHandler，调用方线程只把记录放进内存队列；写文件、写控制台由 QueueListener 的
+后台线程完成，GUI 线程和工作线程不会因为磁盘或终端输出而阻塞。
+
+环境变量:
+    LOG_LEVEL   根级别，默认 INFO
+    LOG_LEVELS  按模块设置级别，例如 "src.paper_searcher=WARNING,src.worker=DEBUG"
+    LOG_RATE    每个调用位置每秒最多输出的 INFO 及以下记录数（默认 20，0 表示不限）；
+                WARNING 及以上不受限制，被省略的条数附在该位置下一条输出的记录后
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+from .rate_limiter import RateLimiter
+
+CONSOLE_FORMAT = '%(name)-12s: %(levelname)-8s %(message)s'
+FILE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+_lock = threading.Lock()
+
+
+class RateLimitFilter(logging.Filter):
+    """按调用位置（模块 + 行号）限流，每个位置一个令牌桶"""
+
+    def __init__(self, rate=20, burst=None, max_level=logging.INFO):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate * 2)
+        self.max_level = max_level
+        self.limiters = {}
+        self.suppressed = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > self.max_level or not self.rate:
+            return True
+        key = (record.pathname, record.lineno)
+        with self.lock:
+            limiter = self.limiters.get(key)
+            if limiter is None:
+                limiter = self.limiters[key] = RateLimiter(self.rate, self.burst)
+            if not limiter.try_acquire():
+                self.suppressed[key] = self.suppressed.get(key, 0) + 1
+                return False
+            skipped = self.suppressed.pop(key, 0)
+        if skipped:
+            record.msg = f"{record.msg}（此前已省略 {skipped} 条同类日志）"
+        return True
+
+
+def parse_levels(spec):
+    """"a=INFO,b.c=DEBUG" -> {'a': 20, 'b.c': 10}，无法识别的项忽略"""
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.partition('=')
+        level = logging.getLevelName(level.strip().upper())
+        if name.strip() and isinstance(level, int):
+            levels[name.strip()] = level
+    return levels
+
+
+def setup_logging(level=None, log_file=None, console=True, file_mode='w', module_levels=None, rate=None, fmt=None):
+    """配置根记录器，返回 QueueListener；重复调用时直接返回已有的监听器
+
+    进程退出时自动停止监听器并写完队列中剩余的记录。
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+        handlers = []
+        if log_file:
+            os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+            file_handler = logging.FileHandler(log_file, mode=file_mode, encoding='utf-8')
+            file_handler.setFormatter(logging.Formatter(fmt or FILE_FORMAT))
+            handlers.append(file_handler)
+        if console:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT if log_file else fmt or FILE_FORMAT))
+            handlers.append(console_handler)
+
+        queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        rate = rate if rate is not None else float(os.getenv('LOG_RATE', '20'))
+        if rate:
+            queue_handler.addFilter(RateLimitFilter(rate))
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level if level is not None else os.getenv('LOG_LEVEL', 'INFO').upper())
+        levels = parse_levels(os.getenv('LOG_LEVELS'))
+        levels.update(module_levels or {})
+        for name, module_level in levels.items():
+            logging.getLogger(name).setLevel(module_level)
+        # 第三方库的调试输出默认不需要
+        for name in ('urllib3', 'PyPDF2'):
+            if name not in levels:
+                logging.getLogger(name).setLevel(logging.WARNING)
+
+        _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+
+def stop_logging():
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
@@ -1,18 +1,24 @@
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QPushButton, QLineEdit, QTableWidget, QLabel, 
-                             QMessageBox, QComboBox, QTableWidgetItem, QHeaderView,
-                             QDialog, QTextEdit, QProgressDialog)
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QColor
+                             QPushButton, QLineEdit, QTableView, QLabel, 
+                             QMessageBox, QComboBox, QHeaderView,
+                             QDialog, QTextEdit, QProgressBar, QInputDialog)
+from PyQt6.QtCore import Qt, QTimer
 from .paper_searcher import PaperSearcher
 from .paper_manager import PaperManager
 from .ai_processor import AIProcessor
 from .database_viewer import DatabaseViewer
+from .vector_index import VectorIndex
+from .delegates import HighlightDelegate
+from .table_models import PaperResultsModel, PaperFilterProxyModel
+from .job_queue import JobQueue
+from .worker import WorkerPool
+from .alerts import SavedSearches
+from . import profiling
 import logging
 import os
 from dotenv import load_dotenv
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 class NotesDialog(QDialog):
     def __init__(self, parent=None, notes=''):
@@ -45,18 +51,38 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("学术助手")
         self.setGeometry(100, 100, 1000, 600)
 
+        # 加载环境变量
+        load_dotenv()
+        # 包装各入口以便开启性能分析（须在连接信号之前）
+        profiling.install()
+
         self.paper_searcher = PaperSearcher()
-        self.paper_manager = PaperManager()
+        self.paper_manager = PaperManager(vector_index=VectorIndex())
         self.papers = []
         self.max_results = 10  # 默认值
 
-        # 加载环境变量
-        load_dotenv()
         self.ai_processor = AIProcessor(os.getenv('DASHSCOPE_API_KEY'))
 
+        # 下载和AI分析提交到持久任务队列，由后台工作进程执行，界面只显示进度
+        self.job_queue = JobQueue(self.paper_manager.db)
+        self.worker_pool = WorkerPool(self.paper_manager.db.db_path,
+                                      processes=int(os.getenv('WORKER_PROCESSES', '2')),
+                                      threads=int(os.getenv('WORKER_THREADS', '2')))
+        self.active_batches = []
+
         self.setup_ui()
 
+        # 上次退出时未完成的批次继续执行
+        for batch in self.job_queue.unfinished_batches():
+            self.watch_batch(batch)
+
     def setup_ui(self):
+        tools_menu = self.menuBar().addMenu("工具")
+        self.profile_action = tools_menu.addAction("性能分析")
+        self.profile_action.setCheckable(True)
+        self.profile_action.setChecked(profiling.profiler.enabled)
+        self.profile_action.toggled.connect(self.toggle_profiling)
+
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         layout = QVBoxLayout(central_widget)
@@ -84,9 +110,15 @@ class MainWindow(QMainWindow):
         search_button.clicked.connect(self.search_papers)
         clear_button = QPushButton("清空结果")
         clear_button.clicked.connect(self.clear_results)
+        batch_search_button = QPushButton("批量检索")
+        batch_search_button.clicked.connect(self.batch_search_papers)
+        alert_button = QPushButton("保存为提醒")
+        alert_button.clicked.connect(self.save_search_alert)
         search_layout.addWidget(self.search_input)
         search_layout.addWidget(search_button)
+        search_layout.addWidget(batch_search_button)
         search_layout.addWidget(clear_button)
+        search_layout.addWidget(alert_button)
         layout.addLayout(search_layout)
 
         # 年份筛选
@@ -99,14 +131,26 @@ class MainWindow(QMainWindow):
         filter_layout.addWidget(self.end_year)
         layout.addLayout(filter_layout)
 
-        # 论文表格
-        self.paper_table = QTableWidget()
-        self.paper_table.setColumnCount(10)  # 增加到10列，包括ID列
-        self.paper_table.setHorizontalHeaderLabels(["标题", "作者", "年份", "引用次数", "API来源", "DOI", "ID", "笔记", "下载状态", "AI笔记"])
+        # 结果筛选：只在已加载的结果中筛选，不重新查询数据库
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("在结果中筛选（标题、作者、年份、来源、DOI）")
+        self.filter_input.textChanged.connect(self.filter_results)
+        layout.addWidget(self.filter_input)
+
+        # 论文表格：模型 + 排序筛选代理，年份、引用次数按数值排序
+        self.results_model = PaperResultsModel(self)
+        self.results_proxy = PaperFilterProxyModel(self)
+        self.results_proxy.setSourceModel(self.results_model)
+        self.paper_table = QTableView()
+        self.paper_table.setModel(self.results_proxy)
         self.paper_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.paper_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.paper_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.paper_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.paper_table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.paper_table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
         self.paper_table.setSortingEnabled(True)
+        # 关键词高亮在绘制时由委托完成，只处理可见单元格
+        self.highlight_delegate = HighlightDelegate(self.paper_table)
+        self.paper_table.setItemDelegate(self.highlight_delegate)
         layout.addWidget(self.paper_table)
 
         # 下载按钮
@@ -140,101 +184,206 @@ class MainWindow(QMainWindow):
         self.view_ai_notes_button.clicked.connect(self.open_ai_notes_dialog)
         layout.addWidget(self.view_ai_notes_button)
 
+        # 添加相似论文按钮
+        self.similar_button = QPushButton("查找相似论文")
+        self.similar_button.clicked.connect(self.show_similar_papers)
+        layout.addWidget(self.similar_button)
+
         # 添加数据库浏览按钮
         self.db_viewer_button = QPushButton("浏览数据库")
         self.db_viewer_button.clicked.connect(self.open_database_viewer)
         layout.addWidget(self.db_viewer_button)
 
+        # 后台任务进度
+        job_layout = QHBoxLayout()
+        self.job_label = QLabel()
+        self.job_progress = QProgressBar()
+        job_layout.addWidget(self.job_label)
+        job_layout.addWidget(self.job_progress)
+        layout.addLayout(job_layout)
+        self.job_label.setVisible(False)
+        self.job_progress.setVisible(False)
+        self.job_timer = QTimer(self)
+        self.job_timer.setInterval(1000)
+        self.job_timer.timeout.connect(self.poll_jobs)
+
+    def toggle_profiling(self, enabled):
+        if enabled:
+            profiling.profiler.enable()
+            self.statusBar().showMessage(f"性能分析已开启，结果保存在 {os.path.abspath(profiling.profiler.output_dir)}")
+        else:
+            trace = profiling.profiler.disable()
+            self.statusBar().showMessage(f"性能分析已关闭" + (f"，计时记录: {trace}" if trace else ''))
+
     def on_api_changed(self, text):
         # 当选择 "PubMed Recent" 时显示时间范围选择器
         self.time_range_selector.setVisible(text == "PubMed Recent")
 
     def update_max_results(self, value):
         self.max_results = int(value)
-        logging.info(f"Updated max results to {self.max_results}")
+        logger.info("Updated max results to %s", self.max_results)
+
+    def search_options(self):
+        """当前界面选择的检索来源和条件，返回 (来源, 参数)，参数可直接传给 PaperSearcher.search / search_papers_batch"""
+        api_source = self.api_selector.currentText().lower()
+        if api_source == 'pubmed recent':
+            weeks, months = (1, None) if self.time_range_selector.currentText() == "过去一周" else (None, 1)
+            return 'pubmed_recent', {'max_results': self.max_results, 'weeks': weeks, 'months': months}
+        source = {'crossref': 'crossref', 'pubmed': 'pubmed', 'pmc open access': 'pmc'}[api_source]
+        return source, {'start_year': self.start_year.text(), 'end_year': self.end_year.text(),
+                        'max_results': self.max_results}
 
     def search_papers(self):
         keywords = self.search_input.text()
-        api_source = self.api_selector.currentText().lower()
 
         try:
-            if api_source == 'pubmed recent':
-                time_range = self.time_range_selector.currentText()
-                if time_range == "过去一周":
-                    new_papers = self.paper_searcher.get_latest_papers_pubmed(keywords, self.max_results, weeks=1)
-                else:  # 过去一个月
-                    new_papers = self.paper_searcher.get_latest_papers_pubmed(keywords, self.max_results, months=1)
-            elif api_source == 'crossref':
-                new_papers = self.paper_searcher.search_papers_crossref(keywords, self.start_year.text(), self.end_year.text(), self.max_results)
-            elif api_source == 'pubmed':
-                new_papers = self.paper_searcher.search_papers_pubmed(keywords, self.start_year.text(), self.end_year.text(), self.max_results)
-            elif api_source == 'pmc open access':
-                new_papers = self.paper_searcher.search_papers_pmc(keywords, self.start_year.text(), self.end_year.text(), self.max_results)
+            source, options = self.search_options()
+            new_papers = self.paper_searcher.search(source, keywords, **options)
 
             if new_papers:
-                for paper in new_papers:
-                    paper_id = self.paper_manager.add_paper(paper, paper['api_source'])  # 使用 paper['api_source']
-                    paper['id'] = paper_id
-                    logging.info(f"Added paper to database: {paper['title']} ID: {paper_id}")
+                # 一个事务批量写入，避免逐条提交
+                self.paper_manager.add_papers(new_papers)
+                logger.info("Added %s papers to database", len(new_papers))
 
                 self.papers = new_papers
                 self.update_paper_table()
             else:
                 QMessageBox.information(self, "搜索结果", "没有找到新的论文。")
         except Exception as e:
-            logging.error(f"搜索论文时发生错误: {str(e)}")
+            logger.error("搜索论文时发生错误: %s", e)
             QMessageBox.warning(self, "搜索错误", f"搜索论文时发生错误: {str(e)}")
 
-    def update_paper_table(self):
-        self.paper_table.setRowCount(len(self.papers))
-        for row, paper in enumerate(self.papers):
-            self.paper_table.setItem(row, 0, QTableWidgetItem(paper.get('title', '')))
-            self.paper_table.setItem(row, 1, QTableWidgetItem(', '.join(paper.get('authors', []))))
-            self.paper_table.setItem(row, 2, QTableWidgetItem(str(paper.get('year', 'N/A'))))
-            self.paper_table.setItem(row, 3, QTableWidgetItem(str(paper.get('citation_count', 'N/A'))))
-            self.paper_table.setItem(row, 4, QTableWidgetItem(paper.get('api_source', '').upper()))
-            self.paper_table.setItem(row, 5, QTableWidgetItem(paper.get('doi', 'N/A')))
-            self.paper_table.setItem(row, 6, QTableWidgetItem(str(paper.get('id', 'N/A'))))  # 显示编辑过的DOI作为ID
-            
-            notes = self.paper_manager.get_paper_notes(paper['id'])
-            has_notes = "有" if notes and notes.strip() else "无"
-            self.paper_table.setItem(row, 7, QTableWidgetItem(has_notes))
-
-            download_status = "已下载" if paper.get('downloaded', False) else "未下载"
-            self.paper_table.setItem(row, 8, QTableWidgetItem(download_status))
-
-            ai_notes = paper.get('ai_notes', '')
-            ai_notes_status = "有" if ai_notes else "无"
-            self.paper_table.setItem(row, 9, QTableWidgetItem(ai_notes_status))
+    def batch_search_papers(self):
+        """一次执行多个检索式（每行一个），结果合并去重后一次写入数据库"""
+        text, ok = QInputDialog.getMultiLineText(self, "批量检索", "每行一个检索式：")
+        queries = list(dict.fromkeys(line.strip() for line in text.splitlines() if line.strip()))
+        if not ok or not queries:
+            return
+        source, options = self.search_options()
+        try:
+            result = self.paper_searcher.search_papers_batch(queries, source, **options)
+        except Exception as e:
+            logger.error("批量检索时发生错误: %s", e)
+            QMessageBox.warning(self, "搜索错误", f"批量检索时发生错误: {str(e)}")
+            return
+        if result['papers']:
+            self.paper_manager.add_papers(result['papers'])
+            self.papers = result['papers']
+            self.update_paper_table()
+        lines = [f"{query}：{len(result['hits'][query])} 篇" if query in result['hits']
+                 else f"{query}：失败" for query in queries]
+        lines = [f"{line}（{result['errors'][query]}）" if query in result['errors'] else line
+                 for query, line in zip(queries, lines)]
+        QMessageBox.information(self, "批量检索结果",
+                                f"{len(queries)} 个检索式，去重后共 {len(result['papers'])} 篇论文\n\n" + '\n'.join(lines))
 
+    def update_paper_table(self):
+        # 一次批量查询所有行的笔记/AI笔记/下载状态，而不是每行查询一次
+        row_status = self.paper_manager.get_row_status([paper['id'] for paper in self.papers])
+        self.results_model.set_papers(self.papers, row_status)
         self.highlight_keywords(self.search_input.text())
 
-    def download_all_papers(self):
-        for paper in self.papers:
-            api_source = paper['api_source']
-            result = self.paper_searcher.download_or_get_abstract(paper, api_source)
-            
-            if result and result['type'] != 'error':
-                paper['downloaded'] = True
-                paper_id = paper.get('id')
-                if paper_id:
-                    self.paper_manager.update_paper_download_status(paper_id, True)
-            else:
-                paper['downloaded'] = False
+    def filter_results(self, text):
+        self.results_proxy.set_filter_text(text)
 
+    def selected_paper(self):
+        """返回当前选中的论文（经代理映射回源模型的行），没有选中时返回 None"""
+        selected_rows = self.paper_table.selectionModel().selectedRows()
+        if not selected_rows:
+            return None
+        return self.results_model.paper(self.results_proxy.mapToSource(selected_rows[0]).row())
+
+    def save_search_alert(self):
+        """把当前检索词保存为定期执行的检索，新论文由 python -m src.alerts run 自动入库并下载"""
+        keywords = self.search_input.text().strip()
+        if not keywords:
+            QMessageBox.warning(self, "警告", "请先输入检索词")
+            return
+        if self.api_selector.currentText() not in ("PubMed", "PubMed Recent"):
+            QMessageBox.warning(self, "警告", "新论文提醒目前只支持 PubMed")
+            return
+        name, ok = QInputDialog.getText(self, "保存为提醒", "提醒名称:", text=keywords)
+        if not ok or not name.strip():
+            return
+        SavedSearches(self.paper_manager.db).add(name.strip(), keywords, interval_minutes=1440,
+                                                 options={'download': True, 'analyze': False})
+        QMessageBox.information(self, "完成", f"已保存提醒「{name.strip()}」，每天检查一次新论文")
+
+    def download_all_papers(self):
+        if not self.papers:
+            QMessageBox.warning(self, "警告", "没有可下载的论文")
+            return
+        # 近似重复的论文（预印本 / 其他来源的同一篇）不再下载
+        row_status = self.paper_manager.get_row_status([paper['id'] for paper in self.papers])
+        paper_ids = [str(p['id']) for p in self.papers if not row_status.get(str(p['id']), {}).get('duplicate_of')]
+        if len(paper_ids) < len(self.papers):
+            logger.info("跳过 %s 篇重复论文", len(self.papers) - len(paper_ids))
+        batch = self.job_queue.new_batch('download')
+        self.job_queue.enqueue_many([{
+            'type': 'download',
+            'payload': {'paper_id': paper_id},
+            'dedupe_key': f"download:{paper_id}",
+        } for paper_id in paper_ids], batch)
+        self.watch_batch(batch)
+
+    def watch_batch(self, batch):
+        """在界面上跟踪一个批次的进度，并确保工作进程在运行"""
+        self.active_batches.append(batch)
+        self.worker_pool.start()
+        self.job_timer.start()
+        self.poll_jobs()
+
+    def poll_jobs(self):
+        total = finished = 0
+        for batch in list(self.active_batches):
+            progress = self.job_queue.batch_progress(batch)
+            batch_total = sum(progress.values())
+            if progress['queued'] == 0 and progress['running'] == 0:
+                self.active_batches.remove(batch)
+                self.finish_batch(batch, progress)
+                continue
+            total += batch_total
+            finished += batch_total - progress['queued'] - progress['running']
+        if not self.active_batches:
+            self.job_timer.stop()
+            self.job_label.setVisible(False)
+            self.job_progress.setVisible(False)
+            return
+        self.job_label.setText(f"后台任务 {finished}/{total}")
+        self.job_progress.setRange(0, total)
+        self.job_progress.setValue(finished)
+        self.job_label.setVisible(True)
+        self.job_progress.setVisible(True)
+
+    def finish_batch(self, batch, progress):
+        jobs = self.job_queue.batch_jobs(batch, ['done', 'failed'])
+        analyzed = [paper_id for job in jobs if job['type'] == 'analyze' and job['result']
+                    for paper_id in job['result']['paper_ids']]
+        # 工作进程不写向量索引，在这里补上它们入库的论文，并用新的AI笔记更新
+        self.paper_manager.index_missing_papers()
+        self.paper_manager.reindex_papers(analyzed)
         self.update_paper_table()
-        QMessageBox.information(self, "下载完成", "所有论文下载尝试已完成")
+        failed = [job for job in jobs if job['state'] == 'failed']
+        for job in failed:
+            logger.warning("任务失败，批次: %s, 任务: %s (%s), 原因: %s", batch, job['id'], job['type'], job['error'])
+        if batch.startswith('analyze'):
+            skipped = sum(job['result']['skipped'] for job in jobs if job['type'] == 'analyze' and job['result'])
+            errors = sum(len(job['result']['errors']) for job in jobs if job['type'] == 'analyze' and job['result'])
+            message = f"AI分析已完成：{len(analyzed)} 篇论文完成全文分析，{skipped} 篇未通过摘要初筛"
+            if errors or failed:
+                message += f"\n{errors + len(failed)} 项分析失败，可稍后重试"
+        else:
+            message = f"下载完成：成功 {progress['done']} 篇，失败 {progress['failed']} 篇"
+        QMessageBox.information(self, "后台任务完成", message)
 
     def clear_results(self):
         self.papers.clear()
-        self.paper_table.setRowCount(0)
-        logging.info("搜索结果已清空")
+        self.results_model.set_papers(self.papers)
+        logger.info("搜索结果已清空")
 
     def open_notes_dialog(self):
-        selected_rows = self.paper_table.selectionModel().selectedRows()
-        if selected_rows:
-            row = selected_rows[0].row()
-            paper = self.papers[row]
+        paper = self.selected_paper()
+        if paper:
             paper_id = paper.get('id')
             if paper_id:
                 current_notes = self.paper_manager.get_paper_notes(paper_id)
@@ -250,74 +399,35 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "错误", "请先选择一篇论文")
 
     def highlight_keywords(self, keywords):
-        if not keywords:
-            return
-
-        keywords = keywords.lower().split()
-        for row in range(self.paper_table.rowCount()):
-            for col in range(self.paper_table.columnCount()):
-                item = self.paper_table.item(row, col)
-                if item:
-                    text = item.text().lower()
-                    if any(keyword in text for keyword in keywords):
-                        item.setBackground(QColor(255, 255, 0, 100))  # 浅黄色背景
-                    else:
-                        item.setBackground(QColor(255, 255, 255))  # 白色背景
+        self.highlight_delegate.set_query(keywords)
+        self.paper_table.viewport().update()
 
     def process_papers_with_ai(self):
-        logging.info("开始AI论文处理流程")
-        
-        # 检查是否有已下载的论文
-        downloaded_papers = [p for p in self.papers if p.get('downloaded', False)]
-        logging.info(f"找到 {len(downloaded_papers)} 篇已下载的论文")
-        
-        if not downloaded_papers:
-            logging.warning("没有找到已下载的论文")
+        logger.info("开始AI论文处理流程")
+
+        # 检查是否有已下载的论文（以数据库中的状态为准，下载由工作进程完成）
+        row_status = self.paper_manager.get_row_status([paper['id'] for paper in self.papers])
+        downloaded_ids = [str(p['id']) for p in self.papers if row_status.get(str(p['id']), {}).get('downloaded')
+                          and not row_status[str(p['id'])]['duplicate_of']]
+        logger.info("找到 %s 篇已下载的论文", len(downloaded_ids))
+
+        if not downloaded_ids:
+            logger.warning("没有找到已下载的论文")
             QMessageBox.warning(self, "警告", "没有找到已下载的论文")
             return
 
-        # 显示进度对话框
-        progress = QProgressDialog("正在进行AI分析...", "取消", 0, len(downloaded_papers), self)
-        progress.setWindowModality(Qt.WindowModality.WindowModal)
-        progress.show()
-
-        try:
-            logging.info("开始调用AI处理器进行批量处理")
-            # 批量处理论文
-            results = self.ai_processor.batch_process_papers(downloaded_papers)
-            logging.info(f"AI处理完成，获得 {len(results)} 个结果")
-            
-            # 更新数据库和表格
-            for paper in downloaded_papers:
-                paper_id = paper['id']
-                logging.info(f"正在处理论文 ID: {paper_id}")
-                
-                if paper_id in results:
-                    ai_notes = results[paper_id]
-                    logging.info(f"更新论文AI笔记，ID: {paper_id}, 笔记长度: {len(ai_notes)}")
-                    self.paper_manager.update_paper_ai_notes(paper_id, ai_notes)
-                    paper['ai_notes'] = ai_notes
-                else:
-                    logging.warning(f"未找到论文的AI处理结果，ID: {paper_id}")
-            
-            # 更新表格显示
-            logging.info("更新表格显示")
-            self.update_paper_table()
-            logging.info("AI���理流程完成")
-            QMessageBox.information(self, "完成", "AI分析已完成")
-            
-        except Exception as e:
-            error_msg = f"AI处理过程中发生错误: {str(e)}"
-            logging.error(error_msg, exc_info=True)
-            QMessageBox.warning(self, "错误", f"AI处理失败: {str(e)}")
-        finally:
-            progress.close()
+        # 每个任务一组论文，保持摘要初筛的批量调用
+        chunk_size = self.ai_processor.triage_batch_size
+        batch = self.job_queue.new_batch('analyze')
+        self.job_queue.enqueue_many([{
+            'type': 'analyze',
+            'payload': {'paper_ids': downloaded_ids[start:start + chunk_size], 'triage': True},
+        } for start in range(0, len(downloaded_ids), chunk_size)], batch)
+        self.watch_batch(batch)
 
     def open_ai_notes_dialog(self):
-        selected_rows = self.paper_table.selectionModel().selectedRows()
-        if selected_rows:
-            row = selected_rows[0].row()
-            paper = self.papers[row]
+        paper = self.selected_paper()
+        if paper:
             paper_id = paper.get('id')
             if paper_id:
                 ai_notes = self.paper_manager.get_paper_ai_notes(paper_id)
@@ -333,7 +443,28 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.warning(self, "错误", "请先选择一篇论文")
 
+    def show_similar_papers(self):
+        paper = self.selected_paper()
+        if not paper:
+            QMessageBox.warning(self, "错误", "请先选择一篇论文")
+            return
+        similar = self.paper_manager.find_similar_papers(paper['id'], k=10)
+        if not similar:
+            QMessageBox.information(self, "提示", "库中没有找到相似论文")
+            return
+        lines = [f"{p['similarity']:.3f}  {p['title']} ({p['year']})  DOI: {p['doi']}" for p in similar]
+        dialog = NotesDialog(self, '\n\n'.join(lines))
+        dialog.setWindowTitle(f"与《{paper.get('title', '')[:40]}》相似的论文")
+        dialog.notes_edit.setReadOnly(True)
+        dialog.exec()
+
     def open_database_viewer(self):
         """打开数据库浏览器窗口"""
         self.db_viewer = DatabaseViewer(self.paper_manager)
         self.db_viewer.show()
+
+    def closeEvent(self, event):
+        # 未完成的任务保留在队列中，下次启动时继续
+        self.job_timer.stop()
+        self.worker_pool.stop(timeout=5)
+        super().closeEvent(event)
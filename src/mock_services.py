@@ -0,0 +1,249 @@
+"""本地模拟服务，用于在不访问外部接口的情况下测试客户端行为"""
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+from xml.sax.saxutils import escape
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class _MockServer:
+    """在后台线程中运行的本地 HTTP 服务基类"""
+
+    handler_class = None
+
+    def __init__(self):
+        self.httpd = None
+        self.thread = None
+        self.request_count = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        handler = type('Handler', (self.handler_class,), {'server_state': self})
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info("%s 已启动: %s", type(self).__name__, self.url)
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    server_state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _DashScopeHandler(_QuietHandler):
+    def do_POST(self):
+        state = self.server_state
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        status = state.next_status()
+        if state.delay:
+            time.sleep(state.delay)
+        if status != 200:
+            self.send_json(status, {'code': 'MockError', 'message': f'mock status {status}', 'request_id': 'mock'})
+            return
+        self.send_json(200, {
+            'request_id': 'mock',
+            'output': {'choices': [{'finish_reason': 'stop',
+                                    'message': {'role': 'assistant', 'content': state.reply(request)}}]},
+            'usage': {'input_tokens': 0, 'output_tokens': 0}
+        })
+
+
+class MockDashScopeServer(_MockServer):
+    """模拟 DashScope 文本生成接口
+
+    statuses 为依次返回的 HTTP 状态码（用完后一直返回200）；delay 为每次响应前的等待秒数，
+    可用来触发客户端超时。使用时把 LLMClient 的 base_url 设为 api_base_url。
+    """
+
+    handler_class = _DashScopeHandler
+
+    def __init__(self, statuses=None, delay=0.0, content='模拟分析结果'):
+        super().__init__()
+        self.statuses = list(statuses or [])
+        self.delay = delay
+        self.content = content
+
+    @property
+    def api_base_url(self):
+        return f"{self.url}/api/v1"
+
+    def next_status(self):
+        with self.lock:
+            self.request_count += 1
+            return self.statuses.pop(0) if self.statuses else 200
+
+    def reply(self, request):
+        return self.content(request) if callable(self.content) else self.content
+
+
+class _FeedHandler(_QuietHandler):
+    def do_GET(self):
+        state = self.server_state
+        path, _, query = self.path.partition('?')
+        with state.lock:
+            state.request_count += 1
+        if path == '/works':
+            self.send_json(200, {'status': 'ok', 'message': {'items': state.lookup_works(parse_qs(query))}})
+            return
+        feed = state.feeds.get(path)
+        if feed is None:
+            self.send_error(404)
+            return
+        etag, last_modified, body = feed
+        # 同时带两个条件时以 If-None-Match 为准（RFC 9110）
+        if 'If-None-Match' in self.headers:
+            not_modified = self.headers['If-None-Match'] == etag
+        else:
+            not_modified = self.headers.get('If-Modified-Since') == last_modified
+        if not_modified:
+            with state.lock:
+                state.not_modified_count += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/rss+xml; charset=utf-8')
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockFeedServer(_MockServer):
+    """模拟期刊 RSS 订阅和 Crossref 的 /works 接口
+
+    set_feed(path, items) 发布一个 RSS 订阅（items 为 {'title', 'doi', 'link'} 字典），内容变化时 ETag 随之变化，
+    带 If-None-Match / If-Modified-Since 的请求在内容未变时返回 304。works 为 {doi: Crossref 条目}，
+    用 filter=doi:... 查询时返回其中匹配的条目。使用时把 PaperSearcher.crossref_url 设为 crossref_url。
+    """
+
+    handler_class = _FeedHandler
+
+    def __init__(self, works=None):
+        super().__init__()
+        self.feeds = {}
+        self.works = {doi.lower(): item for doi, item in (works or {}).items()}
+        self.not_modified_count = 0
+        self.works_queries = []
+
+    @property
+    def crossref_url(self):
+        return f"{self.url}/works"
+
+    def feed_url(self, path):
+        return f"{self.url}{path}"
+
+    def set_feed(self, path, items, title='Mock Journal'):
+        entries = ''.join(
+            f"<item><title>{escape(item['title'])}</title><link>{escape(item.get('link', ''))}</link>"
+            f"<guid>{escape(item.get('guid') or item.get('link') or item['doi'])}</guid>"
+            f"<prism:doi>{escape(item.get('doi', ''))}</prism:doi></item>" for item in items)
+        body = (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0" '
+                f'xmlns:prism="http://prismstandard.org/namespaces/basic/2.0/"><channel><title>{escape(title)}</title>'
+                f'{entries}</channel></rss>').encode('utf-8')
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        self.feeds[path] = (etag, formatdate(time.time(), usegmt=True), body)
+
+    def lookup_works(self, query):
+        dois = [part[4:].lower() for part in query.get('filter', [''])[0].split(',') if part.startswith('doi:')]
+        with self.lock:
+            self.works_queries.append(dois)
+        return [self.works[doi] for doi in dois if doi in self.works]
+
+
+class MockGeneration:
+    """进程内模拟 dashscope 的 Generation（不经过 HTTP），用于负载测试
+
+    每次调用等待 latency + [0, jitter) 秒；按 error_rate 的概率返回 error_statuses 中的错误状态码，
+    按 timeout_rate 的概率抛出超时。初筛请求（提示词中带 "ID: " 行）返回合法的 JSON 评分，
+    其余请求返回 content。使用时传给 LLMClient(generation=MockGeneration(...))。
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_statuses=(429, 500, 503), timeout_rate=0.0,
+                 content='模拟分析结果', seed=None, sleep=time.sleep):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = list(error_statuses)
+        self.timeout_rate = timeout_rate
+        self.content = content
+        self.sleep = sleep
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.calls_by_model = {}
+
+    def call(self, model, prompt, result_format='message', request_timeout=None, **kwargs):
+        with self.lock:
+            self.calls += 1
+            self.calls_by_model[model] = self.calls_by_model.get(model, 0) + 1
+            roll = self.random.random()
+            delay = self.latency + self.random.random() * self.jitter
+            status = self.random.choice(self.error_statuses) if self.error_statuses else 500
+            score_seed = self.random.getrandbits(32)
+        if roll < self.timeout_rate:
+            with self.lock:
+                self.timeouts += 1
+            self.sleep(min(delay, request_timeout or delay))
+            raise requests.exceptions.Timeout("mock timeout")
+        self.sleep(delay)
+        if roll < self.timeout_rate + self.error_rate:
+            with self.lock:
+                self.errors += 1
+            return SimpleNamespace(status_code=status, code='MockError', message=f'mock status {status}',
+                                   output=None, usage=None)
+        ids = re.findall(r'^ID: (.+)$', prompt, re.M)
+        if ids:
+            rng = random.Random(score_seed)
+            content = json.dumps([{'id': paper_id, 'score': rng.randint(0, 10), 'study_type': 'basic'}
+                                  for paper_id in ids])
+        else:
+            content = self.content
+        return SimpleNamespace(status_code=200, code='', message='',
+                               output=SimpleNamespace(choices=[{'finish_reason': 'stop',
+                                                                'message': {'role': 'assistant', 'content': content}}]),
+                               usage={'input_tokens': len(prompt) // 4, 'output_tokens': len(content) // 4})
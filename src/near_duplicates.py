@@ -0,0 +1,423 @@
+"""近似重复论文检测（MinHash + LSH）
+
+同一项研究常以预印本和正式发表两个版本出现，或在 Crossref 和 PubMed 中标题略有不同，库中会成为两条记录。
+这里对规范化后的标题 + 摘要取字符 5-gram，计算 MinHash 签名并按 LSH 分桶保存在 SQLite 中：
+新论文入库时只需查询与自己同桶的论文（与库的大小无关），再用签名估计 Jaccard 相似度确认；
+成员超过 MAX_BUCKET_SIZE 的桶（大量论文共用同一种标题套路）不再参与比较，每篇论文的比较次数有上限。
+有摘要的论文按标题 + 摘要比较；任一方没有摘要时（Crossref 常见）只按标题比较，阈值更高。
+字符 k-gram 对一两个字符的差别不敏感，"Part 1" 与 "Part 2"、"phase II" 与 "phase III" 的标题几乎相同，
+所以签名相似之外还要求标题中的编号（数字和罗马数字）完全一致；只按标题比较时出版年份还要相近。
+
+确认为重复的论文在 papers.duplicate_of 中记录同组的规范论文（先入库的一篇），下载和 AI 分析会跳过它们。
+升级前已有的论文需要运行一次:
+    python -m src.near_duplicates index
+    python -m src.near_duplicates list
+    python -m src.near_duplicates canonical <paper_id>    # 把某篇设为所在组的规范论文
+"""
+import argparse
+import hashlib
+import html
+import json
+import logging
+import re
+import unicodedata
+
+import numpy as np
+
+from .log_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 5
+# 标题 + 摘要：16 段 × 6 行，相似度约 0.63 以上时大概率落入同一个桶
+FULL_BANDS, FULL_ROWS = 16, 6
+# 仅标题：8 段 × 4 行
+TITLE_BANDS, TITLE_ROWS = 8, 4
+FULL_PERM = FULL_BANDS * FULL_ROWS
+NUM_PERM = FULL_PERM + TITLE_BANDS * TITLE_ROWS
+JACCARD_THRESHOLD = 0.7
+TITLE_THRESHOLD = 0.85
+# 太短的标题（"Correction"、"Editorial" 等）不参与按标题比较
+MIN_TITLE_SHINGLES = 20
+# 只按标题比较时出版年份最多相差的年数（预印本与正式发表通常在一年之内）
+MAX_YEAR_GAP = 1
+# 成员超过该数的桶几乎没有区分度，查重时跳过，也不再加入新成员
+MAX_BUCKET_SIZE = 100
+# 批量比较签名时每次比较的 (论文, 候选) 对数，限制临时数组的大小
+PAIR_CHUNK = 20000
+
+# 哈希参数固定，签名才能跨进程、跨版本比较；修改后需要重新运行 index
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+_SHINGLE_BASE = np.uint64(1000003)
+_EMPTY = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_NON_WORD_RE = re.compile(r'[\W_]+')
+_ROMAN = {'i': 1, 'ii': 2, 'iii': 3, 'iv': 4, 'v': 5, 'vi': 6, 'vii': 7, 'viii': 8, 'ix': 9, 'x': 10}
+
+
+def normalize(text):
+    """去掉 HTML/JATS 标签和标点，统一全半角和大小写"""
+    text = unicodedata.normalize('NFKC', _TAG_RE.sub(' ', html.unescape(text or '')))
+    return _NON_WORD_RE.sub(' ', text.lower()).strip()
+
+
+def title_numbers(title):
+    """标题中作为独立单词出现的数字和罗马数字（Part 1、phase II、IL-6 等），罗马数字换算为整数"""
+    return frozenset(int(token) if token.isdecimal() else _ROMAN[token]
+                     for token in normalize(title).split() if token.isdecimal() or token in _ROMAN)
+
+
+def shingle_hashes(text):
+    """规范化文本的字符 k-gram 的 64 位哈希（不去重，重复的 k-gram 不影响 MinHash）"""
+    if not text:
+        return np.empty(0, dtype=np.uint64)
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    if len(codes) < SHINGLE_SIZE:
+        codes = np.pad(codes, (0, SHINGLE_SIZE - len(codes)))
+    count = len(codes) - SHINGLE_SIZE + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        hashes = hashes * _SHINGLE_BASE + codes[offset:offset + count]
+    return hashes
+
+
+def minhash(hashes, a, b):
+    if not len(hashes):
+        return _EMPTY[:len(a)]
+    # 乘法移位哈希：uint64 运算按 2^64 取模，取高 32 位；右移是单调的，先取最小值再移位，结果相同
+    values = np.multiply.outer(hashes, a)
+    values += b
+    return (values.min(axis=0) >> np.uint64(32)).astype(np.uint32)
+
+
+def signature(title, abstract=None):
+    """返回 (签名, 是否有摘要, 标题是否足够长)；签名前 FULL_PERM 个值对应标题 + 摘要，其余对应标题"""
+    title = normalize(title)
+    title_hashes = shingle_hashes(title)
+    abstract = normalize(abstract)
+    if abstract:
+        sig = np.concatenate([minhash(shingle_hashes(f"{title} {abstract}"), _A[:FULL_PERM], _B[:FULL_PERM]),
+                              minhash(title_hashes, _A[FULL_PERM:], _B[FULL_PERM:])])
+    else:
+        sig = minhash(title_hashes, _A, _B)  # 没有摘要时两部分都只来自标题，一次算完
+    return sig, bool(abstract), len(np.unique(title_hashes)) >= MIN_TITLE_SHINGLES
+
+
+def _bucket_key(values):
+    return int.from_bytes(hashlib.blake2b(values.tobytes(), digest_size=8).digest(), 'little', signed=True)
+
+
+def band_keys(sig, has_abstract, title_ok):
+    """[(段号, 桶)]：有摘要时 0..FULL_BANDS-1 为标题 + 摘要的段，标题足够长时其后为标题的段"""
+    keys = []
+    if has_abstract:
+        keys += [(band, _bucket_key(sig[band * FULL_ROWS:(band + 1) * FULL_ROWS])) for band in range(FULL_BANDS)]
+    if title_ok:
+        keys += [(FULL_BANDS + band, _bucket_key(sig[FULL_PERM + band * TITLE_ROWS:FULL_PERM + (band + 1) * TITLE_ROWS]))
+                 for band in range(TITLE_BANDS)]
+    return keys
+
+
+class NearDuplicateIndex:
+    """paper_minhash / minhash_buckets 表和 papers.duplicate_of 的维护
+
+    prepare() 只做计算，可在写事务之外调用；assign() 在 ConnectionManager 的写任务中执行，
+    与论文本身的写入处于同一个事务，同一批中互相重复的论文也能识别。
+    """
+
+    def __init__(self, db, threshold=JACCARD_THRESHOLD, title_threshold=TITLE_THRESHOLD):
+        self.db = db  # ConnectionManager
+        self.threshold = threshold
+        self.title_threshold = title_threshold
+
+    @staticmethod
+    def prepare(papers):
+        """papers 为 [(paper_id, 标题, 摘要)]，返回 [(paper_id, 签名, 是否有摘要, 标题是否足够长, 分桶)]"""
+        prepared = []
+        for paper_id, title, abstract in papers:
+            sig, has_abstract, title_ok = signature(title, abstract)
+            prepared.append((str(paper_id), sig, has_abstract, title_ok, band_keys(sig, has_abstract, title_ok)))
+        return prepared
+
+    def similarity(self, sig, has_abstract, others, others_has_abstract):
+        """按行比较签名（sig 为一个签名时与 others 的每一行比较），返回 (估计的 Jaccard 相似度数组, 各自使用的阈值数组)
+
+        双方都有摘要时比较标题 + 摘要，否则比较标题。
+        """
+        both = np.asarray(others_has_abstract, dtype=bool) & has_abstract
+        equal = others == sig
+        full = equal[:, :FULL_PERM].mean(axis=1)
+        title = equal[:, FULL_PERM:].mean(axis=1)
+        return np.where(both, full, title), np.where(both, self.threshold, self.title_threshold)
+
+    @staticmethod
+    def same_study(title, year, other_title, other_year, title_only):
+        """签名已经相似的两篇论文能否认定为同一研究：标题编号一致，只按标题比较时年份相近"""
+        if title_numbers(title) != title_numbers(other_title):
+            return False
+        if not title_only:
+            return True
+        try:
+            return abs(int(year) - int(other_year)) <= MAX_YEAR_GAP
+        except (TypeError, ValueError):
+            return True  # 缺少年份时只看签名
+
+    def is_duplicate(self, paper, other):
+        """两篇论文（含 title、abstract、year 的字典）是否会被判为重复，用于检查阈值和编号规则"""
+        sig, has_abstract, title_ok = signature(paper.get('title'), paper.get('abstract'))
+        other_sig, other_has_abstract, other_title_ok = signature(other.get('title'), other.get('abstract'))
+        title_only = not (has_abstract and other_has_abstract)
+        if title_only and not (title_ok and other_title_ok):
+            return False  # 标题太短的论文没有标题分桶，不会按标题比较
+        scores, thresholds = self.similarity(sig, has_abstract, other_sig[None], [other_has_abstract])
+        return bool(scores[0] >= thresholds[0]) and self.same_study(
+            paper.get('title'), paper.get('year'), other.get('title'), other.get('year'), title_only)
+
+    def assign(self, conn, prepared):
+        """写入签名和分桶，为新发现的重复论文设置 duplicate_of，返回 {paper_id: 规范论文 ID}
+
+        整批论文的同桶成员、候选签名各用一次查询读取；先列出整批的 (论文, 候选) 对，
+        再用 numpy 一次计算全部相似度，只有达到阈值的少数几对逐一确定规范论文。
+        先处理的论文加入内存中的桶，同一批中互相重复的论文也能识别。
+        """
+        prepared = list({item[0]: item for item in prepared}.values())  # 同一批中重复出现的论文以最后一次为准
+        old = {row[0]: row[1:] for row in conn.execute('''
+            SELECT paper_id, signature, has_abstract, title_ok FROM paper_minhash
+            WHERE paper_id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps([item[0] for item in prepared]),))}
+        pending = []
+        for item in prepared:
+            paper_id, sig, has_abstract = item[:3]
+            if paper_id in old:
+                previous = old.pop(paper_id)
+                if previous[0] == sig.tobytes() and bool(previous[1]) == has_abstract:
+                    continue  # 标题和摘要没有变化（例如同一篇论文再次被检索到）
+                self._remove_buckets(conn, paper_id, previous)
+            pending.append(item)
+        if not pending:
+            return {}
+
+        buckets = self._bucket_members(conn, {key for *_, keys in pending for key in keys})
+        pending_ids = {item[0] for item in pending}
+        candidate_ids = pending_ids.union(*(members for members in buckets.values() if members))
+        # 整批用到的签名放在一个矩阵中，按行号取出
+        matrix = np.empty((len(candidate_ids), NUM_PERM), dtype=np.uint32)
+        abstract_flags = np.zeros(len(candidate_ids), dtype=bool)
+        row_ids, rows, duplicate_of, has_dependents, details = [], {}, {}, set(), {}
+
+        def add_row(paper_id, sig, has_abstract):
+            rows[paper_id] = len(row_ids)
+            matrix[len(row_ids)], abstract_flags[len(row_ids)] = sig, has_abstract
+            row_ids.append(paper_id)
+            return rows[paper_id]
+
+        for paper_id, parent, dependents, title, year, other, other_has_abstract in conn.execute('''
+            SELECT p.id, p.duplicate_of, EXISTS (SELECT 1 FROM papers d WHERE d.duplicate_of = p.id),
+                   p.title, p.year, m.signature, m.has_abstract
+            FROM papers p LEFT JOIN paper_minhash m ON m.paper_id = p.id
+            WHERE p.id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(list(candidate_ids)),)):
+            duplicate_of[paper_id] = parent
+            details[paper_id] = (title, year)
+            if dependents:
+                has_dependents.add(paper_id)
+            if other is not None and paper_id not in pending_ids:
+                add_row(paper_id, np.frombuffer(other, dtype=np.uint32), bool(other_has_abstract))
+
+        # 桶成员换成矩阵行号；已删除的论文没有行号，不再作为候选
+        buckets = {key: None if members is None else {rows[member] for member in members if member in rows}
+                   for key, members in buckets.items()}
+        paper_rows, candidate_rows, new_buckets = [], [], []
+        for paper_id, sig, has_abstract, _, keys in pending:
+            candidates = set().union(*(buckets[key] for key in keys if buckets.get(key)))
+            candidate_rows.append(np.fromiter(candidates, dtype=np.int64, count=len(candidates)))
+            paper_rows.append(add_row(paper_id, sig, has_abstract))
+            for key in keys:
+                members = buckets.setdefault(key, set())
+                if members is None:
+                    continue  # 已经超过上限的桶不再加入新成员，表中每个桶最多 MAX_BUCKET_SIZE + 1 篇
+                members.add(paper_rows[-1])
+                new_buckets.append((*key, paper_id))
+                if len(members) > MAX_BUCKET_SIZE:
+                    buckets[key] = None
+        pair_papers = np.repeat(np.arange(len(pending)), [len(candidates) for candidates in candidate_rows])
+        pair_candidates = np.concatenate(candidate_rows)
+
+        flagged = {}
+        for index, matches in self._matching_pairs(matrix, abstract_flags, np.array(paper_rows)[pair_papers],
+                                                   pair_candidates, pair_papers).items():
+            paper_id = pending[index][0]
+            # 已经是某一组的规范论文或已标记的论文保持不变
+            if paper_id not in duplicate_of or duplicate_of[paper_id] is not None or paper_id in has_dependents:
+                continue
+            title_only = not abstract_flags[paper_rows[index]]
+            canonicals = [duplicate_of[row_ids[row]] or row_ids[row] for row in matches
+                          if self.same_study(*details[paper_id], *details[row_ids[row]],
+                                             title_only or not abstract_flags[row])]
+            match = next((canonical for canonical in canonicals if canonical != paper_id), None)
+            if match is not None:
+                conn.execute('UPDATE papers SET duplicate_of = ? WHERE id = ?', (match, paper_id))
+                duplicate_of[paper_id] = flagged[paper_id] = match
+                has_dependents.add(match)
+
+        conn.executemany('''
+            INSERT OR REPLACE INTO paper_minhash (paper_id, signature, has_abstract, title_ok) VALUES (?, ?, ?, ?)
+        ''', [(paper_id, sig.tobytes(), int(has_abstract), int(title_ok))
+              for paper_id, sig, has_abstract, title_ok, _ in pending])
+        conn.executemany('INSERT OR IGNORE INTO minhash_buckets (band, bucket, paper_id) VALUES (?, ?, ?)', new_buckets)
+        return flagged
+
+    @staticmethod
+    def _bucket_members(conn, keys):
+        """{(段号, 桶): 成员 ID 集合}，只包含非空的桶；成员超过 MAX_BUCKET_SIZE 的桶为 None"""
+        buckets = {}
+        by_band = {}
+        for band, bucket in keys:
+            by_band.setdefault(band, []).append(bucket)
+        for band, band_buckets in by_band.items():
+            for bucket, paper_id in conn.execute(
+                    'SELECT bucket, paper_id FROM minhash_buckets WHERE band = ? AND bucket IN (SELECT value FROM json_each(?))',
+                    (band, json.dumps(band_buckets))):
+                buckets.setdefault((band, bucket), set()).add(paper_id)
+        for key, members in buckets.items():
+            if len(members) > MAX_BUCKET_SIZE:
+                buckets[key] = None
+        return buckets
+
+    def _matching_pairs(self, matrix, abstract_flags, paper_rows, candidate_rows, paper_indexes):
+        """分块计算全部 (论文行号, 候选行号) 对的相似度
+
+        返回 {论文序号: [达到阈值的候选行号，相似度从高到低]}，按论文序号排列。
+        """
+        scores = np.empty(len(paper_rows))
+        thresholds = np.empty(len(paper_rows))
+        for start in range(0, len(paper_rows), PAIR_CHUNK):
+            chunk = slice(start, start + PAIR_CHUNK)
+            scores[chunk], thresholds[chunk] = self.similarity(
+                matrix[paper_rows[chunk]], abstract_flags[paper_rows[chunk]],
+                matrix[candidate_rows[chunk]], abstract_flags[candidate_rows[chunk]])
+        passed = np.flatnonzero(scores >= thresholds)
+        passed = passed[np.lexsort((candidate_rows[passed], -scores[passed], paper_indexes[passed]))]
+        matches = {}
+        for index, row in zip(paper_indexes[passed].tolist(), candidate_rows[passed].tolist()):
+            matches.setdefault(index, []).append(row)
+        return matches
+
+    @staticmethod
+    def _remove_buckets(conn, paper_id, old):
+        sig = np.frombuffer(old[0], dtype=np.uint32)
+        conn.executemany('DELETE FROM minhash_buckets WHERE band = ? AND bucket = ? AND paper_id = ?',
+                         [(band, bucket, paper_id) for band, bucket in band_keys(sig, bool(old[1]), bool(old[2]))])
+
+    def remove(self, conn, paper_id):
+        """删除论文前调用（在同一个写任务中）：清除签名；它是规范论文时，组内最早入库的一篇接替"""
+        old = conn.execute('SELECT signature, has_abstract, title_ok FROM paper_minhash WHERE paper_id = ?',
+                           (paper_id,)).fetchone()
+        if old is not None:
+            self._remove_buckets(conn, paper_id, old)
+            conn.execute('DELETE FROM paper_minhash WHERE paper_id = ?', (paper_id,))
+        successor = conn.execute('SELECT id FROM papers WHERE duplicate_of = ? ORDER BY seq LIMIT 1',
+                                 (paper_id,)).fetchone()
+        if successor is not None:
+            self._make_canonical(conn, successor[0], paper_id)
+
+    @staticmethod
+    def _make_canonical(conn, paper_id, old_canonical):
+        conn.execute('UPDATE papers SET duplicate_of = ? WHERE duplicate_of = ? AND id != ?',
+                     (paper_id, old_canonical, paper_id))
+        conn.execute('UPDATE papers SET duplicate_of = NULL WHERE id = ?', (paper_id,))
+
+    def set_canonical(self, paper_id):
+        """把论文设为所在组的规范论文（例如正式发表版本晚于预印本入库时），返回原来的规范论文 ID"""
+        def write(conn):
+            row = conn.execute('SELECT duplicate_of FROM papers WHERE id = ?', (paper_id,)).fetchone()
+            if row is None or row[0] is None:
+                return None
+            self._make_canonical(conn, paper_id, row[0])
+            conn.execute('UPDATE papers SET duplicate_of = ? WHERE id = ?', (paper_id, row[0]))
+            return row[0]
+        return self.db.write(write)
+
+    def index_missing(self, chunk_size=2000, progress=None):
+        """为还没有签名的论文（升级前入库的）按入库顺序计算签名并查重，返回新标记的重复论文数"""
+        cursor = self.db.reader().cursor()
+        cursor.execute('SELECT COUNT(*) FROM papers WHERE id NOT IN (SELECT paper_id FROM paper_minhash)')
+        total = cursor.fetchone()[0]
+        done = flagged = 0
+        after = 0
+        while True:
+            cursor.execute('''
+                SELECT seq, id, title, abstract FROM papers
+                WHERE seq > ? AND id NOT IN (SELECT paper_id FROM paper_minhash)
+                ORDER BY seq LIMIT ?
+            ''', (after, chunk_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            after = rows[-1][0]
+            prepared = self.prepare([row[1:] for row in rows])
+            flagged += len(self.db.write(self.assign, prepared))
+            done += len(rows)
+            if progress:
+                progress(done, total)
+        logger.info("近似重复索引: 新计算 %s 篇，标记重复 %s 篇", done, flagged)
+        return flagged
+
+    def clusters(self, limit=100):
+        """重复组：[{'canonical': {...}, 'duplicates': [{...}]}]，按组大小排序"""
+        cursor = self.db.reader().cursor()
+        cursor.execute('''
+            SELECT duplicate_of, COUNT(*) FROM papers WHERE duplicate_of IS NOT NULL
+            GROUP BY duplicate_of ORDER BY COUNT(*) DESC LIMIT ?
+        ''', (limit,))
+        canonical_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute('''
+            SELECT id, title, year, doi, api_source, COALESCE(duplicate_of, id) FROM papers
+            WHERE id IN (SELECT value FROM json_each(?1)) OR duplicate_of IN (SELECT value FROM json_each(?1))
+            ORDER BY seq
+        ''', (json.dumps(canonical_ids),))
+        groups = {paper_id: {'canonical': None, 'duplicates': []} for paper_id in canonical_ids}
+        for paper_id, title, year, doi, api_source, canonical in cursor.fetchall():
+            paper = {'id': paper_id, 'title': title, 'year': year, 'doi': doi, 'api_source': api_source}
+            if paper_id == canonical:
+                groups[canonical]['canonical'] = paper
+            else:
+                groups[canonical]['duplicates'].append(paper)
+        return list(groups.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="近似重复论文检测")
+    parser.add_argument('--db', default='data/papers.db')
+    sub = parser.add_subparsers(dest='action', required=True)
+    sub.add_parser('index', help='为还没有签名的论文计算签名并查重')
+    listing = sub.add_parser('list', help='列出重复组')
+    listing.add_argument('--limit', type=int, default=100)
+    canonical = sub.add_parser('canonical', help='把论文设为所在组的规范论文')
+    canonical.add_argument('paper_id')
+    args = parser.parse_args(argv)
+
+    from .paper_manager import PaperManager
+    setup_logging()
+    paper_manager = PaperManager(args.db)
+    index = paper_manager.near_duplicates
+    try:
+        if args.action == 'index':
+            print(index.index_missing(progress=lambda done, total: print(f"\r{done}/{total}", end='', flush=True)))
+        elif args.action == 'list':
+            for group in index.clusters(args.limit):
+                paper = group['canonical']
+                print(f"{paper['id']}\t{paper['year']}\t{paper['api_source']}\t{paper['title']}")
+                for duplicate in group['duplicates']:
+                    print(f"  = {duplicate['id']}\t{duplicate['year']}\t{duplicate['api_source']}\t{duplicate['title']}")
+        elif index.set_canonical(args.paper_id) is None:
+            print(f"{args.paper_id} 不是重复论文")
+    finally:
+        paper_manager.close()
+
+
+if __name__ == '__main__':
+    main()
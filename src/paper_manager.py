@@ -1,16 +1,561 @@
-import sqlite3
 import os
+import sqlite3
 import logging
+import hashlib
+import time
+import re
+import json
+import zlib
+from .connection_manager import ConnectionManager
+from .near_duplicates import NearDuplicateIndex
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+
+def _migration_identity_indexes(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_papers_doi ON papers(doi)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_papers_pmid ON papers(pmid)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_papers_pmcid ON papers(pmcid)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_papers_api_source ON papers(api_source)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_paper_files_paper_id ON paper_files(paper_id)')
+
+
+def _migration_full_text_search(cursor):
+    # 摘要此前在入库时被丢弃，现在与论文一起保存
+    cursor.execute('ALTER TABLE papers ADD COLUMN abstract TEXT')
+    # 外部内容 FTS5 表：正文仍在 papers 中，索引由触发器同步
+    cursor.execute('''
+        CREATE VIRTUAL TABLE papers_fts USING fts5(
+            title, authors, abstract, notes, ai_notes,
+            content='papers', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER papers_fts_insert AFTER INSERT ON papers BEGIN
+            INSERT INTO papers_fts(rowid, title, authors, abstract, notes, ai_notes)
+            VALUES (new.rowid, new.title, new.authors, new.abstract, new.notes, new.ai_notes);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER papers_fts_delete AFTER DELETE ON papers BEGIN
+            INSERT INTO papers_fts(papers_fts, rowid, title, authors, abstract, notes, ai_notes)
+            VALUES ('delete', old.rowid, old.title, old.authors, old.abstract, old.notes, old.ai_notes);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER papers_fts_update AFTER UPDATE OF title, authors, abstract, notes, ai_notes ON papers BEGIN
+            INSERT INTO papers_fts(papers_fts, rowid, title, authors, abstract, notes, ai_notes)
+            VALUES ('delete', old.rowid, old.title, old.authors, old.abstract, old.notes, old.ai_notes);
+            INSERT INTO papers_fts(rowid, title, authors, abstract, notes, ai_notes)
+            VALUES (new.rowid, new.title, new.authors, new.abstract, new.notes, new.ai_notes);
+        END
+    ''')
+    cursor.execute("INSERT INTO papers_fts(papers_fts) VALUES ('rebuild')")
+
+
+def _migration_normalized_authors_sources(cursor):
+    # 作者与论文多对多；papers.authors 仍保留逗号拼接的字符串供列表显示
+    cursor.execute('''
+        CREATE TABLE authors
+        (id INTEGER PRIMARY KEY,
+         name TEXT NOT NULL UNIQUE COLLATE NOCASE)
+    ''')
+    cursor.execute('''
+        CREATE TABLE paper_authors
+        (paper_id TEXT NOT NULL,
+         position INTEGER NOT NULL,
+         author_id INTEGER NOT NULL REFERENCES authors(id),
+         PRIMARY KEY (paper_id, position)) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX idx_paper_authors_author ON paper_authors(author_id, paper_id)')
+    # 同一论文可能先后从多个API检索到，每个来源一行
+    cursor.execute('''
+        CREATE TABLE paper_sources
+        (paper_id TEXT NOT NULL,
+         api_source TEXT NOT NULL,
+         first_seen REAL,
+         last_seen REAL,
+         PRIMARY KEY (paper_id, api_source)) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX idx_paper_sources_source ON paper_sources(api_source, paper_id)')
+    # 已执行迁移的记录，便于排查旧数据库的升级历史
+    cursor.execute('''
+        CREATE TABLE schema_migrations
+        (version INTEGER PRIMARY KEY,
+         description TEXT,
+         applied_at REAL)
+    ''')
+    cursor.executemany('INSERT INTO schema_migrations (version, description) VALUES (?, ?)',
+                       [(version, description) for version, description, _ in MIGRATIONS if version < 3])
+
+    # 回填现有数据
+    now = time.time()
+    cursor.execute('''
+        INSERT INTO paper_sources (paper_id, api_source, first_seen, last_seen)
+        SELECT id, api_source, ?, ? FROM papers WHERE COALESCE(api_source, '') != ''
+    ''', (now, now))
+    rows = cursor.execute("SELECT id, authors FROM papers WHERE COALESCE(authors, '') != ''").fetchall()
+    for start in range(0, len(rows), 10000):
+        _write_paper_authors(cursor, {paper_id: _split_authors(authors) for paper_id, authors in rows[start:start + 10000]})
+
+
+def _create_fts_source(cursor, key='rowid'):
+    # key 为全文索引使用的 papers 整数键（v11 起为 seq）
+    cursor.execute(f'''
+        CREATE VIEW papers_fts_source AS
+        SELECT papers.{key} AS rowid, papers.id AS id, papers.title AS title,
+               papers.authors AS authors, papers.abstract AS abstract,
+               (SELECT decompress_text(codec, body) FROM paper_texts
+                WHERE paper_id = papers.id AND kind = 'notes') AS notes,
+               (SELECT decompress_text(codec, body) FROM paper_texts
+                WHERE paper_id = papers.id AND kind = 'ai_notes') AS ai_notes
+        FROM papers
+    ''')
+
+
+def _create_fts_triggers(cursor, key='rowid'):
+    # papers_fts 与 papers、paper_texts 同步的触发器
+    cursor.execute('''
+        CREATE TRIGGER papers_fts_insert AFTER INSERT ON papers BEGIN
+            INSERT INTO papers_fts(rowid, title, authors, abstract, notes, ai_notes)
+            SELECT rowid, title, authors, abstract, notes, ai_notes FROM papers_fts_source WHERE id = new.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER papers_fts_update AFTER UPDATE OF title, authors, abstract ON papers BEGIN
+            INSERT INTO papers_fts(papers_fts, rowid, title, authors, abstract, notes, ai_notes)
+            SELECT 'delete', old.{key}, old.title, old.authors, old.abstract, notes, ai_notes
+            FROM papers_fts_source WHERE id = new.id;
+            INSERT INTO papers_fts(rowid, title, authors, abstract, notes, ai_notes)
+            SELECT rowid, title, authors, abstract, notes, ai_notes FROM papers_fts_source WHERE id = new.id;
+        END
+    ''')
+    # 删除论文时一并删除它的文本
+    cursor.execute(f'''
+        CREATE TRIGGER papers_fts_delete AFTER DELETE ON papers BEGIN
+            INSERT INTO papers_fts(papers_fts, rowid, title, authors, abstract, notes, ai_notes)
+            VALUES ('delete', old.{key}, old.title, old.authors, old.abstract,
+                    (SELECT decompress_text(codec, body) FROM paper_texts WHERE paper_id = old.id AND kind = 'notes'),
+                    (SELECT decompress_text(codec, body) FROM paper_texts WHERE paper_id = old.id AND kind = 'ai_notes'));
+            DELETE FROM paper_texts WHERE paper_id = old.id;
+        END
+    ''')
+    # 笔记变化时用旧文本删除索引条目、按视图中的新内容重新索引，并同步 papers 上的长度
+    for event, row, old_text, length in (('insert', 'new', 'NULL', 'new.length'),
+                                         ('update', 'new', 'decompress_text(old.codec, old.body)', 'new.length'),
+                                         ('delete', 'old', 'decompress_text(old.codec, old.body)', '0')):
+        cursor.execute(f'''
+            CREATE TRIGGER paper_texts_{event} AFTER {event.upper()} ON paper_texts
+            WHEN {row}.kind IN ('notes', 'ai_notes') BEGIN
+                INSERT INTO papers_fts(papers_fts, rowid, title, authors, abstract, notes, ai_notes)
+                SELECT 'delete', rowid, title, authors, abstract,
+                       CASE WHEN {row}.kind = 'notes' THEN {old_text} ELSE notes END,
+                       CASE WHEN {row}.kind = 'ai_notes' THEN {old_text} ELSE ai_notes END
+                FROM papers_fts_source WHERE id = {row}.paper_id;
+                INSERT INTO papers_fts(rowid, title, authors, abstract, notes, ai_notes)
+                SELECT rowid, title, authors, abstract, notes, ai_notes FROM papers_fts_source WHERE id = {row}.paper_id;
+                UPDATE papers SET notes_length = {length} WHERE id = {row}.paper_id AND {row}.kind = 'notes';
+                UPDATE papers SET ai_notes_length = {length} WHERE id = {row}.paper_id AND {row}.kind = 'ai_notes';
+            END
+        ''')
+
+
+def _migration_compressed_texts(cursor):
+    # 笔记、AI笔记移到压缩的附表中，papers 只保留长度，列表查询不再读取全文
+    cursor.execute('DROP TRIGGER papers_fts_insert')
+    cursor.execute('DROP TRIGGER papers_fts_delete')
+    cursor.execute('DROP TRIGGER papers_fts_update')
+    cursor.execute('DROP TABLE papers_fts')
+    cursor.execute('''
+        CREATE TABLE paper_texts
+        (id INTEGER PRIMARY KEY,
+         paper_id TEXT NOT NULL,
+         kind TEXT NOT NULL,
+         codec TEXT NOT NULL,
+         length INTEGER NOT NULL,
+         body BLOB NOT NULL,
+         updated_at REAL,
+         UNIQUE (paper_id, kind))
+    ''')
+    cursor.execute('ALTER TABLE papers ADD COLUMN notes_length INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('ALTER TABLE papers ADD COLUMN ai_notes_length INTEGER NOT NULL DEFAULT 0')
+    now = time.time()
+    reader = cursor.connection.cursor()
+    reader.execute("SELECT id, notes, ai_notes FROM papers WHERE COALESCE(notes, '') != '' OR COALESCE(ai_notes, '') != ''")
+    while True:
+        rows = reader.fetchmany(1000)
+        if not rows:
+            break
+        cursor.executemany(
+            'INSERT INTO paper_texts (paper_id, kind, codec, length, body, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+            [(paper_id, kind, *compress_text(text), now)
+             for paper_id, notes, ai_notes in rows
+             for kind, text in (('notes', notes), ('ai_notes', ai_notes)) if text])
+    cursor.execute('UPDATE papers SET notes_length = COALESCE(length(notes), 0), ai_notes_length = COALESCE(length(ai_notes), 0)')
+    cursor.execute('ALTER TABLE papers DROP COLUMN notes')
+    cursor.execute('ALTER TABLE papers DROP COLUMN ai_notes')
+
+    # 全文索引的内容来自视图：笔记在读取时解压（decompress_text 由 configure_connection 注册）
+    _create_fts_source(cursor)
+    cursor.execute('''
+        CREATE VIRTUAL TABLE papers_fts USING fts5(
+            title, authors, abstract, notes, ai_notes,
+            content='papers_fts_source', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    _create_fts_triggers(cursor)
+    cursor.execute("INSERT INTO papers_fts(papers_fts) VALUES ('rebuild')")
+
+
+def _migration_job_queue(cursor):
+    # 持久任务队列（见 job_queue.JobQueue）
+    cursor.execute('''
+        CREATE TABLE jobs
+        (id INTEGER PRIMARY KEY,
+         type TEXT NOT NULL,
+         payload TEXT NOT NULL,
+         state TEXT NOT NULL DEFAULT 'queued',
+         priority INTEGER NOT NULL DEFAULT 0,
+         attempts INTEGER NOT NULL DEFAULT 0,
+         max_attempts INTEGER NOT NULL DEFAULT 3,
+         run_after REAL NOT NULL,
+         lease_owner TEXT,
+         lease_until REAL,
+         batch TEXT,
+         dedupe_key TEXT,
+         result TEXT,
+         error TEXT,
+         created_at REAL,
+         updated_at REAL)
+    ''')
+    cursor.execute('CREATE INDEX idx_jobs_claim ON jobs(state, priority DESC, id)')
+    cursor.execute('CREATE INDEX idx_jobs_batch ON jobs(batch, state)')
+    # 同一去重键只允许一个未完成的任务
+    cursor.execute('''
+        CREATE UNIQUE INDEX idx_jobs_dedupe ON jobs(dedupe_key)
+        WHERE dedupe_key IS NOT NULL AND state IN ('queued', 'running')
+    ''')
+
+
+
+def _migration_citation_graph(cursor):
+    # 引用关系按 PMID 保存（被引论文不一定在库中）；(citing, cited) 为主键，反向索引用于查"被谁引用"
+    cursor.execute('''
+        CREATE TABLE citations
+        (citing_pmid TEXT NOT NULL,
+         cited_pmid TEXT NOT NULL,
+         source TEXT NOT NULL,
+         first_seen REAL,
+         PRIMARY KEY (citing_pmid, cited_pmid)) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX idx_citations_cited ON citations(cited_pmid, citing_pmid)')
+    # 每个 PMID 两个方向上次展开的时间，增量抓取时跳过已展开的节点
+    cursor.execute('''
+        CREATE TABLE citation_crawl
+        (pmid TEXT PRIMARY KEY,
+         depth INTEGER,
+         cited_by_at REAL,
+         refs_at REAL)
+    ''')
+
+
+def _migration_saved_searches(cursor):
+    # 定期执行的保存检索（见 alerts.AlertScheduler）；options 为 JSON，例如 {"download": true, "analyze": true}
+    cursor.execute('''
+        CREATE TABLE saved_searches
+        (id INTEGER PRIMARY KEY,
+         name TEXT NOT NULL UNIQUE,
+         api_source TEXT NOT NULL DEFAULT 'pubmed',
+         query TEXT NOT NULL,
+         interval_minutes INTEGER NOT NULL DEFAULT 1440,
+         enabled INTEGER NOT NULL DEFAULT 1,
+         options TEXT NOT NULL DEFAULT '{}',
+         next_run_at REAL NOT NULL DEFAULT 0,
+         last_run_at REAL,
+         last_hits INTEGER,
+         last_error TEXT,
+         created_at REAL)
+    ''')
+    cursor.execute('CREATE INDEX idx_saved_searches_due ON saved_searches(enabled, next_run_at)')
+    # 每个检索命中过的 PMID，用于统计和去重
+    cursor.execute('''
+        CREATE TABLE saved_search_hits
+        (search_id INTEGER NOT NULL,
+         pmid TEXT NOT NULL,
+         first_seen REAL,
+         PRIMARY KEY (search_id, pmid)) WITHOUT ROWID
+    ''')
+
+
+def _migration_feeds(cursor):
+    # 期刊 RSS/目录订阅：保存 ETag / Last-Modified 用于条件请求（见 feed_ingest.FeedIngestor）
+    cursor.execute('''
+        CREATE TABLE feeds
+        (id INTEGER PRIMARY KEY,
+         url TEXT NOT NULL UNIQUE,
+         title TEXT,
+         etag TEXT,
+         last_modified TEXT,
+         interval_minutes INTEGER NOT NULL DEFAULT 360,
+         next_check_at REAL NOT NULL DEFAULT 0,
+         last_checked_at REAL,
+         last_status INTEGER,
+         last_error TEXT,
+         created_at REAL)
+    ''')
+    # 已处理过的条目，再次出现在订阅中时跳过
+    cursor.execute('''
+        CREATE TABLE feed_entries
+        (feed_id INTEGER NOT NULL,
+         entry_key TEXT NOT NULL,
+         doi TEXT,
+         seen_at REAL,
+         PRIMARY KEY (feed_id, entry_key)) WITHOUT ROWID
+    ''')
+
+
+def _migration_citation_refresh(cursor):
+    # 被引次数上次从 Crossref 刷新的时间（见 citation_refresh.CitationRefresher），中断后按它续跑
+    cursor.execute('ALTER TABLE papers ADD COLUMN citation_refreshed_at REAL')
+
+
+def _migration_near_duplicates(cursor):
+    # 近似重复检测（见 near_duplicates.NearDuplicateIndex）：每篇论文的 MinHash 签名，以及 LSH 分桶
+    cursor.execute('''
+        CREATE TABLE paper_minhash
+        (paper_id TEXT PRIMARY KEY,
+         signature BLOB NOT NULL,
+         has_abstract INTEGER NOT NULL,
+         title_ok INTEGER NOT NULL) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE minhash_buckets
+        (band INTEGER NOT NULL,
+         bucket INTEGER NOT NULL,
+         paper_id TEXT NOT NULL,
+         PRIMARY KEY (band, bucket, paper_id)) WITHOUT ROWID
+    ''')
+    # 重复论文指向同组的规范论文，下载和分析跳过 duplicate_of 不为空的论文
+    cursor.execute('ALTER TABLE papers ADD COLUMN duplicate_of TEXT')
+    cursor.execute('CREATE INDEX idx_papers_duplicate_of ON papers(duplicate_of) WHERE duplicate_of IS NOT NULL')
+
+
+def _migration_stable_paper_key(cursor):
+    # papers 的主键是 TEXT，rowid 是隐式的，VACUUM 可能重新编号而使全文索引与分页错位；
+    # 重建为带 INTEGER PRIMARY KEY（seq）的表，seq 沿用原 rowid，之后不再改变
+    for trigger in ('papers_fts_insert', 'papers_fts_update', 'papers_fts_delete',
+                    'paper_texts_insert', 'paper_texts_update', 'paper_texts_delete'):
+        cursor.execute(f'DROP TRIGGER {trigger}')
+    cursor.execute('DROP VIEW papers_fts_source')
+    cursor.execute('''
+        CREATE TABLE papers_new
+        (id TEXT UNIQUE,
+         title TEXT,
+         authors TEXT,
+         year INTEGER,
+         doi TEXT,
+         pmid TEXT,
+         pmcid TEXT,
+         api_source TEXT,
+         citation_count INTEGER,
+         downloaded BOOLEAN DEFAULT FALSE,
+         abstract TEXT,
+         notes_length INTEGER NOT NULL DEFAULT 0,
+         ai_notes_length INTEGER NOT NULL DEFAULT 0,
+         citation_refreshed_at REAL,
+         duplicate_of TEXT,
+         seq INTEGER PRIMARY KEY)
+    ''')
+    columns = ('id, title, authors, year, doi, pmid, pmcid, api_source, citation_count, downloaded, abstract, '
+               'notes_length, ai_notes_length, citation_refreshed_at, duplicate_of')
+    cursor.execute(f'INSERT INTO papers_new ({columns}, seq) SELECT {columns}, rowid FROM papers')
+    cursor.execute('DROP TABLE papers')
+    cursor.execute('ALTER TABLE papers_new RENAME TO papers')
+    _migration_identity_indexes(cursor)
+    cursor.execute('CREATE INDEX idx_papers_duplicate_of ON papers(duplicate_of) WHERE duplicate_of IS NOT NULL')
+    _create_fts_source(cursor, 'seq')
+    _create_fts_triggers(cursor, 'seq')
+    cursor.execute("INSERT INTO papers_fts(papers_fts) VALUES ('rebuild')")
+
+
+def _migration_doi_lower_index(cursor):
+    # DOI 不区分大小写，按 lower(doi) 查找已有论文（订阅导入、提醒去重）时使用这个表达式索引
+    cursor.execute('CREATE INDEX idx_papers_doi_lower ON papers(lower(doi))')
+
+
+# 笔记等长文本的压缩：短文本压缩收益很小，直接保存 UTF-8；安装了 zstandard 时优先用 zstd
+TEXT_CODEC = 'zstd' if zstandard is not None else 'zlib'
+_MIN_COMPRESS_BYTES = 256
+
+
+def compress_text(text):
+    """返回 (codec, 字符数, 压缩后的 BLOB)"""
+    data = text.encode('utf-8')
+    if len(data) < _MIN_COMPRESS_BYTES:
+        return 'raw', len(text), data
+    if TEXT_CODEC == 'zstd':
+        return 'zstd', len(text), zstandard.ZstdCompressor(level=9).compress(data)
+    return 'zlib', len(text), zlib.compress(data, 6)
+
+
+def decompress_text(codec, body):
+    if body is None:
+        return None
+    if codec == 'zlib':
+        body = zlib.decompress(body)
+    elif codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("该文本使用 zstd 压缩，需要安装 zstandard")
+        body = zstandard.ZstdDecompressor().decompress(body)
+    return body.decode('utf-8')
+
+
+def _text_column(kind):
+    """在查询 papers 时按需解压某一类文本的子查询"""
+    return f"(SELECT decompress_text(codec, body) FROM paper_texts WHERE paper_id = papers.id AND kind = '{kind}')"
+
+
+def _write_paper_texts(conn, texts):
+    """写入 [(paper_id, kind, text)]，text 为空时删除；全文索引和 papers 上的长度由触发器同步"""
+    now = time.time()
+    conn.executemany('''
+        INSERT INTO paper_texts (paper_id, kind, codec, length, body, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(paper_id, kind) DO UPDATE SET
+            codec = excluded.codec, length = excluded.length, body = excluded.body, updated_at = excluded.updated_at
+    ''', [(paper_id, kind, *compress_text(text), now) for paper_id, kind, text in texts if text])
+    conn.executemany('DELETE FROM paper_texts WHERE paper_id = ? AND kind = ?',
+                     [(paper_id, kind) for paper_id, kind, text in texts if not text])
+
+
+def _split_authors(authors):
+    if isinstance(authors, str):
+        authors = authors.split(', ')
+    return [name.strip() for name in authors if name and name.strip()]
+
+
+def _write_paper_authors(cursor, authors_by_paper):
+    """批量写入 {paper_id: [作者名]}，替换这些论文原有的作者关系"""
+    names = {name for names in authors_by_paper.values() for name in names}
+    cursor.executemany('INSERT INTO authors (name) VALUES (?) ON CONFLICT(name) DO NOTHING',
+                       [(name,) for name in names])
+    cursor.execute('SELECT id, name FROM authors WHERE name IN (SELECT value FROM json_each(?))',
+                   (json.dumps(list(names)),))
+    author_ids = {name.lower(): author_id for author_id, name in cursor.fetchall()}
+    cursor.execute('DELETE FROM paper_authors WHERE paper_id IN (SELECT value FROM json_each(?))',
+                   (json.dumps(list(authors_by_paper)),))
+    cursor.executemany('INSERT OR IGNORE INTO paper_authors (paper_id, position, author_id) VALUES (?, ?, ?)', [
+        (paper_id, position, author_ids[name.lower()])
+        for paper_id, names in authors_by_paper.items()
+        for position, name in enumerate(names)
+    ])
+
+
+# 数据库结构迁移：(版本号, 说明, 迁移函数)，按版本号顺序执行，已执行的版本记录在 PRAGMA user_version 中
+MIGRATIONS = [
+    (1, '为 doi/pmid/pmcid/api_source 建立索引', _migration_identity_indexes),
+    (2, '保存摘要并建立 FTS5 全文索引', _migration_full_text_search),
+    (3, '作者、论文来源规范化为独立的表', _migration_normalized_authors_sources),
+    (4, '笔记、AI笔记压缩后移到 paper_texts 表', _migration_compressed_texts),
+    (5, '持久任务队列 jobs 表', _migration_job_queue),
+    (6, '引用关系图 citations 表', _migration_citation_graph),
+    (7, '保存的检索 saved_searches 表', _migration_saved_searches),
+    (8, '期刊订阅 feeds 表', _migration_feeds),
+    (9, '记录被引次数的刷新时间', _migration_citation_refresh),
+    (10, '近似重复检测的 MinHash 签名和 LSH 分桶', _migration_near_duplicates),
+    (11, 'papers 增加 INTEGER PRIMARY KEY（seq），全文索引和分页改用 seq', _migration_stable_paper_key),
+    (12, '为 lower(doi) 建立表达式索引，DOI 按不区分大小写匹配', _migration_doi_lower_index),
+]
+
+# 全文检索各列的 BM25 权重：title, authors, abstract, notes, ai_notes
+FTS_COLUMN_WEIGHTS = (10.0, 3.0, 2.0, 1.0, 1.0)
+
+_CJK_RE = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]')
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+def build_fts_query(text):
+    """把用户输入转换为安全的 FTS5 查询
+
+    支持 "双引号短语"、以 * 结尾的前缀词和大写 OR；其余词之间为 AND。
+    每个词都加引号，避免用户输入中的 FTS5 语法字符导致查询出错。
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        if phrase:
+            phrase = phrase.replace('"', ' ').strip()
+            if phrase:
+                terms.append(f'"{phrase}"')
+        elif word == 'OR':
+            if terms and terms[-1] != 'OR':
+                terms.append('OR')
+        else:
+            prefix = word.endswith('*')
+            word = re.sub(r'[^\w\-.]', ' ', word).strip()
+            if word:
+                terms.append(f'"{word}"' + ('*' if prefix else ''))
+    while terms and terms[-1] == 'OR':
+        terms.pop()
+    return ' '.join(terms)
+
+# 写入论文时使用的 UPSERT：已存在的论文保留笔记、AI笔记，只更新元数据
+UPSERT_PAPER_SQL = '''
+    INSERT INTO papers
+    (id, title, authors, year, doi, pmid, pmcid, api_source, citation_count, downloaded, abstract)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        title = excluded.title,
+        abstract = COALESCE(NULLIF(excluded.abstract, ''), papers.abstract),
+        authors = excluded.authors,
+        year = excluded.year,
+        doi = excluded.doi,
+        pmid = COALESCE(NULLIF(excluded.pmid, ''), papers.pmid),
+        pmcid = COALESCE(NULLIF(excluded.pmcid, ''), papers.pmcid),
+        api_source = excluded.api_source,
+        citation_count = excluded.citation_count,
+        downloaded = MAX(papers.downloaded, excluded.downloaded)
+'''
+
 
 class PaperManager:
-    def __init__(self, db_path='data/papers.db'):
+    def __init__(self, db_path='data/papers.db', vector_index=None):
         # 确保数据目录存在
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        self.conn = sqlite3.connect(db_path)
+        # 每个线程独立的读连接 + 单一写线程，可在工作线程中安全使用
+        self.db = ConnectionManager(db_path, configure=self.configure_connection)
+        # 可选的向量索引（见 vector_index.VectorIndex），写入论文时增量更新
+        self.vector_index = vector_index
+        # 入库时检测近似重复的论文（预印本 / 正式版本、不同来源的同一篇）
+        self.near_duplicates = NearDuplicateIndex(self.db)
         self.create_table()
+        self.migrate()
+        # 其他进程（工作进程、提醒、订阅导入）写入论文时没有向量索引，打开时补上索引中缺少的论文
+        self.index_missing_papers()
+
+    @staticmethod
+    def configure_connection(conn):
+        """WAL 模式下读写互不阻塞；synchronous=NORMAL 在 WAL 下仍能保证崩溃后数据库一致"""
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn.execute('PRAGMA cache_size = -65536')  # 64MB 页缓存
+        conn.execute('PRAGMA mmap_size = 268435456')  # 256MB 内存映射读取
+        conn.execute('PRAGMA busy_timeout = 5000')
+        # 全文索引视图和触发器通过它读取压缩的笔记
+        conn.create_function('decompress_text', 2, decompress_text, deterministic=True)
 
     def create_table(self):
-        cursor = self.conn.cursor()
+        self.db.write(self._create_tables)
+
+    @staticmethod
+    def _create_tables(conn):
+        cursor = conn.cursor()
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS papers
             (id TEXT PRIMARY KEY, 
@@ -26,15 +571,60 @@ class PaperManager:
              downloaded BOOLEAN DEFAULT FALSE,
              ai_notes TEXT)
         ''')
-        self.conn.commit()
+        # 下载文件清单：记录下载步骤实际写入的文件，分析时无需再猜测路径
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS paper_files
+            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+             paper_id TEXT NOT NULL REFERENCES papers(id),
+             path TEXT NOT NULL,
+             file_type TEXT,
+             size INTEGER,
+             sha256 TEXT,
+             mtime REAL,
+             recorded_at REAL)
+        ''')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_paper_files_paper_path ON paper_files(paper_id, path)')
+
+    def migrate(self):
+        """原地升级数据库：按版本号执行尚未应用的迁移，每个版本在单独的写任务（事务保存点）中完成
+
+        升级已有数据的数据库前，先用 SQLite 备份接口把当前文件复制为 <db>.bak-v<旧版本>。
+        """
+        reader = self.db.reader()
+        current = reader.execute('PRAGMA user_version').fetchone()[0]
+        pending = [m for m in MIGRATIONS if m[0] > current]
+        if not pending:
+            return current
+        if reader.execute('SELECT EXISTS (SELECT 1 FROM papers)').fetchone()[0]:
+            backup_path = f"{self.db.db_path}.bak-v{current}"
+            if not os.path.exists(backup_path):
+                backup = sqlite3.connect(backup_path)
+                reader.backup(backup)
+                backup.close()
+                logger.info("迁移前已备份数据库到 %s", backup_path)
+        for version, description, migration in pending:
+            logger.info("执行数据库迁移 v%s: %s", version, description)
+            self.db.write(self._apply_migration, version, description, migration)
+        return reader.execute('PRAGMA user_version').fetchone()[0]
+
+    @staticmethod
+    def _apply_migration(conn, version, description, migration):
+        # 写线程把任务包在事务中，DDL 与数据回填要么全部生效要么全部回滚
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= version:
+            return  # 多个进程同时启动时，另一个进程已经完成了这一步
+        migration(conn.cursor())
+        conn.execute(f'PRAGMA user_version = {version}')
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'schema_migrations'").fetchone():
+            conn.execute('INSERT OR REPLACE INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)',
+                         (version, description, time.time()))
 
     def add_paper(self, paper, api_source):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO papers 
-            (id, title, authors, year, doi, pmid, pmcid, api_source, citation_count, downloaded)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        self.add_papers([paper], api_source)
+        return paper['id']
+
+    @staticmethod
+    def _paper_row(paper, api_source=None):
+        return (
             str(paper['id']),  # 确保 id 是字符串
             paper.get('title', ''),
             ', '.join(paper.get('authors', [])),
@@ -42,27 +632,213 @@ class PaperManager:
             paper.get('doi', ''),
             paper.get('pmid', ''),
             paper.get('pmcid', ''),
-            api_source,
+            api_source or paper.get('api_source'),
             paper.get('citation_count', 0),
-            1 if paper.get('downloaded', False) else 0
-        ))
-        self.conn.commit()
-        return paper['id']
+            1 if paper.get('downloaded', False) else 0,
+            _TAG_RE.sub('', paper.get('abstract') or '').strip()  # Crossref 摘要带有 JATS 标签
+        )
+
+    def add_papers(self, papers, api_source=None):
+        """在一个事务中批量写入论文（executemany），api_source 为空时使用每篇论文自带的来源"""
+        if not papers:
+            return []
+        rows = [self._paper_row(paper, api_source) for paper in papers]
+        authors_by_paper = {row[0]: _split_authors(paper.get('authors', [])) for row, paper in zip(rows, papers)}
+        now = time.time()
+        sources = [(row[0], row[7], now, now) for row in rows if row[7]]
+        signatures = self.near_duplicates.prepare([(row[0], row[1], row[10]) for row in rows])
+
+        def write(conn):
+            conn.executemany(UPSERT_PAPER_SQL, rows)
+            _write_paper_authors(conn.cursor(), authors_by_paper)
+            conn.executemany('''
+                INSERT INTO paper_sources (paper_id, api_source, first_seen, last_seen) VALUES (?, ?, ?, ?)
+                ON CONFLICT(paper_id, api_source) DO UPDATE SET last_seen = excluded.last_seen
+            ''', sources)
+            return self.near_duplicates.assign(conn, signatures)
+        duplicates = self.db.write(write)
+        if duplicates:
+            logger.info("%s 篇论文与库中已有论文重复，不会重复下载和分析", len(duplicates))
+            for paper in papers:
+                if str(paper['id']) in duplicates:
+                    paper['duplicate_of'] = duplicates[str(paper['id'])]
+        self._index_papers([(str(paper['id']), self.embedding_text(paper.get('title'), paper.get('abstract')))
+                            for paper in papers])
+        return [paper['id'] for paper in papers]
+
+    @staticmethod
+    def embedding_text(title, abstract=None, ai_notes=None):
+        """拼接用于向量索引的文本：标题 + 摘要 + AI笔记"""
+        return '\n'.join(part for part in (title, abstract, ai_notes) if part)
+
+    def _index_papers(self, items):
+        if self.vector_index is None:
+            return
+        try:
+            self.vector_index.add_many(items)
+        except Exception as e:
+            # 向量索引只是辅助功能，失败不影响论文入库
+            logger.error("更新向量索引时发生错误: %s", e, exc_info=True)
+
+    def rebuild_vector_index(self, chunk_size=1000):
+        """用数据库中的全部论文重建向量索引"""
+        if self.vector_index is None:
+            return
+        cursor = self.db.reader().cursor()
+        cursor.execute(f"SELECT id, title, abstract, {_text_column('ai_notes')} FROM papers")
+        total = 0
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            self._index_papers([(row[0], self.embedding_text(row[1], row[2], row[3])) for row in rows])
+            total += len(rows)
+        logger.info("向量索引重建完成，共 %s 篇论文", total)
+
+    def index_missing_papers(self, chunk_size=1000):
+        """把库中有、向量索引中没有的论文加入索引，返回补充的论文数"""
+        if self.vector_index is None:
+            return 0
+        cursor = self.db.reader().cursor()
+        cursor.execute('SELECT id FROM papers ORDER BY seq')
+        missing = [row[0] for row in cursor.fetchall() if row[0] not in self.vector_index]
+        for start in range(0, len(missing), chunk_size):
+            self.reindex_papers(missing[start:start + chunk_size])
+        if missing:
+            logger.info("向量索引补充了 %s 篇论文", len(missing))
+        return len(missing)
+
+    def reindex_papers(self, paper_ids):
+        """按数据库中的最新内容重新计算一组论文的向量（例如工作进程写入AI笔记之后）"""
+        if self.vector_index is None or not paper_ids:
+            return
+        cursor = self.db.reader().cursor()
+        cursor.execute(f'''
+            SELECT id, title, abstract, {_text_column('ai_notes')} FROM papers
+            WHERE id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps([str(pid) for pid in paper_ids]),))
+        self._index_papers([(row[0], self.embedding_text(row[1], row[2], row[3])) for row in cursor.fetchall()])
+
+    def find_similar_papers(self, paper_id, k=10):
+        """在本地库中查找与指定论文最相似的 k 篇论文，返回按相似度排序的论文字典"""
+        if self.vector_index is None:
+            return []
+        hits = self.vector_index.similar_to_paper(paper_id, k)
+        papers = self.get_papers_by_ids([hit_id for hit_id, _ in hits])
+        results = []
+        for hit_id, score in hits:
+            if hit_id in papers:
+                paper = papers[hit_id]
+                paper['similarity'] = score
+                results.append(paper)
+        return results
+
+    def get_papers_by_ids(self, paper_ids):
+        """批量获取论文基本信息，返回 {paper_id: paper}"""
+        if not paper_ids:
+            return {}
+        cursor = self.db.reader().cursor()
+        placeholders = ','.join('?' * len(paper_ids))
+        cursor.execute(f'''
+            SELECT id, title, authors, year, citation_count, api_source, doi, downloaded, pmid, pmcid, abstract,
+                   duplicate_of
+            FROM papers WHERE id IN ({placeholders})
+        ''', [str(pid) for pid in paper_ids])
+        return {row[0]: {
+            'id': row[0],
+            'title': row[1],
+            'authors': row[2],
+            'year': row[3],
+            'citation_count': row[4],
+            'api_source': row[5],
+            'doi': row[6],
+            'downloaded': bool(row[7]),
+            'pmid': row[8],
+            'pmcid': row[9],
+            'abstract': row[10],
+            'duplicate_of': row[11]
+        } for row in cursor.fetchall()}
 
     def update_paper_download_status(self, paper_id, downloaded):
-        cursor = self.conn.cursor()
-        cursor.execute('''
+        self.db.write(lambda conn: conn.execute('''
             UPDATE papers SET downloaded = ? WHERE id = ?
-        ''', (downloaded, paper_id))
-        self.conn.commit()
+        ''', (downloaded, paper_id)))
+
+    def record_paper_file(self, paper_id, path, file_type):
+        """记录下载得到的文件（路径、类型、大小、内容哈希）"""
+        stat = os.stat(path)
+        sha256 = self._file_sha256(path)
+        self.db.write(lambda conn: conn.execute('''
+            INSERT INTO paper_files (paper_id, path, file_type, size, sha256, mtime, recorded_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(paper_id, path) DO UPDATE SET
+                file_type = excluded.file_type,
+                size = excluded.size,
+                sha256 = excluded.sha256,
+                mtime = excluded.mtime,
+                recorded_at = excluded.recorded_at
+        ''', (str(paper_id), path, file_type, stat.st_size, sha256, stat.st_mtime, time.time())))
+        logger.info("已记录论文文件，ID: %s, 路径: %s, 大小: %s", paper_id, path, stat.st_size)
+
+    @staticmethod
+    def _file_sha256(path, chunk_size=1024 * 1024):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get_paper_files(self, paper_ids):
+        """批量获取论文的最新下载文件路径，返回 {paper_id: path}"""
+        if not paper_ids:
+            return {}
+        cursor = self.db.reader().cursor()
+        placeholders = ','.join('?' * len(paper_ids))
+        # 同一论文可能有多个文件（如先存摘要后下到PDF），优先PDF，其次取最新记录
+        cursor.execute(f'''
+            SELECT paper_id, path FROM paper_files
+            WHERE paper_id IN ({placeholders})
+            ORDER BY paper_id, file_type = 'pdf', recorded_at
+        ''', [str(pid) for pid in paper_ids])
+        return dict(cursor.fetchall())
+
+    def get_paper_file(self, paper_id):
+        return self.get_paper_files([paper_id]).get(str(paper_id))
+
+    def check_paper_files(self, verify_hash=False):
+        """批量检查清单中的文件，返回缺失和已变化（过期）的记录"""
+        cursor = self.db.reader().cursor()
+        cursor.execute('SELECT id, paper_id, path, size, sha256, mtime FROM paper_files')
+        missing, stale = [], []
+        for file_id, paper_id, path, size, sha256, mtime in cursor.fetchall():
+            entry = {'id': file_id, 'paper_id': paper_id, 'path': path}
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                missing.append(entry)
+                continue
+            if stat.st_size != size or stat.st_mtime != mtime:
+                stale.append(entry)
+            elif verify_hash and self._file_sha256(path) != sha256:
+                stale.append(entry)
+        if missing or stale:
+            logger.warning("文件清单检查：缺失 %s 个，已变化 %s 个", len(missing), len(stale))
+        return {'missing': missing, 'stale': stale}
+
+    def remove_paper_files(self, file_ids):
+        """从清单中移除指定记录（例如缺失的文件）"""
+        if not file_ids:
+            return
+        self.db.write(lambda conn: conn.executemany('DELETE FROM paper_files WHERE id = ?',
+                                                    [(file_id,) for file_id in file_ids]))
 
     def get_all_papers(self):
-        """获取数据库中的所有论文"""
+        """获取数据库中的所有论文（只带笔记/AI笔记的有无标记，全文用 get_paper_notes 等按需读取）"""
         try:
-            cursor = self.conn.cursor()
+            cursor = self.db.reader().cursor()
             cursor.execute("""
                 SELECT id, title, authors, year, citation_count, api_source, 
-                       doi, downloaded, notes, ai_notes
+                       doi, downloaded, notes_length > 0, ai_notes_length > 0
                 FROM papers
             """)
             papers = []
@@ -76,89 +852,423 @@ class PaperManager:
                     'api_source': row[5],
                     'doi': row[6],
                     'downloaded': bool(row[7]),
-                    'notes': row[8],
-                    'ai_notes': row[9]
+                    'has_notes': bool(row[8]),
+                    'has_ai_notes': bool(row[9])
                 })
             return papers
         except Exception as e:
-            logging.error(f"获取所有论文时发生错误: {str(e)}")
+            logger.error("获取所有论文时发生错误: %s", e)
             return []
 
+    def iter_papers(self, chunk_size=5000):
+        """按块流式读取全部论文（含笔记、AI笔记、来源和文件清单），每次产出一个字典列表
+
+        游标用 fetchmany 分块取行，来源和文件清单每块各用一次批量查询补齐，内存占用与库大小无关。
+        """
+        cursor = self.db.reader().cursor()
+        cursor.execute(f'''
+            SELECT id, title, authors, year, doi, pmid, pmcid, api_source, citation_count,
+                   downloaded, abstract, {_text_column('notes')}, {_text_column('ai_notes')}
+            FROM papers ORDER BY seq
+        ''')
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            ids = json.dumps([row[0] for row in rows])
+            detail = self.db.reader().cursor()
+            detail.execute('''
+                SELECT paper_id, api_source, first_seen, last_seen FROM paper_sources
+                WHERE paper_id IN (SELECT value FROM json_each(?))
+                ORDER BY paper_id, first_seen
+            ''', (ids,))
+            sources = {}
+            for paper_id, api_source, first_seen, last_seen in detail.fetchall():
+                sources.setdefault(paper_id, []).append(
+                    {'api_source': api_source, 'first_seen': first_seen, 'last_seen': last_seen})
+            detail.execute('''
+                SELECT paper_id, path, file_type, size, sha256, mtime, recorded_at FROM paper_files
+                WHERE paper_id IN (SELECT value FROM json_each(?))
+                ORDER BY paper_id, id
+            ''', (ids,))
+            files = {}
+            for paper_id, path, file_type, size, sha256, mtime, recorded_at in detail.fetchall():
+                files.setdefault(paper_id, []).append({
+                    'path': path, 'file_type': file_type, 'size': size,
+                    'sha256': sha256, 'mtime': mtime, 'recorded_at': recorded_at})
+            yield [{
+                'id': row[0],
+                'title': row[1],
+                'authors': _split_authors(row[2] or ''),
+                'year': row[3],
+                'doi': row[4],
+                'pmid': row[5],
+                'pmcid': row[6],
+                'api_source': row[7],
+                'citation_count': row[8],
+                'downloaded': bool(row[9]),
+                'abstract': row[10],
+                'notes': row[11],
+                'ai_notes': row[12],
+                'sources': sources.get(row[0], []),
+                'files': files.get(row[0], [])
+            } for row in rows]
+
+    def import_papers(self, papers, index_vectors=True):
+        """在一个写任务中合并导入一批论文（iter_papers 产出的格式）
+
+        元数据按 add_papers 的规则更新；本地笔记为空时采用导入的笔记，两边都有且不同则追加在后面；
+        AI笔记只在本地为空时采用；来源合并首次/最近出现时间；文件清单只补充本地没有的记录。
+        """
+        if not papers:
+            return 0
+        rows = [self._paper_row(paper) for paper in papers]
+        authors_by_paper = {row[0]: _split_authors(paper.get('authors') or []) for row, paper in zip(rows, papers)}
+        imported_texts = {row[0]: (paper.get('notes') or '', paper.get('ai_notes') or '')
+                          for row, paper in zip(rows, papers) if paper.get('notes') or paper.get('ai_notes')}
+        now = time.time()
+        sources = [(row[0], source['api_source'], source.get('first_seen') or now, source.get('last_seen') or now)
+                   for row, paper in zip(rows, papers) for source in paper.get('sources') or []]
+        sources += [(row[0], row[7], now, now) for row, paper in zip(rows, papers) if row[7] and not paper.get('sources')]
+        files = [(row[0], f['path'], f.get('file_type'), f.get('size'), f.get('sha256'), f.get('mtime'),
+                  f.get('recorded_at') or now)
+                 for row, paper in zip(rows, papers) for f in paper.get('files') or []]
+        signatures = self.near_duplicates.prepare([(row[0], row[1], row[10]) for row in rows])
+
+        def write(conn):
+            conn.executemany(UPSERT_PAPER_SQL, rows)
+            _write_paper_authors(conn.cursor(), authors_by_paper)
+            local = {}
+            for paper_id, kind, codec, body in conn.execute('''
+                SELECT paper_id, kind, codec, body FROM paper_texts
+                WHERE paper_id IN (SELECT value FROM json_each(?)) AND kind IN ('notes', 'ai_notes')
+            ''', (json.dumps(list(imported_texts)),)):
+                local[paper_id, kind] = decompress_text(codec, body)
+            texts = []
+            for paper_id, (notes, ai_notes) in imported_texts.items():
+                local_notes = local.get((paper_id, 'notes')) or ''
+                if notes and notes not in local_notes:
+                    texts.append((paper_id, 'notes', f"{local_notes}\n\n{notes}" if local_notes else notes))
+                if ai_notes and not local.get((paper_id, 'ai_notes')):
+                    texts.append((paper_id, 'ai_notes', ai_notes))
+            _write_paper_texts(conn, texts)
+            conn.executemany('''
+                INSERT INTO paper_sources (paper_id, api_source, first_seen, last_seen) VALUES (?, ?, ?, ?)
+                ON CONFLICT(paper_id, api_source) DO UPDATE SET
+                    first_seen = MIN(first_seen, excluded.first_seen),
+                    last_seen = MAX(last_seen, excluded.last_seen)
+            ''', sources)
+            conn.executemany('''
+                INSERT INTO paper_files (paper_id, path, file_type, size, sha256, mtime, recorded_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(paper_id, path) DO NOTHING
+            ''', files)
+            self.near_duplicates.assign(conn, signatures)
+        self.db.write(write)
+        if index_vectors:
+            self._index_papers([(row[0], self.embedding_text(row[1], row[10], paper.get('ai_notes')))
+                                for row, paper in zip(rows, papers)])
+        return len(rows)
+
+    def get_papers_page(self, after_seq=0, limit=200):
+        """按 seq 键集分页读取论文列表（不读取笔记全文），返回 (papers, 下一页起点)
+
+        下一页起点为 None 表示已经读完；键集分页的代价与翻到第几页无关。
+        """
+        cursor = self.db.reader().cursor()
+        cursor.execute('''
+            SELECT seq, id, title, authors, year, citation_count, api_source, doi, downloaded,
+                   notes_length > 0, ai_notes_length > 0
+            FROM papers
+            WHERE seq > ?
+            ORDER BY seq
+            LIMIT ?
+        ''', (after_seq, limit))
+        rows = cursor.fetchall()
+        papers = [{
+            'id': row[1],
+            'title': row[2],
+            'authors': row[3],
+            'year': row[4],
+            'citation_count': row[5],
+            'api_source': row[6],
+            'doi': row[7],
+            'downloaded': bool(row[8]),
+            'has_notes': bool(row[9]),
+            'has_ai_notes': bool(row[10])
+        } for row in rows]
+        next_seq = rows[-1][0] if len(rows) == limit else None
+        return papers, next_seq
+
+    def count_papers(self):
+        cursor = self.db.reader().cursor()
+        cursor.execute('SELECT COUNT(*) FROM papers')
+        return cursor.fetchone()[0]
+
     def get_paper_by_id(self, paper_id):
-        cursor = self.conn.cursor()
+        cursor = self.db.reader().cursor()
         cursor.execute('SELECT * FROM papers WHERE id = ?', (paper_id,))
         return cursor.fetchone()
 
+    def get_paper_by_identifier(self, doi=None, pmid=None, pmcid=None):
+        """按 DOI / PMID / PMCID 查找论文（均有索引）"""
+        cursor = self.db.reader().cursor()
+        for column, value in (('doi', doi), ('pmid', pmid), ('pmcid', pmcid)):
+            if value:
+                cursor.execute(f'SELECT * FROM papers WHERE {column} = ?', (value,))
+                row = cursor.fetchone()
+                if row:
+                    return row
+        return None
+
     def get_papers_by_api_source(self, api_source):
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM papers WHERE api_source = ?', (api_source,))
+        """返回曾从该来源检索到的论文（一篇论文可以属于多个来源）"""
+        cursor = self.db.reader().cursor()
+        cursor.execute('''
+            SELECT papers.* FROM paper_sources
+            JOIN papers ON papers.id = paper_sources.paper_id
+            WHERE paper_sources.api_source = ?
+        ''', (api_source,))
         return cursor.fetchall()
 
-    def search_papers(self, query):
-        cursor = self.conn.cursor()
+    def get_paper_ids_by_sources(self, api_sources):
+        """批量按来源查询，返回 {api_source: [paper_id, ...]}"""
+        cursor = self.db.reader().cursor()
+        cursor.execute('''
+            SELECT api_source, paper_id FROM paper_sources
+            WHERE api_source IN (SELECT value FROM json_each(?))
+            ORDER BY api_source, first_seen
+        ''', (json.dumps(list(api_sources)),))
+        result = {source: [] for source in api_sources}
+        for source, paper_id in cursor.fetchall():
+            result[source].append(paper_id)
+        return result
+
+    def get_paper_sources(self, paper_ids):
+        """批量查询论文的全部来源，返回 {paper_id: [api_source, ...]}"""
+        cursor = self.db.reader().cursor()
+        cursor.execute('''
+            SELECT paper_id, api_source FROM paper_sources
+            WHERE paper_id IN (SELECT value FROM json_each(?))
+            ORDER BY paper_id, first_seen
+        ''', (json.dumps([str(pid) for pid in paper_ids]),))
+        result = {}
+        for paper_id, source in cursor.fetchall():
+            result.setdefault(paper_id, []).append(source)
+        return result
+
+    def get_paper_ids_by_authors(self, names, prefix=False):
+        """批量按作者查询（不区分大小写），返回 {作者名: [paper_id, ...]}
+
+        prefix=True 时按姓名前缀匹配，例如 "Smith" 可匹配 "Smith J" 和 "Smith John"。
+        """
+        cursor = self.db.reader().cursor()
+        if prefix:
+            result = {}
+            for name in names:
+                pattern = name.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                cursor.execute('''
+                    SELECT DISTINCT paper_authors.paper_id FROM authors
+                    JOIN paper_authors ON paper_authors.author_id = authors.id
+                    WHERE authors.name LIKE ? ESCAPE '\\'
+                ''', (pattern,))
+                result[name] = [row[0] for row in cursor.fetchall()]
+            return result
+        cursor.execute('''
+            SELECT authors.name, paper_authors.paper_id FROM authors
+            JOIN paper_authors ON paper_authors.author_id = authors.id
+            WHERE authors.name IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(list(names)),))
+        by_lower = {}
+        for name, paper_id in cursor.fetchall():
+            by_lower.setdefault(name.lower(), []).append(paper_id)
+        return {name: by_lower.get(name.lower(), []) for name in names}
+
+    def get_papers_by_author(self, name, prefix=False):
+        """按作者返回论文基本信息列表"""
+        paper_ids = self.get_paper_ids_by_authors([name], prefix)[name]
+        papers = self.get_papers_by_ids(paper_ids)
+        return [papers[paper_id] for paper_id in paper_ids if paper_id in papers]
+
+    def get_paper_authors(self, paper_ids):
+        """批量返回论文的有序作者列表 {paper_id: [作者名, ...]}"""
+        cursor = self.db.reader().cursor()
         cursor.execute('''
-            SELECT * FROM papers 
-            WHERE title LIKE ? OR authors LIKE ?
-        ''', (f'%{query}%', f'%{query}%'))
+            SELECT paper_authors.paper_id, authors.name FROM paper_authors
+            JOIN authors ON authors.id = paper_authors.author_id
+            WHERE paper_authors.paper_id IN (SELECT value FROM json_each(?))
+            ORDER BY paper_authors.paper_id, paper_authors.position
+        ''', (json.dumps([str(pid) for pid in paper_ids]),))
+        result = {}
+        for paper_id, name in cursor.fetchall():
+            result.setdefault(paper_id, []).append(name)
+        return result
+
+    def search_papers(self, query):
+        """全文检索，按 BM25 相关度返回 papers 表的整行"""
+        fts_query = build_fts_query(query)
+        if not fts_query:
+            return []
+        cursor = self.db.reader().cursor()
+        cursor.execute(f'''
+            SELECT papers.* FROM papers_fts
+            JOIN papers ON papers.seq = papers_fts.rowid
+            WHERE papers_fts MATCH ?
+            ORDER BY bm25(papers_fts, {', '.join(map(str, FTS_COLUMN_WEIGHTS))})
+        ''', (fts_query,))
         return cursor.fetchall()
 
+    def search_library(self, query, limit=200, offset=0, highlight=('【', '】')):
+        """在标题、作者、摘要、笔记和AI笔记中全文检索
+
+        返回按 BM25 排序的论文字典，包含 rank 和带高亮标记的 snippet。
+        unicode61 分词器把连续的汉字视为一个词，因此含中文的查询改用子串匹配（需要扫描全表）。
+        """
+        cursor = self.db.reader().cursor()
+        columns = """papers.id, papers.title, papers.authors, papers.year, papers.citation_count,
+                     papers.api_source, papers.doi, papers.downloaded,
+                     papers.notes_length > 0, papers.ai_notes_length > 0"""
+        if _CJK_RE.search(query):
+            pattern = query.strip()
+            cursor.execute(f'''
+                SELECT {columns}, 0,
+                       substr(COALESCE(texts.ai_notes, '') || ' ' || COALESCE(texts.notes, ''),
+                              max(1, instr(COALESCE(texts.ai_notes, '') || ' ' || COALESCE(texts.notes, ''), ?) - 20), 80)
+                FROM papers JOIN papers_fts_source AS texts ON texts.rowid = papers.seq
+                WHERE instr(papers.title, ?) OR instr(texts.notes, ?) OR instr(texts.ai_notes, ?) OR instr(papers.abstract, ?)
+                LIMIT ? OFFSET ?
+            ''', (pattern, pattern, pattern, pattern, pattern, limit, offset))
+        else:
+            fts_query = build_fts_query(query)
+            if not fts_query:
+                return []
+            cursor.execute(f'''
+                SELECT {columns},
+                       bm25(papers_fts, {', '.join(map(str, FTS_COLUMN_WEIGHTS))}) AS rank,
+                       snippet(papers_fts, -1, ?, ?, '…', 16)
+                FROM papers_fts
+                JOIN papers ON papers.seq = papers_fts.rowid
+                WHERE papers_fts MATCH ?
+                ORDER BY rank
+                LIMIT ? OFFSET ?
+            ''', (highlight[0], highlight[1], fts_query, limit, offset))
+        results = [{
+            'id': row[0],
+            'title': row[1],
+            'authors': row[2],
+            'year': row[3],
+            'citation_count': row[4],
+            'api_source': row[5],
+            'doi': row[6],
+            'downloaded': bool(row[7]),
+            'has_notes': bool(row[8]),
+            'has_ai_notes': bool(row[9]),
+            'rank': row[10],
+            'snippet': row[11]
+        } for row in cursor.fetchall()]
+        if _CJK_RE.search(query):
+            for result in results:
+                result['snippet'] = result['snippet'].replace(pattern, highlight[0] + pattern + highlight[1])
+        return results
+
+    def rebuild_search_index(self):
+        """重建全文索引（全文索引按 papers.seq 关联，VACUUM 后无需重建；索引损坏或与内容不一致时使用）"""
+        self.db.write(lambda conn: conn.execute("INSERT INTO papers_fts(papers_fts) VALUES ('rebuild')"))
+
     def update_paper_notes(self, paper_id, notes):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            UPDATE papers SET notes = ? WHERE id = ?
-        ''', (notes, paper_id))
-        self.conn.commit()
+        self.db.write(lambda conn: _write_paper_texts(conn, [(str(paper_id), 'notes', notes)]))
 
     def get_paper_notes(self, paper_id):
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT notes FROM papers WHERE id = ?', (paper_id,))
+        return self.get_paper_text(paper_id, 'notes')
+
+    def update_paper_text(self, paper_id, kind, text):
+        """保存一篇论文的某类文本（如提取出的全文 full_text），text 为空时删除"""
+        self.db.write(lambda conn: _write_paper_texts(conn, [(str(paper_id), kind, text)]))
+
+    def get_paper_text(self, paper_id, kind):
+        """按需读取并解压一篇论文的某类文本（notes / ai_notes 等），没有时返回空字符串"""
+        cursor = self.db.reader().cursor()
+        cursor.execute('SELECT codec, body FROM paper_texts WHERE paper_id = ? AND kind = ?', (str(paper_id), kind))
         result = cursor.fetchone()
-        return result[0] if result else ''
+        return decompress_text(*result) if result else ''
 
     def get_notes_status(self, paper_ids):
-        cursor = self.conn.cursor()
-        placeholders = ','.join('?' * len(paper_ids))
-        cursor.execute(f'SELECT id, CASE WHEN notes != "" THEN 1 ELSE 0 END as has_notes FROM papers WHERE id IN ({placeholders})', paper_ids)
-        return dict(cursor.fetchall())
+        return {paper_id: int(status['has_notes']) for paper_id, status in self.get_row_status(paper_ids).items()}
+
+    def get_row_status(self, paper_ids):
+        """一次查询返回一组论文的笔记、AI笔记和下载状态
+
+        ID 列表以 JSON 数组作为单个参数传入，无论多少行都只有一次数据库往返。
+        返回 {paper_id: {'has_notes': bool, 'has_ai_notes': bool, 'downloaded': bool, 'duplicate_of': 规范论文ID或None}}
+        """
+        if not paper_ids:
+            return {}
+        cursor = self.db.reader().cursor()
+        cursor.execute('''
+            SELECT id,
+                   notes_length > 0,
+                   ai_notes_length > 0,
+                   COALESCE(downloaded, 0),
+                   duplicate_of
+            FROM papers
+            WHERE id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps([str(pid) for pid in paper_ids]),))
+        return {row[0]: {
+            'has_notes': bool(row[1]),
+            'has_ai_notes': bool(row[2]),
+            'downloaded': bool(row[3]),
+            'duplicate_of': row[4]
+        } for row in cursor.fetchall()}
 
     def update_paper_ai_notes(self, paper_id: str, ai_notes: str):
         """更新论文的AI笔记"""
-        logging.info(f"开始更新论文AI笔记，ID: {paper_id}")
+        logger.info("开始更新论文AI笔记，ID: %s", paper_id)
         try:
-            # 直接使用 self.conn 而不是 get_db_connection
-            cursor = self.conn.cursor()
-            cursor.execute(
-                "UPDATE papers SET ai_notes = ? WHERE id = ?",
-                (ai_notes, paper_id)
-            )
-            self.conn.commit()
-            logging.info(f"成功更新论文AI笔记，ID: {paper_id}, 影响行数: {cursor.rowcount}")
+            def write(conn):
+                if not conn.execute("SELECT 1 FROM papers WHERE id = ?", (paper_id,)).fetchone():
+                    return 0
+                _write_paper_texts(conn, [(str(paper_id), 'ai_notes', ai_notes)])
+                return 1
+            rowcount = self.db.write(write)
+            logger.info("成功更新论文AI笔记，ID: %s, 影响行数: %s", paper_id, rowcount)
+            if self.vector_index is not None and rowcount:
+                cursor = self.db.reader().cursor()
+                cursor.execute("SELECT title, abstract FROM papers WHERE id = ?", (paper_id,))
+                title, abstract = cursor.fetchone()
+                self._index_papers([(str(paper_id), self.embedding_text(title, abstract, ai_notes))])
         except Exception as e:
             error_msg = f"更新AI笔记时发生错误: {str(e)}"
-            logging.error(error_msg, exc_info=True)
+            logger.error(error_msg, exc_info=True)
             raise
 
     def get_paper_ai_notes(self, paper_id: str) -> str:
         """获取论文的AI笔记"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT ai_notes FROM papers WHERE id = ?", (paper_id,))
-            result = cursor.fetchone()
-            return result[0] if result and result[0] else ""
+            return self.get_paper_text(paper_id, 'ai_notes')
         except Exception as e:
-            logging.error(f"获取AI笔记时发生错误: {str(e)}")
+            logger.error("获取AI笔记时发生错误: %s", e)
             return ""
 
     def delete_paper(self, paper_id):
         """从数据库中删除指定论文"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("DELETE FROM papers WHERE id = ?", (paper_id,))
-            self.conn.commit()
-            logging.info(f"已删除论文 ID: {paper_id}")
+            def delete(conn):
+                conn.execute("DELETE FROM paper_files WHERE paper_id = ?", (paper_id,))
+                conn.execute("DELETE FROM paper_authors WHERE paper_id = ?", (paper_id,))
+                conn.execute("DELETE FROM paper_sources WHERE paper_id = ?", (paper_id,))
+                self.near_duplicates.remove(conn, paper_id)
+                conn.execute("DELETE FROM papers WHERE id = ?", (paper_id,))  # paper_texts 由 papers_fts_delete 触发器一并删除
+            self.db.write(delete)
+            if self.vector_index is not None:
+                self.vector_index.remove(paper_id)
+            logger.info("已删除论文 ID: %s", paper_id)
         except Exception as e:
-            logging.error(f"删除论文时发生错误: {str(e)}")
+            logger.error("删除论文时发生错误: %s", e)
             raise
 
+    def close(self):
+        self.db.close()
+
     def __del__(self):
-        self.conn.close()
+        if hasattr(self, 'db'):
+            self.close()
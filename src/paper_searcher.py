@@ -8,10 +8,16 @@ import re
 from functools import lru_cache
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import feedparser
 from datetime import datetime, timedelta
 from urllib.parse import quote
 from dateutil.relativedelta import relativedelta
+from .rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# elink 的关联类型：被哪些文章引用 / 引用了哪些文章
+PUBMED_CITED_BY = 'pubmed_pubmed_citedin'
+PUBMED_REFERENCES = 'pubmed_pubmed_refs'
 
 class PaperSearcher:
     def __init__(self, download_dir='downloads'):
@@ -22,9 +28,18 @@ class PaperSearcher:
         self.pubmed_fetch_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
         self.pmc_search_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
         self.pmc_fetch_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+        self.elink_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/elink.fcgi"
+        # NCBI E-utilities 限速：无 API key 每秒 3 次，有 key 每秒 10 次；所有线程共享同一个限速器
+        self.ncbi_api_key = os.getenv('NCBI_API_KEY')
+        self.ncbi_limiter = RateLimiter(10 if self.ncbi_api_key else 3)
         self.headers = {
             'User-Agent': 'YourApp/1.0 (mailto:your-email@example.com)'
         }
+        # Crossref / E-utilities 等接口共用的连接池（保持连接，避免每个请求重新握手）
+        self.api_session = requests.Session()
+        self.api_session.headers.update(self.headers)
+        # Crossref 公共接口的限速（polite pool 约每秒 10 次）
+        self.crossref_limiter = RateLimiter(10)
         self.sci_hub_url = "https://sci-hub.se/"  # 注意：这个URL可能会经常变化
         self.session = requests.Session()
         self.session.max_redirects = 5  # 限制重定向次数
@@ -35,6 +50,93 @@ class PaperSearcher:
         self.max_concurrent_requests = 5  # 最大并发请求数
         self.cache_expiry = 24 * 60 * 60  # 缓存有效期（秒），这里设置为24小时
 
+    def search(self, api_source, keywords, start_year=None, end_year=None, max_results=10, weeks=None, months=None):
+        """按 API 来源分派检索：crossref / pubmed / pmc / pubmed_recent（最近 weeks 周或 months 个月）"""
+        if api_source == 'crossref':
+            return self.search_papers_crossref(keywords, start_year, end_year, max_results)
+        if api_source == 'pubmed':
+            return self.search_papers_pubmed(keywords, start_year, end_year, max_results)
+        if api_source == 'pmc':
+            return self.search_papers_pmc(keywords, start_year, end_year, max_results)
+        if api_source == 'pubmed_recent':
+            return self.get_latest_papers_pubmed(keywords, max_results, weeks=weeks, months=months)
+        raise ValueError(f"不支持的API来源: {api_source}")
+
+    def search_papers_batch(self, queries, api_source='pubmed', start_year=None, end_year=None, max_results=10,
+                            weeks=None, months=None, max_workers=4):
+        """一次执行多个检索式，返回 {'hits': {检索式: [论文ID, ...]}, 'papers': [去重后的论文], 'errors': {检索式: 错误}}
+
+        所有检索式共用连接池和限速器，并发执行。PubMed / PMC 先取得每个检索式命中的 ID，合并去重后
+        每个 ID 只获取一次详情和引用次数；Crossref 的检索结果自带元数据，按论文 ID 合并。
+        部分详情获取失败时，命中这些 ID 的检索式同时出现在 hits（已获取的论文）和 errors 中。
+        papers 可以直接交给 PaperManager.add_papers 一次写入。
+        """
+        queries = list(dict.fromkeys(query.strip() for query in queries if query and query.strip()))
+        if api_source == 'crossref':
+            def search_one(query):
+                return self.query_crossref(query, start_year, end_year, max_results)
+        elif api_source in ('pubmed', 'pubmed_recent', 'pmc'):
+            db = 'pmc' if api_source == 'pmc' else 'pubmed'
+            sort = 'date' if api_source == 'pubmed_recent' else 'relevance'
+
+            def search_one(query):
+                if api_source == 'pubmed_recent':
+                    term = f"({query}) AND ({self.recent_start_date(weeks, months)}[PDAT] : 3000[PDAT])"
+                elif start_year and end_year:
+                    term = f"{query} AND ({start_year}[PDAT]:{end_year}[PDAT])"
+                else:
+                    term = query
+                return self.esearch(db, term, max_results, sort)
+        else:
+            raise ValueError(f"不支持的检索来源: {api_source}")
+
+        results, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='search') as pool:
+            futures = {pool.submit(search_one, query): query for query in queries}
+            for future in as_completed(futures):
+                query = futures[future]
+                try:
+                    results[query] = future.result()
+                except (RequestException, ValueError, KeyError) as e:
+                    logger.warning("检索失败 [%s]: %s", query, e)
+                    errors[query] = f"{type(e).__name__}: {str(e)}"
+            results = {query: results[query] for query in queries if query in results}  # 按检索式顺序合并
+            if api_source == 'crossref':
+                by_key = {paper['id']: paper for papers in results.values() for paper in papers}
+                results = {query: [paper['id'] for paper in papers] for query, papers in results.items()}
+            else:
+                # 多个检索式命中的同一篇论文只获取一次；获取失败的 ID 记在命中它们的检索式下，其余结果照常返回
+                ids = list(dict.fromkeys(paper_id for id_list in results.values() for paper_id in id_list))
+                failed = {}
+                if api_source == 'pmc':
+                    def fetch_pmc(pmcid):
+                        try:
+                            return self.fetch_paper_details_pmc(pmcid)
+                        except (RequestException, ET.ParseError) as e:
+                            logger.error("获取PMC论文详情失败 [%s]: %s", pmcid, e)
+                            failed[pmcid] = f"{type(e).__name__}: {str(e)}"
+                            return None
+                    by_key = {pmcid: paper for pmcid, paper in zip(ids, pool.map(fetch_pmc, ids)) if paper}
+                    for paper in by_key.values():
+                        paper['api_source'] = 'pmc'
+                else:
+                    by_key = {paper['pmid']: paper for paper in self.fetch_pubmed_details(ids, failed=failed)}
+                for query, id_list in results.items():
+                    missed = [paper_id for paper_id in id_list if paper_id in failed]
+                    if missed:
+                        errors[query] = f"{len(missed)} 篇论文详情获取失败: {failed[missed[0]]}"
+                self.fetch_citation_counts(list(by_key.values()), 'pmc' if api_source == 'pmc' else 'pubmed')
+
+        hits = {query: list(dict.fromkeys(by_key[key]['id'] for key in results[query] if key in by_key))
+                for query in queries if query in results}
+        merged = {}
+        for paper in by_key.values():
+            merged.setdefault(paper['id'], paper)  # 不同 PMID 对应同一 DOI 时保留先命中的一篇
+        papers = list(merged.values())
+        logger.info("批量检索 %s 个检索式，命中 %s 次，去重后 %s 篇，失败 %s 个", len(queries),
+                    sum(len(paper_ids) for paper_ids in hits.values()), len(papers), len(errors))
+        return {'hits': hits, 'papers': papers, 'errors': errors}
+
     @lru_cache(maxsize=1000)
     def get_citation_count(self, identifier, api_source):
         """
@@ -62,10 +164,51 @@ class PaperSearcher:
         # Crossref API 已经在搜索结果中提供了引用次数，所以这里不需要额外的实现
         return 0
 
+    def eutils_request(self, url, params, method='GET'):
+        """经过共享限速器调用 NCBI E-utilities；params 可以是字典或 (键, 值) 列表（重复的 id 参数）"""
+        if self.ncbi_api_key:
+            params = list(params.items() if isinstance(params, dict) else params) + [('api_key', self.ncbi_api_key)]
+        self.ncbi_limiter.acquire()
+        if method == 'POST':
+            return self.api_session.post(url, data=params, timeout=60)
+        return self.api_session.get(url, params=params, timeout=60)
+
+    def fetch_pubmed_links(self, pmids, linkname=PUBMED_CITED_BY, batch_size=200):
+        """批量查询 elink，返回 {pmid: [关联的 pmid, ...]}
+
+        每个 PMID 作为单独的 id 参数传入，elink 会为每个 PMID 返回一个 LinkSet，一次请求即可得到每篇的关联；
+        请求失败时抛出 requests 异常，调用方可以区分"没有关联"和"查询失败"。
+        """
+        links = {}
+        pmids = [str(pmid) for pmid in pmids if pmid]
+        for start in range(0, len(pmids), batch_size):
+            batch = pmids[start:start + batch_size]
+            params = [('dbfrom', 'pubmed'), ('db', 'pubmed'), ('linkname', linkname)] + [('id', pmid) for pmid in batch]
+            response = self.eutils_request(self.elink_url, params, method='POST')
+            response.raise_for_status()
+            root = ET.fromstring(response.content)
+            for link_set in root.findall('LinkSet'):
+                source = link_set.findtext('IdList/Id')
+                if source:
+                    links[source] = [link.findtext('Id') for link in link_set.findall('LinkSetDb/Link')]
+            for pmid in batch:
+                links.setdefault(pmid, [])
+        return links
+
     def fetch_citation_counts(self, papers, api_source):
         """
         使用线程池来并发获取引用次数
         """
+        if api_source == 'pubmed':
+            # PubMed 用一次批量 elink 查询所有论文的被引列表
+            try:
+                cited_by = self.fetch_pubmed_links([paper.get('pmid') for paper in papers])
+            except (RequestException, ET.ParseError) as e:
+                logger.error("批量获取PubMed引用次数失败: %s", e)
+                cited_by = {}
+            for paper in papers:
+                paper['citation_count'] = len(cited_by.get(str(paper.get('pmid')), []))
+            return
         with ThreadPoolExecutor(max_workers=self.max_concurrent_requests) as executor:
             future_to_paper = {executor.submit(self.get_citation_count, paper.get('doi') or paper.get('pmid') or paper.get('pmcid'), api_source): paper for paper in papers}
             for future in as_completed(future_to_paper):
@@ -74,10 +217,18 @@ class PaperSearcher:
                     citation_count = future.result()
                     paper['citation_count'] = citation_count
                 except Exception as exc:
-                    logging.error(f'{paper.get("title")} generated an exception: {exc}')
+                    logger.error("%s generated an exception: %s", paper.get("title"), exc)
                     paper['citation_count'] = 0
 
     def search_papers_crossref(self, keywords, start_year=None, end_year=None, max_results=10):
+        try:
+            return self.query_crossref(keywords, start_year, end_year, max_results)
+        except requests.HTTPError as e:
+            logger.error("Crossref搜索失败，状态码: %s", e.response.status_code)
+            return []
+
+    def query_crossref(self, keywords, start_year=None, end_year=None, max_results=10):
+        """Crossref 关键词检索，请求失败时抛出 requests 异常"""
         params = {
             'query': keywords,
             'rows': max_results,
@@ -88,31 +239,68 @@ class PaperSearcher:
         if start_year and end_year:
             params['filter'] = f'from-pub-date:{start_year},until-pub-date:{end_year}'
 
-        response = requests.get(self.crossref_url, params=params, headers=self.headers)
-        if response.status_code == 200:
-            data = response.json()
-            papers = []
-            for item in data['message']['items']:
-                doi = item.get('DOI', '')
-                unique_id = self.generate_unique_id(doi)
-                paper = {
-                    'id': str(unique_id),  # 添加唯一ID
-                    'title': item.get('title', [''])[0],
-                    'abstract': item.get('abstract', ''),
-                    'url': item.get('URL', ''),
-                    'year': item.get('published-print', {}).get('date-parts', [['']])[0][0],
-                    'doi': doi,
-                    'type': item.get('type', ''),
-                    'authors': [author.get('family', '') + ' ' + author.get('given', '') for author in item.get('author', [])],
-                    'citation_count': item.get('is-referenced-by-count', 0),
-                    'api_source': 'crossref'  # 添加这一行
-                }
-                papers.append(paper)
-                logging.info(f"Crossref paper found: {paper['title'][:100]}... DOI: {doi}")
-            return papers
-        else:
-            logging.error(f"Crossref搜索失败，状态码: {response.status_code}")
-            return []
+        self.crossref_limiter.acquire()
+        response = self.api_session.get(self.crossref_url, params=params, timeout=60)
+        response.raise_for_status()
+        papers = []
+        for item in response.json()['message']['items']:
+            paper = self.parse_crossref_item(item)
+            papers.append(paper)
+            logger.debug("Crossref paper found: %.100s... DOI: %s", paper['title'], paper['doi'])
+        return papers
+
+    def parse_crossref_item(self, item):
+        doi = item.get('DOI', '')
+        unique_id = self.generate_unique_id(doi)
+        return {
+            'id': str(unique_id),  # 添加唯一ID
+            'title': (item.get('title') or [''])[0],
+            'abstract': item.get('abstract', ''),
+            'url': item.get('URL', ''),
+            'year': item.get('published-print', {}).get('date-parts', [['']])[0][0],
+            'doi': doi,
+            'type': item.get('type', ''),
+            'authors': [author.get('family', '') + ' ' + author.get('given', '') for author in item.get('author', [])],
+            'citation_count': item.get('is-referenced-by-count', 0),
+            'api_source': 'crossref'
+        }
+
+    def crossref_filter_dois(self, dois, select, batch_size=50):
+        """按 DOI 分批查询 Crossref（filter=doi:a,doi:b,...），select 只取需要的字段，逐批返回 items
+
+        含逗号的 DOI 无法放进 filter，会被跳过；请求失败时抛出 requests 异常。
+        """
+        dois = list(dict.fromkeys(doi.strip() for doi in dois if doi and ',' not in doi))
+        for start in range(0, len(dois), batch_size):
+            batch = dois[start:start + batch_size]
+            params = {
+                'filter': ','.join(f'doi:{doi}' for doi in batch),
+                'rows': len(batch),
+                'select': select
+            }
+            self.crossref_limiter.acquire()
+            response = self.api_session.get(self.crossref_url, params=params, timeout=60)
+            response.raise_for_status()
+            yield response.json()['message']['items']
+
+    def fetch_crossref_works(self, dois, batch_size=50):
+        """按 DOI 批量查询 Crossref，返回 {小写DOI: 论文}；查不到的 DOI 不在结果中"""
+        works = {}
+        select = 'DOI,title,abstract,URL,published-print,published-online,issued,type,is-referenced-by-count,author'
+        for items in self.crossref_filter_dois(dois, select, batch_size):
+            for item in items:
+                paper = self.parse_crossref_item(item)
+                works[paper['doi'].lower()] = paper
+        logger.info("Crossref 批量查询 %s 个DOI，找到 %s 篇", len(dois), len(works))
+        return works
+
+    def fetch_crossref_citation_counts(self, dois, batch_size=100):
+        """只取 DOI 和被引次数，返回 {小写DOI: 被引次数}"""
+        counts = {}
+        for items in self.crossref_filter_dois(dois, 'DOI,is-referenced-by-count', batch_size):
+            for item in items:
+                counts[item['DOI'].lower()] = item.get('is-referenced-by-count', 0)
+        return counts
 
     def search_papers_pubmed(self, keywords, start_year=None, end_year=None, max_results=10):
         params = {
@@ -125,70 +313,106 @@ class PaperSearcher:
         if start_year and end_year:
             params['term'] += f" AND ({start_year}[PDAT]:{end_year}[PDAT])"
 
-        response = requests.get(self.pubmed_search_url, params=params, headers=self.headers)
+        response = self.eutils_request(self.pubmed_search_url, params)
         if response.status_code == 200:
             data = response.json()
             id_list = data['esearchresult']['idlist']
-            papers = []
-            for pmid in id_list:
-                paper = self.fetch_paper_details_pubmed(pmid)
-                if paper:
-                    paper['api_source'] = 'pubmed'  # 添加这一行
-                    papers.append(paper)
-                    logging.info(f"PubMed paper found: {paper['title'][:100]}... DOI: {paper.get('doi', 'N/A')}")
+            papers = self.fetch_pubmed_details(id_list)
             self.fetch_citation_counts(papers, 'pubmed')
             return papers
         else:
-            logging.error(f"PubMed搜索失败，状态码: {response.status_code}")
+            logger.error("PubMed搜索失败，状态码: %s", response.status_code)
             return []
 
+    def esearch(self, db, term, max_results=100, sort='relevance', **extra):
+        """只返回 ID 列表（pubmed 为 PMID，pmc 为 PMCID）；请求失败时抛出 requests 异常"""
+        params = {'db': db, 'term': term, 'retmax': max_results, 'sort': sort, 'retmode': 'json', **extra}
+        response = self.eutils_request(self.pubmed_search_url, params)
+        response.raise_for_status()
+        return response.json()['esearchresult']['idlist']
+
+    def esearch_pubmed(self, term, max_results=100, mindate=None, maxdate=None, datetype='edat'):
+        """只返回 PMID 列表；mindate/maxdate 为 YYYY/MM/DD，默认按收录日期（edat）过滤，适合增量查询新论文"""
+        extra = {'datetype': datetype, 'mindate': mindate, 'maxdate': maxdate or '3000'} if mindate else {}
+        return self.esearch('pubmed', term, max_results, 'date', **extra)
+
+    def fetch_pubmed_details(self, pmids, batch_size=200, failed=None):
+        """批量 efetch：每 batch_size 个 PMID 一次请求，按输入顺序返回论文列表
+
+        传入 failed 字典时，请求失败的批次记录为 {pmid: 错误} 并继续获取其余批次；否则请求异常直接抛出。
+        """
+        pmids = [str(pmid) for pmid in pmids]
+        found = {}
+        for start in range(0, len(pmids), batch_size):
+            batch = pmids[start:start + batch_size]
+            try:
+                response = self.eutils_request(self.pubmed_fetch_url,
+                                               {'db': 'pubmed', 'id': ','.join(batch), 'retmode': 'xml'}, method='POST')
+                if response.status_code != 200:
+                    logger.error("批量获取PubMed论文详情失败，状态码: %s", response.status_code)
+                    if failed is not None:
+                        failed.update(dict.fromkeys(batch, f"HTTP {response.status_code}"))
+                    continue
+                articles = ET.fromstring(response.content).findall(".//PubmedArticle")
+            except (RequestException, ET.ParseError) as e:
+                if failed is None:
+                    raise
+                logger.error("批量获取PubMed论文详情失败（%s 个PMID）: %s", len(batch), e)
+                failed.update(dict.fromkeys(batch, f"{type(e).__name__}: {str(e)}"))
+                continue
+            for article in articles:
+                paper = self.parse_pubmed_article(article)
+                found[paper['pmid']] = paper
+        papers = [found[pmid] for pmid in pmids if pmid in found]
+        for paper in papers:
+            logger.debug("PubMed paper found: %.100s... DOI: %s", paper['title'], paper.get('doi', 'N/A'))
+        return papers
+
+    def parse_pubmed_article(self, article, pmid=None):
+        doi = (article.findtext(".//ArticleId[@IdType='doi']") or
+               article.findtext(".//ELocationID[@EIdType='doi']") or
+               article.findtext(".//PubmedData/ArticleIdList/ArticleId[@IdType='doi']") or
+               '')
+        pmid = pmid or article.findtext(".//MedlineCitation/PMID", '')
+
+        # 没有 DOI 时用 PMID 作为 ID，批量获取的多篇论文不会因时间戳相同而重复
+        unique_id = self.generate_unique_id(doi) if doi else f"pubmed_{pmid}"
+
+        return {
+            'id': str(unique_id),
+            'title': article.findtext(".//ArticleTitle", ''),
+            'abstract': article.findtext(".//AbstractText", ''),
+            'url': f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
+            'year': article.findtext(".//PubDate/Year", ''),
+            'pmid': pmid,
+            'type': article.findtext(".//PublicationType", ''),
+            'authors': [author.findtext(".//LastName", '') + ' ' + author.findtext(".//ForeName", '') for author in article.findall(".//Author")],
+            'doi': doi,
+            'api_source': 'pubmed'
+        }
+
     def fetch_paper_details_pubmed(self, pmid):
         params = {
             'db': 'pubmed',
             'id': pmid,
             'retmode': 'xml'
         }
-        response = requests.get(self.pubmed_fetch_url, params=params, headers=self.headers)
+        response = self.eutils_request(self.pubmed_fetch_url, params)
         if response.status_code == 200:
             root = ET.fromstring(response.content)
             article = root.find(".//PubmedArticle")
             if article is not None:
-                doi = (article.findtext(".//ArticleId[@IdType='doi']") or
-                       article.findtext(".//ELocationID[@EIdType='doi']") or
-                       article.findtext(".//PubmedData/ArticleIdList/ArticleId[@IdType='doi']") or
-                       '')
-                
-                unique_id = self.generate_unique_id(doi)
-                
-                paper = {
-                    'id': str(unique_id),
-                    'title': article.findtext(".//ArticleTitle", ''),
-                    'abstract': article.findtext(".//AbstractText", ''),
-                    'url': f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
-                    'year': article.findtext(".//PubDate/Year", ''),
-                    'pmid': pmid,
-                    'type': article.findtext(".//PublicationType", ''),
-                    'authors': [author.findtext(".//LastName", '') + ' ' + author.findtext(".//ForeName", '') for author in article.findall(".//Author")],
-                    'doi': doi,
-                    'api_source': 'pubmed'  # 添加这一行
-                }
-                logging.info(f"PubMed paper found: {paper['title'][:100]}... DOI: {doi}")
+                paper = self.parse_pubmed_article(article, pmid)
+                logger.debug("PubMed paper found: %.100s... DOI: %s", paper['title'], paper['doi'])
                 return paper
-        logging.warning(f"Failed to fetch paper details for PMID: {pmid}")
+        logger.warning("Failed to fetch paper details for PMID: %s", pmid)
         return None
 
     def get_pubmed_citation_count(self, pmid):
         # PubMed 不直接提供引用次数，我们可以尝试获取 "Cited by" 文章数量
-        cited_by_url = f"https://eutils.ncbi.nlm.nih.gov/entrez/eutils/elink.fcgi?dbfrom=pubmed&linkname=pubmed_pubmed_citedin&id={pmid}"
         try:
-            response = requests.get(cited_by_url)
-            if response.status_code == 200:
-                root = ET.fromstring(response.content)
-                cited_by_count = len(root.findall(".//Link"))
-                return cited_by_count
-            else:
-                return 0
-        except RequestException:
+            return len(self.fetch_pubmed_links([pmid])[str(pmid)])
+        except (RequestException, ET.ParseError):
             return 0
 
     def search_papers_pmc(self, keywords, start_year=None, end_year=None, max_results=10):
@@ -202,7 +426,7 @@ class PaperSearcher:
         if start_year and end_year:
             params['term'] += f" AND ({start_year}[PDAT]:{end_year}[PDAT])"
 
-        response = requests.get(self.pmc_search_url, params=params, headers=self.headers)
+        response = self.eutils_request(self.pmc_search_url, params)
         if response.status_code == 200:
             root = ET.fromstring(response.content)
             id_list = [id_elem.text for id_elem in root.findall('.//IdList/Id')]
@@ -210,18 +434,14 @@ class PaperSearcher:
             for pmcid in id_list:
                 paper = self.fetch_paper_details_pmc(pmcid)
                 if paper:
-                    # 确保每篇论文都有一个唯一的ID
-                    doi = paper.get('doi', '')
-                    unique_id = self.generate_unique_id(doi)
-                    paper['id'] = str(unique_id)
-                    paper['api_source'] = 'pmc'  # 添加这一行
+                    paper['api_source'] = 'pmc'
                     
                     papers.append(paper)
-                    logging.info(f"PMC paper found: {paper['title'][:100]}... DOI: {paper.get('doi', 'N/A')}")
+                    logger.debug("PMC paper found: %.100s... DOI: %s", paper['title'], paper.get('doi', 'N/A'))
             self.fetch_citation_counts(papers, 'pmc')
             return papers
         else:
-            logging.error(f"PMC搜索失败，状态码: {response.status_code}")
+            logger.error("PMC搜索失败，状态码: %s", response.status_code)
             return []
 
     def fetch_paper_details_pmc(self, pmcid):
@@ -230,13 +450,14 @@ class PaperSearcher:
             'id': pmcid,
             'retmode': 'xml'
         }
-        response = requests.get(self.pmc_fetch_url, params=params, headers=self.headers)
+        response = self.eutils_request(self.pmc_fetch_url, params)
         if response.status_code == 200:
             root = ET.fromstring(response.content)
             article = root.find('.//article')
             if article is not None:
                 doi = article.findtext(".//article-id[@pub-id-type='doi']", '')
-                unique_id = self.generate_unique_id(doi)
+                # 没有 DOI 时用 PMCID 作为 ID，同一秒内获取的多篇论文不会因时间戳相同而重复
+                unique_id = self.generate_unique_id(doi) if doi else f"pmc_{pmcid}"
                 paper = {
                     'id': str(unique_id),  # 确保 id 是字符串
                     'title': article.findtext(".//article-title", ''),
@@ -248,16 +469,16 @@ class PaperSearcher:
                     'authors': [author.findtext(".//surname", '') + ' ' + author.findtext(".//given-names", '') for author in article.findall(".//contrib[@contrib-type='author']")],
                     'doi': doi
                 }
-                logging.info(f"PMC paper details fetched: {paper['title'][:100]}... DOI: {doi}")
+                logger.debug("PMC paper details fetched: %.100s... DOI: %s", paper['title'], doi)
                 return paper
-        logging.warning(f"Failed to fetch paper details for PMCID: {pmcid}")
+        logger.warning("Failed to fetch paper details for PMCID: %s", pmcid)
         return None
 
     def get_pmc_citation_count(self, pmcid):
         # PMC 也不直接提供引用次数，我可以尝试获取 "Cited by" 文章数量
-        cited_by_url = f"https://eutils.ncbi.nlm.nih.gov/entrez/eutils/elink.fcgi?dbfrom=pmc&linkname=pmc_pmc_citedby&id={pmcid}"
+        params = {'dbfrom': 'pmc', 'linkname': 'pmc_pmc_citedby', 'id': pmcid}
         try:
-            response = requests.get(cited_by_url)
+            response = self.eutils_request(self.elink_url, params)
             if response.status_code == 200:
                 root = ET.fromstring(response.content)
                 cited_by_count = len(root.findall(".//Link"))
@@ -273,17 +494,19 @@ class PaperSearcher:
         对于其他API源（如PMC），将使用其原有的下载逻辑。
         """
         doi = paper.get('doi', '')
+        # 文件按论文ID命名：没有DOI的论文也各自保存，不会互相覆盖
+        name = paper.get('id') or doi
         if api_source == 'crossref':
-            return self.download_or_get_abstract_crossref(doi, doi, api_source)
+            return self.download_or_get_abstract_crossref(doi, doi, api_source, name)
         elif api_source == 'pubmed':
-            return self.download_or_get_abstract_pubmed(paper['pmid'], doi, api_source)
+            return self.download_or_get_abstract_pubmed(paper['pmid'], doi, api_source, name)
         elif api_source == 'pmc':
-            return self.download_pdf_pmc(paper['pmcid'], doi, api_source)
+            return self.download_pdf_pmc(paper['pmcid'], doi, api_source, name)
         else:
-            logging.warning(f"Unsupported API source: {api_source}")
+            logger.warning("Unsupported API source: %s", api_source)
             return None
 
-    def download_or_get_abstract_crossref(self, doi, title, api_source):
+    def download_or_get_abstract_crossref(self, doi, title, api_source, name=None):
         url = f"https://doi.org/{doi}"
         try:
             response = self.session.get(url, allow_redirects=True, timeout=30)
@@ -291,34 +514,34 @@ class PaperSearcher:
             if response.status_code == 200:
                 pdf_url = self.extract_pdf_url(response.url, response.text)
                 if pdf_url:
-                    pdf_result = self.download_pdf(pdf_url, doi, api_source)
+                    pdf_result = self.download_pdf(pdf_url, doi, api_source, name)
                     if pdf_result:
                         return pdf_result
                 
                 # 如果无法直接获取PDF，尝试使用Sci-Hub
-                sci_hub_result = self.try_sci_hub(doi, title, api_source)
+                sci_hub_result = self.try_sci_hub(doi, title, api_source, name)
                 if sci_hub_result:
                     return sci_hub_result
 
                 # 如果无法获取PDF，尝试提取摘要
                 abstract = self.extract_abstract(response.text)
                 if abstract:
-                    filename = self.get_valid_filename(doi + '.txt')  # 使用DOI作为文件名
+                    filename = self.get_valid_filename(str(name or doi)) + '.txt'
                     filepath = os.path.join(self.download_dir, filename)
                     with open(filepath, 'w', encoding='utf-8') as f:
                         f.write(abstract)
-                    logging.info(f"Saved Crossref abstract to {filepath}")
+                    logger.info("Saved Crossref abstract to %s", filepath)
                     return {'type': 'abstract', 'path': filepath}
                 else:
-                    logging.warning(f"Unable to extract abstract for DOI: {doi}")
+                    logger.warning("Unable to extract abstract for DOI: %s", doi)
                     return {'type': 'error', 'message': '无法提取摘要'}
 
             return {'type': 'error', 'message': '无法获取文章内容'}
         except TooManyRedirects:
-            logging.error(f"Too many redirects when accessing DOI: {doi}")
+            logger.error("Too many redirects when accessing DOI: %s", doi)
             return {'type': 'error', 'message': '访问DOI时遇到太多重定向'}
         except RequestException as e:
-            logging.error(f"Error accessing DOI {doi}: {str(e)}")
+            logger.error("Error accessing DOI %s: %s", doi, e)
             return {'type': 'error', 'message': f'访问DOI时出错: {str(e)}'}
 
     def extract_pdf_url(self, url, html_content):
@@ -341,7 +564,7 @@ class PaperSearcher:
         
         return None
 
-    def try_sci_hub(self, doi, title, api_source):
+    def try_sci_hub(self, doi, title, api_source, name=None):
         sci_hub_url = f"{self.sci_hub_url}{doi}"
         try:
             response = self.session.get(sci_hub_url)
@@ -352,9 +575,9 @@ class PaperSearcher:
                     pdf_url = pdf_link['src']
                     if pdf_url.startswith('//'):
                         pdf_url = 'https:' + pdf_url
-                    return self.download_pdf(pdf_url, doi, api_source)
+                    return self.download_pdf(pdf_url, doi, api_source, name)
         except Exception as e:
-            logging.error(f"Error accessing Sci-Hub: {str(e)}")
+            logger.error("Error accessing Sci-Hub: %s", e)
         return None
 
     def extract_pdf_url_from_sci_hub(self, html_content):
@@ -380,60 +603,60 @@ class PaperSearcher:
         
         return None
 
-    def download_pdf(self, url, doi, api_source):
+    def download_pdf(self, url, doi, api_source, name=None):
         """
         下载PDF文件。
-        使用DOI作为文件名的一部分。
+        文件名使用 name（论文ID），未提供时使用DOI。
         """
         if api_source not in ['pubmed', 'crossref', 'pmc']:
-            logging.warning(f"PDF download not supported for API source: {api_source}")
+            logger.warning("PDF download not supported for API source: %s", api_source)
             return None
 
         try:
             response = self.session.get(url, stream=True)
             if response.status_code == 200 and response.headers.get('Content-Type', '').startswith('application/pdf'):
-                filename = self.get_valid_filename(doi) + '.pdf'
+                filename = self.get_valid_filename(str(name or doi)) + '.pdf'
                 filepath = os.path.join(self.download_dir, filename)
                 with open(filepath, 'wb') as f:
                     for chunk in response.iter_content(chunk_size=8192):
                         if chunk:
                             f.write(chunk)
-                logging.info(f"Saved PDF from {api_source} to {filepath}")
+                logger.info("Saved PDF from %s to %s", api_source, filepath)
                 return {'type': 'pdf', 'path': filepath}
             else:
-                logging.warning(f"Failed to download PDF from {api_source}. URL: {url}. Status code: {response.status_code}")
+                logger.warning("Failed to download PDF from %s. URL: %s. Status code: %s", api_source, url, response.status_code)
         except Exception as e:
-            logging.error(f"Error downloading PDF from {api_source}. URL: {url}. Error: {str(e)}")
+            logger.error("Error downloading PDF from %s. URL: %s. Error: %s", api_source, url, e)
         return None
 
-    def download_or_get_abstract_pubmed(self, pmid, doi, api_source):
+    def download_or_get_abstract_pubmed(self, pmid, doi, api_source, name=None):
         paper = self.fetch_paper_details_pubmed(pmid)
         if paper:
             if paper.get('full_text_link'):
-                pdf_result = self.download_pdf(paper['full_text_link'], doi, api_source)
+                pdf_result = self.download_pdf(paper['full_text_link'], doi, api_source, name)
                 if pdf_result:
                     return pdf_result
             if paper['abstract']:
-                filename = self.get_valid_filename(doi) + '.txt'
+                filename = self.get_valid_filename(str(name or doi)) + '.txt'
                 filepath = os.path.join(self.download_dir, filename)
                 with open(filepath, 'w', encoding='utf-8') as f:
                     f.write(paper['abstract'])
-                logging.info(f"Saved PubMed abstract to {filepath}")
+                logger.info("Saved PubMed abstract to %s", filepath)
                 return {'type': 'abstract', 'path': filepath}
-        logging.warning(f"无法获取PubMed摘要或全文: {pmid}")
+        logger.warning("无法获取PubMed摘要或全文: %s", pmid)
         return None
 
-    def download_or_get_abstract_pmc(self, pmcid, doi, api_source):
+    def download_or_get_abstract_pmc(self, pmcid, doi, api_source, name=None):
         paper = self.fetch_paper_details_pmc(pmcid)
         if paper and paper['abstract']:
-            filename = self.get_valid_filename(doi) + '_abstract.txt'
+            filename = self.get_valid_filename(str(name or doi)) + '_abstract.txt'
             filepath = os.path.join(self.download_dir, filename)
             with open(filepath, 'w', encoding='utf-8') as f:
                 f.write(paper['abstract'])
-            logging.info(f"Saved PMC abstract to {filepath}")
+            logger.info("Saved PMC abstract to %s", filepath)
             return {'type': 'abstract', 'path': filepath}
         else:
-            logging.warning(f"无法获取PMC摘要: {pmcid}")
+            logger.warning("无法获取PMC摘要: %s", pmcid)
             return None
 
     def get_valid_filename(self, text):
@@ -452,18 +675,18 @@ class PaperSearcher:
         else:
             return f"paper_{int(time.time())}"
 
-    def download_pdf_pmc(self, pmcid, doi, api_source):
+    def download_pdf_pmc(self, pmcid, doi, api_source, name=None):
         url = f"https://www.ncbi.nlm.nih.gov/pmc/articles/PMC{pmcid}/pdf/"
         response = requests.get(url, headers=self.headers)
         if response.status_code == 200:
-            filename = self.get_valid_filename(doi) + '.pdf'
+            filename = self.get_valid_filename(str(name or doi)) + '.pdf'
             filepath = os.path.join(self.download_dir, filename)
             with open(filepath, 'wb') as f:
                 f.write(response.content)
-            logging.info(f"Saved PMC PDF to {filepath}")
+            logger.info("Saved PMC PDF to %s", filepath)
             return {'type': 'pdf', 'path': filepath}
         else:
-            logging.warning(f"无法下载PMC PDF: {pmcid}")
+            logger.warning("无法下载PMC PDF: %s", pmcid)
             return None
 
     def extract_abstract(self, html_content):
@@ -494,18 +717,21 @@ class PaperSearcher:
         
         return abstract
 
-    def get_latest_papers_pubmed(self, keywords, max_results=10, weeks=None, months=None):
-        base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-        
+    @staticmethod
+    def recent_start_date(weeks=None, months=None):
+        """最近 weeks 周或 months 个月的起始日期（YYYY/MM/DD），默认一个月"""
         if weeks:
             start_date = datetime.now() - timedelta(weeks=weeks)
         elif months:
             start_date = datetime.now() - relativedelta(months=months)
         else:
-            start_date = datetime.now() - relativedelta(months=1)  # 默认一个月
-        
-        date_string = start_date.strftime("%Y/%m/%d")
-        
+            start_date = datetime.now() - relativedelta(months=1)
+        return start_date.strftime("%Y/%m/%d")
+
+    def get_latest_papers_pubmed(self, keywords, max_results=10, weeks=None, months=None):
+        base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
+        date_string = self.recent_start_date(weeks, months)
+
         params = {
             'db': 'pubmed',
             'term': f"({keywords}) AND ({date_string}[PDAT] : 3000[PDAT])",
@@ -514,27 +740,20 @@ class PaperSearcher:
             'retmode': 'json'
         }
         
-        logging.info(f"PubMed search URL: {base_url}?{'&'.join([f'{k}={v}' for k, v in params.items()])}")
+        logger.debug("PubMed search: %s %s", base_url, params)
         
-        response = requests.get(base_url, params=params)
+        response = self.eutils_request(base_url, params)
         if response.status_code == 200:
             data = response.json()
             id_list = data['esearchresult']['idlist']
-            logging.info(f"PubMed IDs found: {len(id_list)}")
-            
-            papers = []
-            for pmid in id_list:
-                paper = self.fetch_paper_details_pubmed(pmid)
-                if paper:
-                    paper['api_source'] = 'pubmed'  # 确保设置 api_source
-                    papers.append(paper)
-                    logging.info(f"Added paper: {paper['title']} DOI: {paper.get('doi', 'N/A')}")
+            logger.info("PubMed IDs found: %s", len(id_list))
             
-            logging.info(f"Total papers found: {len(papers)}")
+            papers = self.fetch_pubmed_details(id_list)
+            logger.info("Total papers found: %s", len(papers))
             self.fetch_citation_counts(papers, 'pubmed')
             return papers
         else:
-            logging.error(f"Failed to fetch papers from PubMed. Status code: {response.status_code}")
+            logger.error("Failed to fetch papers from PubMed. Status code: %s", response.status_code)
             return []
 
     def download_or_get_abstract(self, paper, api_source):
@@ -543,14 +762,16 @@ class PaperSearcher:
         对于其他API源（如PMC），将使用其原有的下载逻辑。
         """
         doi = paper.get('doi', '')
+        # 文件按论文ID命名：没有DOI的论文也各自保存，不会互相覆盖
+        name = paper.get('id') or doi
         if api_source == 'crossref':
-            return self.download_or_get_abstract_crossref(doi, doi, api_source)
+            return self.download_or_get_abstract_crossref(doi, doi, api_source, name)
         elif api_source == 'pubmed':
-            return self.download_or_get_abstract_pubmed(paper['pmid'], doi, api_source)
+            return self.download_or_get_abstract_pubmed(paper['pmid'], doi, api_source, name)
         elif api_source == 'pmc':
-            return self.download_pdf_pmc(paper['pmcid'], doi, api_source)
+            return self.download_pdf_pmc(paper['pmcid'], doi, api_source, name)
         else:
-            logging.warning(f"Unsupported API source: {api_source}")
+            logger.warning("Unsupported API source: %s", api_source)
             return None
 
         if result and result['type'] != 'error':
@@ -0,0 +1,143 @@
+import logging
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from PyPDF2 import PdfReader
+from PyPDF2.errors import PdfReadError
+
+logger = logging.getLogger(__name__)
+
+_CJK_RE = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]')
+
+
+class PDFTextError(Exception):
+    """PDF 无法打开或解析"""
+
+
+def estimate_tokens(text):
+    """粗略估计 token 数：汉字约 1 个 token，其余字符约 4 个一个 token"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk) // 4
+
+
+def truncate_to_tokens(text, token_budget):
+    """截断文本使估计的 token 数不超过预算"""
+    if token_budget is None or estimate_tokens(text) <= token_budget:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= token_budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
+
+
+class _PageCache:
+    """进程内按页缓存提取出的文本，按总字符数做 LRU 淘汰"""
+
+    def __init__(self, max_chars=16_000_000):
+        self.max_chars = max_chars
+        self.chars = 0
+        self.pages = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            text = self.pages.get(key)
+            if text is not None:
+                self.pages.move_to_end(key)
+            return text
+
+    def put(self, key, text):
+        with self.lock:
+            if key in self.pages:
+                return
+            self.pages[key] = text
+            self.chars += len(text)
+            while self.chars > self.max_chars and len(self.pages) > 1:
+                _, old = self.pages.popitem(last=False)
+                self.chars -= len(old)
+
+
+page_cache = _PageCache()
+
+
+class PDFText:
+    """内存映射打开 PDF，按需逐页提取文本
+
+    文件内容由操作系统按页调入，PyPDF2 只解析实际访问的页面，
+    因此很大的 PDF 也只占用与读取页数相关的内存。用作上下文管理器，退出时释放映射。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        stat = os.stat(path)
+        # 文件内容变化（大小或修改时间不同）后缓存自动失效
+        self.cache_key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.reader = PdfReader(self.map, strict=False)
+            self.page_count = len(self.reader.pages)
+        except (ValueError, OSError, PdfReadError) as e:
+            self.close()
+            raise PDFTextError(f"无法打开PDF {path}: {str(e)}") from e
+
+    def page_text(self, number):
+        key = self.cache_key + (number,)
+        text = page_cache.get(key)
+        if text is None:
+            try:
+                text = self.reader.pages[number].extract_text() or ''
+            except Exception as e:
+                # 个别页面损坏时跳过该页，不影响其余页面
+                logger.warning("提取PDF第 %s 页文本失败: %s: %s", number + 1, self.path, e)
+                text = ''
+            page_cache.put(key, text)
+        return text
+
+    def iter_pages(self, start=0, end=None):
+        for number in range(start, min(end or self.page_count, self.page_count)):
+            yield number, self.page_text(number)
+
+    def read(self, token_budget=None, max_pages=None):
+        """从第一页开始读取，达到 token 预算或页数上限后停止
+
+        返回 (文本, 已读取页数)；最后一页超出预算的部分会被截掉。
+        """
+        parts, tokens, pages_read = [], 0, 0
+        for number, text in self.iter_pages(end=max_pages):
+            pages_read = number + 1
+            if token_budget is not None:
+                page_tokens = estimate_tokens(text)
+                if tokens + page_tokens > token_budget:
+                    parts.append(truncate_to_tokens(text, token_budget - tokens))
+                    break
+                tokens += page_tokens
+            parts.append(text)
+        return '\n'.join(part for part in parts if part), pages_read
+
+    def close(self):
+        if getattr(self, 'map', None) is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def extract_text(path, token_budget=None, max_pages=None):
+    """提取 PDF 文本，可用 token 预算或页数上限提前停止"""
+    with PDFText(path) as pdf:
+        text, pages_read = pdf.read(token_budget, max_pages)
+        logger.info("已提取PDF文本: %s，读取 %s/%s 页，%s 字符", path, pages_read, pdf.page_count, len(text))
+        return text
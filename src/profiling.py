@@ -0,0 +1,189 @@
+"""可选的性能分析
+
+设置环境变量 PAPER_PROFILE=1（或在主窗口"工具"菜单中勾选"性能分析"）后：
+- 每个界面操作（搜索、下载、AI分析、浏览数据库等）用 cProfile 记录，保存为 profiles/<时间>-<操作>.prof，
+  可用 python -m pstats 或 snakeviz 查看；
+- PaperSearcher / AIProcessor / PaperManager 等入口的每次调用记录为一个计时区间，
+  关闭分析或程序退出时写出 profiles/trace-<进程号>.json（Chrome trace 格式，可在 chrome://tracing 或 Perfetto 中打开）。
+输出目录可用 PAPER_PROFILE_DIR 修改。未开启时包装函数只多一次布尔判断。
+"""
+import atexit
+import cProfile
+import functools
+import inspect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# 需要记录的入口：(本包中的模块, 类名, 方法名列表, 是否作为独立操作用 cProfile 记录)
+TARGETS = [
+    ('main_window', 'MainWindow',
+     ['search_papers', 'batch_search_papers', 'download_all_papers', 'process_papers_with_ai', 'show_similar_papers',
+      'open_database_viewer', 'update_paper_table', 'finish_batch'], True),
+    ('database_viewer', 'DatabaseViewer', ['load_papers'], True),
+    ('worker', 'Worker', ['run_job'], True),
+    ('paper_searcher', 'PaperSearcher',
+     ['search', 'search_papers_batch', 'fetch_citation_counts', 'fetch_pubmed_details', 'fetch_pubmed_links', 'fetch_crossref_works',
+      'eutils_request', 'download_or_get_abstract'], False),
+    ('ai_processor', 'AIProcessor', ['process_paper', 'analyze_text', 'shortlist_papers'], False),
+    ('paper_manager', 'PaperManager',
+     ['add_papers', 'import_papers', 'get_all_papers', 'get_papers_page', 'get_papers_by_ids', 'get_row_status',
+      'search_library', 'find_similar_papers', 'reindex_papers', 'update_paper_ai_notes', 'record_paper_file'],
+     False),
+]
+
+
+class Profiler:
+    def __init__(self, max_events=200_000):
+        self.enabled = False
+        self.output_dir = None
+        self.events = deque(maxlen=max_events)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.counter = 0
+        self.pid = os.getpid()
+        self.epoch = time.perf_counter()
+
+    def enable(self, output_dir=None):
+        self.output_dir = output_dir or os.getenv('PAPER_PROFILE_DIR', 'profiles')
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.enabled = True
+        logger.info("性能分析已开启，输出目录: %s", os.path.abspath(self.output_dir))
+
+    def disable(self):
+        if not self.enabled:
+            return None
+        self.enabled = False
+        path = self.write_trace()
+        logger.info("性能分析已关闭")
+        return path
+
+    def _now_us(self):
+        return (time.perf_counter() - self.epoch) * 1e6
+
+    @contextmanager
+    def span(self, name, **args):
+        """记录一个计时区间（Chrome trace 的完整事件）"""
+        if not self.enabled:
+            yield
+            return
+        start = self._now_us()
+        try:
+            yield
+        finally:
+            event = {'name': name, 'ph': 'X', 'ts': start, 'dur': self._now_us() - start,
+                     'pid': self.pid, 'tid': threading.get_ident()}
+            if args:
+                event['args'] = args
+            self.events.append(event)
+
+    @contextmanager
+    def action(self, name):
+        """一个完整操作：计时区间 + cProfile；同一线程中嵌套的操作只记录计时区间"""
+        if not self.enabled or getattr(self.local, 'profile', None) is not None:
+            with self.span(name):
+                yield
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 其他分析工具已在运行（Python 3.12 起 cProfile 全局只能有一个）
+            profile = None
+        self.local.profile = profile
+        start = time.perf_counter()
+        try:
+            with self.span(name, action=True):
+                yield
+        finally:
+            self.local.profile = None
+            elapsed = (time.perf_counter() - start) * 1000
+            if profile is not None:
+                profile.disable()
+                path = self._prof_path(name)
+                profile.dump_stats(path)
+                logger.info("性能分析: %s 耗时 %.1f ms，已保存 %s", name, elapsed, path)
+
+    def _prof_path(self, name):
+        with self.lock:
+            self.counter += 1
+            counter = self.counter
+        safe = re.sub(r'[^\w.-]', '_', name)
+        return os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{self.pid}-{counter:04d}-{safe}.prof")
+
+    def write_trace(self, path=None):
+        if not self.events or not self.output_dir:
+            return None
+        path = path or os.path.join(self.output_dir, f'trace-{self.pid}.json')
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        events = list(self.events)
+        meta = [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': names.get(tid, str(tid))}}
+                for tid in {event['tid'] for event in events}]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': meta + events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+        logger.info("已写出 %s 个计时区间: %s", len(events), path)
+        return path
+
+
+profiler = Profiler()
+span = profiler.span
+action = profiler.action
+
+
+def profiled(name, is_action=False):
+    """包装函数：开启分析时记录为计时区间或操作
+
+    Qt 信号会把额外参数（如 clicked 的 checked）传给槽函数，这里按原函数能接受的位置参数个数截断，
+    保持与直接连接原函数相同的行为。
+    """
+    def decorator(func):
+        params = inspect.signature(func).parameters.values()
+        takes_varargs = any(p.kind == p.VAR_POSITIONAL for p in params)
+        max_args = None if takes_varargs else sum(
+            1 for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+        recorder = profiler.action if is_action else profiler.span
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if max_args is not None:
+                args = args[:max_args]
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            with recorder(name):
+                return func(*args, **kwargs)
+        wrapper.__profiled__ = True
+        return wrapper
+    return decorator
+
+
+_installed = set()
+
+
+def install(targets=TARGETS):
+    """按 TARGETS 包装各入口（只包装一次）；环境变量 PAPER_PROFILE 为真时同时开启分析
+
+    需要在连接 Qt 信号之前调用，之后在菜单中开关分析即可生效。
+    """
+    import importlib
+    for module_name, class_name, methods, is_action in targets:
+        if (module_name, class_name) in _installed:
+            continue
+        cls = getattr(importlib.import_module(f'.{module_name}', __package__), class_name)
+        for method in methods:
+            func = cls.__dict__.get(method)
+            if func is None or getattr(func, '__profiled__', False):
+                continue
+            setattr(cls, method, profiled(f"{class_name}.{method}", is_action)(func))
+        _installed.add((module_name, class_name))
+    if os.getenv('PAPER_PROFILE', '').lower() in ('1', 'true', 'yes') and not profiler.enabled:
+        profiler.enable()
+
+
+atexit.register(profiler.disable)
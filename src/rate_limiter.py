@@ -0,0 +1,43 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """令牌桶限速器，可在多个线程间共享
+
+    rate 为每秒补充的令牌数，burst 为桶容量（允许的瞬时并发请求数）。
+    acquire() 在令牌不足时阻塞到可以发出请求为止。
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1, rate))
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.burst
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            self.sleep(wait)
+
+    def try_acquire(self, tokens=1):
+        """不阻塞：有足够令牌时取走并返回 True"""
+        with self.lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
@@ -0,0 +1,244 @@
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
+
+
+class PaperTableModel(QAbstractTableModel):
+    """按页懒加载的论文表格模型
+
+    fetch_page(cursor, limit) 返回 (papers, next_cursor)，next_cursor 为 None 表示没有更多数据；
+    视图滚动到底部时通过 canFetchMore/fetchMore 加载下一页，已加载的行只保存列表显示需要的字段。
+    """
+
+    # (字段, 表头)
+    COLUMNS = [
+        ('id', "ID"),
+        ('title', "标题"),
+        ('authors', "作者"),
+        ('year', "年份"),
+        ('citation_count', "引用次数"),
+        ('api_source', "API来源"),
+        ('doi', "DOI"),
+        ('downloaded', "下载状态"),
+        ('has_notes', "笔记"),
+        ('has_ai_notes', "AI笔记"),
+        ('actions', "操作"),
+        ('snippet', "匹配片段"),
+    ]
+
+    def __init__(self, fetch_page, page_size=200, first_cursor=0, parent=None):
+        super().__init__(parent)
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.papers = []
+        self.next_cursor = first_cursor
+
+    @classmethod
+    def column_index(cls, key):
+        return [column for column, _ in cls.COLUMNS].index(key)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.papers)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section][1]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        paper = self.papers[index.row()]
+        key = self.COLUMNS[index.column()][0]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.display_value(paper, key)
+        if role == Qt.ItemDataRole.ToolTipRole and key in ('title', 'authors', 'snippet'):
+            return paper.get(key) or None
+        return None
+
+    @staticmethod
+    def display_value(paper, key):
+        value = paper.get(key)
+        if key == 'downloaded':
+            return "已下载" if value else "未下载"
+        if key in ('has_notes', 'has_ai_notes'):
+            return "有" if value else "无"
+        if key == 'actions':
+            return "删除"
+        return '' if value is None else str(value)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.next_cursor is not None
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.next_cursor is None:
+            return
+        papers, self.next_cursor = self.fetch_page(self.next_cursor, self.page_size)
+        if not papers:
+            return
+        self.beginInsertRows(QModelIndex(), len(self.papers), len(self.papers) + len(papers) - 1)
+        self.papers.extend(papers)
+        self.endInsertRows()
+
+    def paper(self, row):
+        return self.papers[row]
+
+    def remove_paper(self, row):
+        """只从已加载的数据中移除一行，不需要重新查询"""
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.papers[row]
+        self.endRemoveRows()
+
+
+# 排序用的角色：数值列返回数字，文本列返回小写字符串，避免按字符串比较 "100" < "9"
+SORT_ROLE = Qt.ItemDataRole.UserRole
+
+
+class PaperResultsModel(QAbstractTableModel):
+    """主窗口搜索结果表格的模型
+
+    数据就是搜索得到的 papers 列表和一次批量查询的行状态；排序、筛选交给 PaperFilterProxyModel，
+    不会重建任何单元格对象。
+    """
+
+    # (字段, 表头)
+    COLUMNS = [
+        ('title', "标题"),
+        ('authors', "作者"),
+        ('year', "年份"),
+        ('citation_count', "引用次数"),
+        ('api_source', "API来源"),
+        ('doi', "DOI"),
+        ('id', "ID"),
+        ('has_notes', "笔记"),
+        ('downloaded', "下载状态"),
+        ('has_ai_notes', "AI笔记"),
+    ]
+    NUMERIC_KEYS = ('year', 'citation_count')
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.papers = []
+        self.row_status = {}
+        self.haystacks = []
+
+    def set_papers(self, papers, row_status=None):
+        self.beginResetModel()
+        self.papers = papers
+        self.row_status = row_status or {}
+        # 每行预先拼好小写的可筛选文本，输入筛选词时只做子串判断
+        self.haystacks = [
+            ' '.join(self.display_value(paper, key) for key in ('title', 'authors', 'year', 'api_source', 'doi', 'id')).lower()
+            for paper in papers
+        ]
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.papers)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section][1]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        paper = self.papers[index.row()]
+        key = self.COLUMNS[index.column()][0]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.display_value(paper, key)
+        if role == SORT_ROLE:
+            return self.sort_value(paper, key)
+        if role == Qt.ItemDataRole.ToolTipRole and key in ('title', 'authors'):
+            return self.display_value(paper, key) or None
+        if role == Qt.ItemDataRole.ToolTipRole and key == 'downloaded' and self.duplicate_of(paper):
+            return f"与 {self.duplicate_of(paper)} 重复，下载和AI分析时跳过"
+        return None
+
+    def status(self, paper, key):
+        status = self.row_status.get(str(paper.get('id')), {})
+        if key == 'downloaded':
+            return bool(status.get('downloaded', paper.get('downloaded', False)))
+        return bool(status.get(key))
+
+    def duplicate_of(self, paper):
+        return self.row_status.get(str(paper.get('id')), {}).get('duplicate_of') or paper.get('duplicate_of')
+
+    def display_value(self, paper, key):
+        if key == 'authors':
+            return ', '.join(paper.get('authors') or [])
+        if key == 'api_source':
+            return (paper.get('api_source') or '').upper()
+        if key == 'downloaded':
+            if self.duplicate_of(paper) and not self.status(paper, key):
+                return "重复"
+            return "已下载" if self.status(paper, key) else "未下载"
+        if key in ('has_notes', 'has_ai_notes'):
+            return "有" if self.status(paper, key) else "无"
+        value = paper.get(key)
+        return 'N/A' if value is None or (value == '' and key != 'title') else str(value)
+
+    def sort_value(self, paper, key):
+        if key in self.NUMERIC_KEYS:
+            try:
+                return int(paper.get(key))
+            except (TypeError, ValueError):
+                return -1  # N/A 排在最前（升序）
+        if key in ('downloaded', 'has_notes', 'has_ai_notes'):
+            return int(self.status(paper, key))
+        return self.display_value(paper, key).lower()
+
+    def paper(self, row):
+        return self.papers[row]
+
+
+class PaperFilterProxyModel(QSortFilterProxyModel):
+    """按 SORT_ROLE 排序，并按输入的关键词（全部命中才显示）筛选行
+
+    新筛选词是在旧筛选词后继续输入时，结果只会变少，只需重新判断上一次保留下来的行。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSortRole(SORT_ROLE)
+        self.setDynamicSortFilter(True)
+        self.filter_text = ''
+        self.terms = []
+        self.accepted = set()  # 当前筛选保留下来的源行号
+        self.candidates = None  # 需要重新判断的源行号；None 表示全部行
+
+    def set_filter_text(self, text):
+        text = text.strip().lower()
+        if text == self.filter_text:
+            return
+        narrowing = bool(self.filter_text) and text.startswith(self.filter_text)
+        self.candidates = self.accepted if narrowing else None
+        self.accepted = set()
+        self.filter_text = text
+        self.terms = text.split()
+        self.invalidateFilter()
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        # 数据整体替换前清空缓存，重置后对新数据做完整筛选
+        model.modelAboutToBeReset.connect(self._reset_filter_cache)
+
+    def _reset_filter_cache(self):
+        self.accepted = set()
+        self.candidates = None
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self.terms:
+            return True
+        if self.candidates is not None and source_row not in self.candidates:
+            return False
+        haystack = self.sourceModel().haystacks[source_row]
+        if all(term in haystack for term in self.terms):
+            self.accepted.add(source_row)
+            return True
+        return False
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBackend:
+    """嵌入后端接口：把一组文本转换成 (n, dim) 的 float32 矩阵"""
+    name = ''
+    dim = 0
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class HashingEmbedding(EmbeddingBackend):
+    """确定性的本地嵌入：对词和相邻词对做特征哈希，不依赖网络，适合离线使用和测试"""
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f'hashing-{dim}'
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = re.findall(r'\w+', (text or '').lower())
+            features = tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+                sign = 1.0 if digest >> 63 else -1.0
+                matrix[row, digest % self.dim] += sign
+        return matrix
+
+
+class DashScopeEmbedding(EmbeddingBackend):
+    """通义 text-embedding-v2 嵌入，需要 DASHSCOPE_API_KEY"""
+    name = 'dashscope-text-embedding-v2'
+    dim = 1536
+    batch_size = 25  # 接口单次最多接受的文本数
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        from dashscope import TextEmbedding
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            batch = [text or ' ' for text in texts[start:start + self.batch_size]]
+            response = TextEmbedding.call(model=TextEmbedding.Models.text_embedding_v2, input=batch)
+            if response.status_code != 200:
+                raise RuntimeError(f"嵌入接口调用失败: {response.status_code} {response.message}")
+            for item in response.output['embeddings']:
+                matrix[start + item['text_index']] = item['embedding']
+        return matrix
+
+
+def make_embedding_backend(name: Optional[str] = None) -> EmbeddingBackend:
+    """根据名称（默认读取 EMBEDDING_BACKEND 环境变量）创建嵌入后端"""
+    name = name or os.getenv('EMBEDDING_BACKEND', 'hashing')
+    if name == 'dashscope':
+        return DashScopeEmbedding()
+    return HashingEmbedding()
+
+
+class VectorIndex:
+    """论文向量索引：归一化向量存放在磁盘上的 float32 矩阵中，通过 np.memmap 按需映射
+
+    目录下的文件：
+    - vectors.f32: 容量按倍数增长的向量矩阵
+    - ids.log: 追加写入的 "行号\\t论文ID" 记录，ID 为空表示该行已删除
+    - meta.json: 后端名称、维度、容量和已用行数
+    """
+
+    def __init__(self, index_dir: str = 'data/vector_index', backend: Optional[EmbeddingBackend] = None,
+                 initial_capacity: int = 1024):
+        self.index_dir = index_dir
+        self.backend = backend or make_embedding_backend()
+        self.dim = self.backend.dim
+        self.initial_capacity = initial_capacity
+        self.vectors_path = os.path.join(index_dir, 'vectors.f32')
+        self.ids_path = os.path.join(index_dir, 'ids.log')
+        self.meta_path = os.path.join(index_dir, 'meta.json')
+        self.lock = threading.RLock()
+        os.makedirs(index_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        meta = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('backend') != self.backend.name or meta.get('dim') != self.dim:
+                logger.warning("向量索引后端已变化（%s -> %s），索引将重建", meta.get('backend'), self.backend.name)
+                meta = None
+        if meta is None:
+            for path in (self.vectors_path, self.ids_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.capacity = self.initial_capacity
+            self.count = 0
+            self._resize_file(self.capacity)
+            self._write_meta()
+        else:
+            self.capacity = meta['capacity']
+            self.count = meta['count']
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(self.capacity, self.dim))
+
+        self.row_ids: List[Optional[str]] = [None] * self.count
+        self.id_to_row: Dict[str, int] = {}
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, encoding='utf-8') as f:
+                for line in f:
+                    row, _, paper_id = line.rstrip('\n').partition('\t')
+                    row = int(row)
+                    if row >= self.count:
+                        continue  # 写入 meta 之前中断留下的记录
+                    old_id = self.row_ids[row]
+                    if old_id is not None:
+                        self.id_to_row.pop(old_id, None)
+                    self.row_ids[row] = paper_id or None
+                    if paper_id:
+                        self.id_to_row[paper_id] = row
+        logger.info("向量索引已加载: %s 篇论文（%s）", len(self.id_to_row), self.backend.name)
+
+    def _resize_file(self, capacity):
+        with open(self.vectors_path, 'ab') as f:
+            f.truncate(capacity * self.dim * 4)
+
+    def _write_meta(self):
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'backend': self.backend.name, 'dim': self.dim,
+                       'capacity': self.capacity, 'count': self.count}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        self.vectors.flush()
+        del self.vectors
+        self._resize_file(capacity)
+        self.capacity = capacity
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(self.capacity, self.dim))
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def __len__(self):
+        return len(self.id_to_row)
+
+    def __contains__(self, paper_id):
+        return str(paper_id) in self.id_to_row
+
+    def add(self, paper_id, text: str):
+        self.add_many([(paper_id, text)])
+
+    def add_many(self, items: Iterable[Tuple[str, str]]):
+        """新增或更新向量；已存在的论文原地覆盖对应行"""
+        items = [(str(paper_id), text) for paper_id, text in items]
+        if not items:
+            return
+        embeddings = self._normalize(self.backend.embed([text for _, text in items]))
+        with self.lock:
+            new_ids = {paper_id for paper_id, _ in items if paper_id not in self.id_to_row}
+            if self.count + len(new_ids) > self.capacity:
+                self._grow(self.count + len(new_ids))
+            with open(self.ids_path, 'a', encoding='utf-8') as log:
+                for (paper_id, _), vector in zip(items, embeddings):
+                    row = self.id_to_row.get(paper_id)
+                    if row is None:
+                        row = self.count
+                        self.count += 1
+                        self.row_ids.append(paper_id)
+                        self.id_to_row[paper_id] = row
+                        log.write(f'{row}\t{paper_id}\n')
+                    self.vectors[row] = vector
+            self.vectors.flush()
+            self._write_meta()
+
+    def remove(self, paper_id):
+        paper_id = str(paper_id)
+        with self.lock:
+            row = self.id_to_row.pop(paper_id, None)
+            if row is None:
+                return
+            self.row_ids[row] = None
+            self.vectors[row] = 0
+            with open(self.ids_path, 'a', encoding='utf-8') as log:
+                log.write(f'{row}\t\n')
+
+    def get_vector(self, paper_id) -> Optional[np.ndarray]:
+        row = self.id_to_row.get(str(paper_id))
+        return None if row is None else np.array(self.vectors[row])
+
+    def search(self, vector: np.ndarray, k: int = 10, exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """返回与查询向量余弦相似度最高的 k 篇论文 [(paper_id, score)]"""
+        with self.lock:
+            if not self.id_to_row:
+                return []
+            query = self._normalize(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+            scores = self.vectors[:self.count] @ query
+            # 已删除行的向量为零，多取几行以便过滤后仍够 k 条
+            take = min(k + 1 + (self.count - len(self.id_to_row)), self.count)
+            top = np.argpartition(-scores, take - 1)[:take]
+            top = top[np.argsort(-scores[top])]
+            results = []
+            for row in top:
+                paper_id = self.row_ids[row]
+                if paper_id is None or paper_id == exclude:
+                    continue
+                results.append((paper_id, float(scores[row])))
+                if len(results) >= k:
+                    break
+            return results
+
+    def similar_to_text(self, text: str, k: int = 10) -> List[Tuple[str, float]]:
+        return self.search(self.backend.embed([text])[0], k)
+
+    def similar_to_paper(self, paper_id, k: int = 10) -> List[Tuple[str, float]]:
+        vector = self.get_vector(paper_id)
+        if vector is None:
+            return []
+        return self.search(vector, k, exclude=str(paper_id))
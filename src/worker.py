@@ -0,0 +1,309 @@
+"""任务队列的工作进程
+
+用法: python -m src.worker --processes 4 --threads 2
+每个进程有自己的数据库连接，进程内的每个线程各自从 jobs 表领取任务；
+下载等网络任务可以用较多线程，AI分析受模型并发限制，可用 --types 单独起一组进程。
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from .job_queue import JobQueue, JOB_TYPES
+from .log_config import setup_logging
+from .paper_manager import PaperManager
+
+logger = logging.getLogger(__name__)
+
+WORKER_LOG_FORMAT = '%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class JobError(Exception):
+    """任务执行失败；retryable 为 False 时不再重试"""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class Worker:
+    """在当前线程中循环领取并执行任务"""
+
+    def __init__(self, paper_manager, worker_id, job_types=None, lease_seconds=300, poll_interval=1.0):
+        self.paper_manager = paper_manager
+        self.queue = JobQueue(paper_manager.db)
+        self.worker_id = worker_id
+        self.job_types = job_types or JOB_TYPES
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._paper_searcher = None
+        self._ai_processor = None
+        self.handlers = {
+            'search': self.run_search,
+            'download': self.run_download,
+            'extract': self.run_extract,
+            'analyze': self.run_analyze,
+        }
+
+    @property
+    def paper_searcher(self):
+        if self._paper_searcher is None:
+            from .paper_searcher import PaperSearcher
+            self._paper_searcher = PaperSearcher()
+        return self._paper_searcher
+
+    @property
+    def ai_processor(self):
+        if self._ai_processor is None:
+            from .ai_processor import AIProcessor
+            self._ai_processor = AIProcessor(os.getenv('DASHSCOPE_API_KEY'))
+        return self._ai_processor
+
+    def run(self, stop_event):
+        while not stop_event.is_set():
+            job = self.queue.claim(self.worker_id, self.job_types, self.lease_seconds)
+            if job is None:
+                stop_event.wait(self.poll_interval)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job):
+        from .llm_client import LLMError
+        from .ai_processor import PaperProcessingError
+        logger.info("[%s] 开始任务 %s (%s)，第 %s 次尝试", self.worker_id, job['id'], job['type'], job['attempts'])
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job['id'], done), daemon=True)
+        heartbeat.start()
+        try:
+            result = self.handlers[job['type']](job)
+        except (JobError, LLMError) as e:
+            state = self.queue.fail(job['id'], self.worker_id, str(e), retryable=e.retryable)
+            logger.warning("[%s] 任务 %s 失败（%s）: %s", self.worker_id, job['id'], state, e)
+        except PaperProcessingError as e:
+            self.queue.fail(job['id'], self.worker_id, str(e), retryable=False)
+            logger.warning("[%s] 任务 %s 失败: %s", self.worker_id, job['id'], e)
+        except Exception as e:
+            state = self.queue.fail(job['id'], self.worker_id, f"{type(e).__name__}: {str(e)}")
+            logger.error("[%s] 任务 %s 出错（%s）: %s", self.worker_id, job['id'], state, e, exc_info=True)
+        else:
+            self.queue.complete(job['id'], self.worker_id, result)
+            logger.info("[%s] 任务 %s 完成", self.worker_id, job['id'])
+        finally:
+            done.set()
+
+    def _heartbeat(self, job_id, done):
+        # 执行期间定期续约，避免长任务被误认为工作进程已崩溃
+        while not done.wait(self.lease_seconds / 3):
+            if not self.queue.heartbeat(job_id, self.worker_id, self.lease_seconds):
+                break
+
+    def run_search(self, job):
+        payload = job['payload']
+        papers = self.paper_searcher.search(
+            payload['api_source'], payload['keywords'], payload.get('start_year'), payload.get('end_year'),
+            payload.get('max_results', 10), payload.get('weeks'), payload.get('months'))
+        self.paper_manager.add_papers(papers)
+        paper_ids = [str(paper['id']) for paper in papers]
+        if payload.get('download'):
+            self.queue.enqueue_many([{
+                'type': 'download', 'dedupe_key': f'download:{paper_id}',
+                'payload': {'paper_id': paper_id, 'analyze': payload.get('analyze', False)},
+            } for paper_id in paper_ids], job['batch'])
+        return {'paper_ids': paper_ids}
+
+    def run_download(self, job):
+        payload = job['payload']
+        paper_id = payload['paper_id']
+        paper = self.paper_manager.get_papers_by_ids([paper_id]).get(paper_id)
+        if paper is None:
+            raise JobError(f"论文不存在: {paper_id}", retryable=False)
+        if paper['duplicate_of']:
+            # 同组的规范论文负责下载和分析
+            return {'paper_ids': [], 'duplicate_of': paper['duplicate_of']}
+        result = self.paper_searcher.download_or_get_abstract(paper, paper['api_source'])
+        if not result or result['type'] == 'error':
+            raise JobError(f"无法下载全文或摘要: {paper_id}", retryable=False)
+        self.paper_manager.update_paper_download_status(paper_id, True)
+        self.paper_manager.record_paper_file(paper_id, result['path'], result['type'])
+        if payload.get('analyze'):
+            # 分析排在下载之后，让空闲的工作进程优先把下载做完
+            self.queue.enqueue('analyze', {'paper_ids': [paper_id], 'triage': True}, priority=-1,
+                               batch=job['batch'], dedupe_key=f'analyze:{paper_id}')
+        return {'paper_ids': [paper_id], 'path': result['path'], 'file_type': result['type']}
+
+    def run_extract(self, job):
+        paper_id = job['payload']['paper_id']
+        text = self.extract_text(paper_id)
+        return {'paper_ids': [paper_id], 'length': len(text)}
+
+    def extract_text(self, paper_id):
+        """把下载文件中的文本保存为论文的 full_text，返回文本"""
+        path = self.paper_manager.get_paper_file(paper_id)
+        if not path or not os.path.exists(path):
+            raise JobError(f"下载清单中没有可用文件: {paper_id}", retryable=False)
+        if path.lower().endswith('.pdf'):
+            from .pdf_text import PDFTextError, extract_text
+            try:
+                text = extract_text(path)
+            except PDFTextError as e:
+                raise JobError(str(e), retryable=False) from e
+        else:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                text = f.read()
+        if not text.strip():
+            raise JobError(f"文件中没有可提取的文本: {path}", retryable=False)
+        self.paper_manager.update_paper_text(paper_id, 'full_text', text)
+        return text
+
+    def run_analyze(self, job):
+        """对一组论文做摘要初筛和全文分析
+
+        一部分论文因可重试的错误（超时、限流、熔断）失败时，只为这些论文提交一个新任务，
+        已完成的论文不会在重试时被重复分析。
+        """
+        from .llm_client import LLMError, CircuitOpenError
+        from .ai_processor import PaperProcessingError
+        payload = job['payload']
+        papers = [paper for paper in self.paper_manager.get_papers_by_ids(payload['paper_ids']).values()
+                  if not paper['duplicate_of']]
+        duplicates = len(payload['paper_ids']) - len(papers)
+        if payload.get('triage', True):
+            papers = self.ai_processor.shortlist_papers(papers)
+        analyzed, errors, retry = [], {}, []
+        last_error = None
+        for i, paper in enumerate(papers):
+            paper_id = paper['id']
+            try:
+                # 已提取的全文直接使用，否则按页读取下载文件，读到模型输入预算为止
+                text = self.paper_manager.get_paper_text(paper_id, 'full_text')
+                if text:
+                    ai_notes = self.ai_processor.analyze_text(text)
+                else:
+                    path = self.paper_manager.get_paper_file(paper_id)
+                    if not path:
+                        raise JobError(f"下载清单中没有可用文件: {paper_id}", retryable=False)
+                    ai_notes = self.ai_processor.process_paper(path)
+            except CircuitOpenError as e:
+                last_error = e
+                retry.extend(p['id'] for p in papers[i:])
+                break
+            except LLMError as e:
+                if e.retryable:
+                    last_error = e
+                    retry.append(paper_id)
+                else:
+                    errors[paper_id] = str(e)
+                continue
+            except (JobError, PaperProcessingError) as e:
+                errors[paper_id] = str(e)
+                continue
+            self.paper_manager.update_paper_ai_notes(paper_id, ai_notes)
+            analyzed.append(paper_id)
+        if retry and not analyzed:
+            raise last_error
+        if retry:
+            self.queue.enqueue('analyze', {'paper_ids': retry, 'triage': False}, priority=-1, batch=job['batch'],
+                               delay=self.queue.retry_base)
+        return {'paper_ids': analyzed, 'errors': errors, 'retried': retry,
+                'skipped': len(payload['paper_ids']) - duplicates - len(papers), 'duplicates': duplicates}
+
+
+def run_worker_process(db_path, job_types, threads, stop_event, lease_seconds=300):
+    """工作进程入口：一个 PaperManager（连接管理器线程安全），threads 个线程领取任务"""
+    setup_logging(fmt=WORKER_LOG_FORMAT)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # 由父进程通过 stop_event 通知退出
+    from . import profiling
+    profiling.install()  # PAPER_PROFILE 由父进程的环境变量继承
+    paper_manager = PaperManager(db_path)
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    workers = [threading.Thread(target=Worker(paper_manager, f"{prefix}-{i}", job_types, lease_seconds).run,
+                                args=(stop_event,), name=f"worker-{i}") for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    paper_manager.close()
+
+
+class WorkerPool:
+    """启动和停止一组工作进程（spawn 方式，不会复制 GUI 进程的 Qt 状态）"""
+
+    def __init__(self, db_path, processes=2, threads=1, job_types=None, lease_seconds=300):
+        self.db_path = db_path
+        self.processes = processes
+        self.threads = threads
+        self.job_types = list(job_types) if job_types else None
+        self.lease_seconds = lease_seconds
+        self.context = multiprocessing.get_context('spawn')
+        self.stop_event = None
+        self.procs = []
+
+    def start(self):
+        if self.is_running():
+            return
+        self.stop_event = self.context.Event()
+        self.procs = [self.context.Process(
+            target=run_worker_process,
+            args=(self.db_path, self.job_types, self.threads, self.stop_event, self.lease_seconds),
+            name=f"paper-worker-{i}", daemon=True) for i in range(self.processes)]
+        for proc in self.procs:
+            proc.start()
+        logger.info("已启动 %s 个工作进程，每个 %s 个线程", self.processes, self.threads)
+
+    def is_running(self):
+        return any(proc.is_alive() for proc in self.procs)
+
+    def stop(self, timeout=10):
+        """通知工作进程在当前任务结束后退出；超时未退出的进程被终止，其任务在租约过期后由其他进程接手"""
+        if not self.procs:
+            return
+        self.stop_event.set()
+        deadline = time.time() + timeout
+        for proc in self.procs:
+            proc.join(max(0, deadline - time.time()))
+            if proc.is_alive():
+                proc.terminate()
+                proc.join(1)
+        self.procs = []
+        logger.info("工作进程已停止")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="论文任务队列工作进程")
+    parser.add_argument('--db', default='data/papers.db')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--threads', type=int, default=1, help='每个进程的线程数，网络任务可以调大')
+    parser.add_argument('--types', nargs='+', choices=JOB_TYPES, help='只处理这些类型的任务')
+    parser.add_argument('--lease', type=int, default=300, help='任务租约（秒），进程崩溃后任务在租约过期后被重新领取')
+    parser.add_argument('--until-empty', action='store_true', help='队列中没有未完成任务时退出')
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    setup_logging(fmt=WORKER_LOG_FORMAT)
+    paper_manager = PaperManager(args.db)  # 先在主进程完成迁移
+    queue = JobQueue(paper_manager.db)
+    pool = WorkerPool(args.db, args.processes, args.threads, args.types, args.lease)
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    pool.start()
+    try:
+        while not stopping.wait(2):
+            if args.until_empty and not queue.pending_count(args.types):
+                break
+            if not pool.is_running():
+                logger.error("工作进程全部退出")
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
+        paper_manager.close()
+
+
+if __name__ == '__main__':
+    main()
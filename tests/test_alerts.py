@@ -0,0 +1,36 @@
+from src.alerts import AlertScheduler
+from src.paper_manager import PaperManager
+
+
+class FakeSearcher:
+    def esearch_pubmed(self, query, max_results, mindate=None):
+        return ['111', '222']
+
+    def fetch_pubmed_details(self, pmids):
+        return [{'id': f'pubmed_{pmid}', 'title': f'PubMed paper {pmid}', 'pmid': pmid,
+                 'doi': '10.1000/ABC' if pmid == '111' else '', 'api_source': 'pubmed'} for pmid in pmids]
+
+    def fetch_citation_counts(self, papers, api_source):
+        pass
+
+
+def test_alert_skips_paper_already_stored_by_doi(tmp_path):
+    manager = PaperManager(str(tmp_path / 'papers.db'))
+    try:
+        # 先从 Crossref 入库的论文：只有 DOI，没有 PMID
+        manager.add_papers([{'id': '10.1000_abc', 'title': 'Seeded paper', 'doi': '10.1000/abc',
+                             'api_source': 'crossref'}])
+        scheduler = AlertScheduler(manager, paper_searcher=FakeSearcher())
+        scheduler.searches.add('test', 'test query')
+
+        summary = scheduler.run_due()
+
+        assert summary['hits'] == 2
+        assert summary['new_papers'] == 1
+        cursor = manager.db.reader().cursor()
+        cursor.execute('SELECT id FROM papers ORDER BY id')
+        assert [row[0] for row in cursor.fetchall()] == ['10.1000_abc', 'pubmed_222']
+        cursor.execute('SELECT dedupe_key FROM jobs')
+        assert [row[0] for row in cursor.fetchall()] == ['download:pubmed_222']
+    finally:
+        manager.close()
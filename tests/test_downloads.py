@@ -0,0 +1,28 @@
+from src.paper_manager import PaperManager
+from src.paper_searcher import PaperSearcher
+from src.worker import Worker
+
+
+def test_papers_without_doi_get_separate_files(tmp_path):
+    manager = PaperManager(str(tmp_path / 'papers.db'))
+    try:
+        manager.add_papers([
+            {'id': f'pubmed_{pmid}', 'title': f'Paper {pmid} without a DOI', 'pmid': pmid, 'doi': '',
+             'api_source': 'pubmed'}
+            for pmid in ('111', '222')
+        ])
+        searcher = PaperSearcher(str(tmp_path / 'downloads'))
+        searcher.fetch_paper_details_pubmed = lambda pmid: {'abstract': f'Abstract of {pmid}'}
+        worker = Worker(manager, 'test')
+        worker._paper_searcher = searcher
+        for paper_id in ('pubmed_111', 'pubmed_222'):
+            worker.run_download({'payload': {'paper_id': paper_id}, 'batch': None})
+
+        files = manager.get_paper_files(['pubmed_111', 'pubmed_222'])
+        assert files['pubmed_111'] != files['pubmed_222']
+        with open(files['pubmed_111'], encoding='utf-8') as f:
+            assert f.read() == 'Abstract of 111'
+        with open(files['pubmed_222'], encoding='utf-8') as f:
+            assert f.read() == 'Abstract of 222'
+    finally:
+        manager.close()
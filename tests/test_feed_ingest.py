@@ -0,0 +1,32 @@
+from src.feed_ingest import FeedIngestor
+from src.paper_manager import PaperManager
+
+
+class FakeSearcher:
+    def __init__(self):
+        self.looked_up = []
+
+    def fetch_crossref_works(self, dois):
+        self.looked_up.extend(dois)
+        return {}
+
+    def generate_unique_id(self, doi):
+        return doi.replace('/', '_')
+
+
+def test_lookup_matches_stored_doi_in_any_case(tmp_path):
+    manager = PaperManager(str(tmp_path / 'papers.db'))
+    try:
+        manager.add_papers([{'id': 'seeded', 'title': 'Seeded paper', 'doi': '10.1002/Anie.201912345',
+                             'api_source': 'crossref'}])
+        searcher = FakeSearcher()
+        ingestor = FeedIngestor(manager, paper_searcher=searcher)
+        entries = [{'doi': doi, 'title': f'Entry {doi}', 'authors': [], 'year': 2020, 'link': ''}
+                   for doi in ('10.1002/anie.201912345', '10.1000/new')]
+
+        papers = ingestor._lookup_papers(entries)
+
+        assert searcher.looked_up == ['10.1000/new']
+        assert [paper['doi'] for paper in papers] == ['10.1000/new']
+    finally:
+        manager.close()
@@ -0,0 +1,37 @@
+from src.job_queue import JobQueue
+from src.paper_manager import PaperManager
+
+
+def fail_job(queue, job_id):
+    queue.db.write(lambda conn: conn.execute("UPDATE jobs SET state = 'failed' WHERE id = ?", (job_id,)))
+
+
+def test_retry_failed_skips_jobs_already_queued_elsewhere(tmp_path):
+    manager = PaperManager(str(tmp_path / 'papers.db'))
+    try:
+        queue = JobQueue(manager.db)
+        old = queue.enqueue('download', {'paper_id': 'a'}, batch='old', dedupe_key='download:a')
+        other = queue.enqueue('download', {'paper_id': 'b'}, batch='old', dedupe_key='download:b')
+        fail_job(queue, old)
+        fail_job(queue, other)
+        # 同一篇论文的下载已在另一个批次中重新提交
+        queue.enqueue('download', {'paper_id': 'a'}, batch='new', dedupe_key='download:a')
+
+        assert queue.retry_failed('old') == 1
+        assert queue.batch_progress('old')['queued'] == 1
+        assert queue.batch_progress('old')['failed'] == 1
+    finally:
+        manager.close()
+
+
+def test_retry_failed_requeues_one_of_duplicate_failed_jobs(tmp_path):
+    manager = PaperManager(str(tmp_path / 'papers.db'))
+    try:
+        queue = JobQueue(manager.db)
+        for _ in range(2):
+            fail_job(queue, queue.enqueue('download', {'paper_id': 'a'}, batch='old', dedupe_key='download:a'))
+
+        assert queue.retry_failed('old') == 1
+        assert queue.retry_failed('old') == 0
+    finally:
+        manager.close()
@@ -0,0 +1,90 @@
+import requests
+from requests.exceptions import ConnectionError
+
+from src.paper_searcher import PaperSearcher
+
+ESEARCH = {'heart failure': ['1', '2'], 'sepsis': ['2', '3']}
+
+
+class FakeResponse:
+    def __init__(self, content=b'', json_data=None, status_code=200):
+        self.content = content
+        self.status_code = status_code
+        self._json = json_data
+
+    def json(self):
+        return self._json
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """按 URL 和参数模拟 E-utilities；fail 中的 ID efetch 时抛出连接错误"""
+
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = set(fail)
+
+    def get(self, url, params=None, **kwargs):
+        return self.request(url, dict(params))
+
+    def post(self, url, data=None, **kwargs):
+        return self.request(url, dict(data))
+
+    def request(self, url, params):
+        self.calls.append((url, params))
+        if url.endswith('esearch.fcgi'):
+            return FakeResponse(json_data={'esearchresult': {'idlist': ESEARCH[params['term']]}})
+        if url.endswith('elink.fcgi'):
+            return FakeResponse(b'<eLinkResult/>')
+        ids = params['id'].split(',')
+        if self.fail.intersection(ids):
+            raise ConnectionError('connection reset')
+        if params['db'] == 'pmc':
+            return FakeResponse(f"""<pmc-articleset><article article-type="research-article"><front><article-meta>
+                <article-title>PMC paper {ids[0]}</article-title></article-meta></front></article></pmc-articleset>
+                """.encode())
+        articles = ''.join(f"""<PubmedArticle><MedlineCitation><PMID>{pmid}</PMID><Article>
+            <ArticleTitle>PubMed paper {pmid}</ArticleTitle></Article></MedlineCitation></PubmedArticle>"""
+                           for pmid in ids)
+        return FakeResponse(f'<PubmedArticleSet>{articles}</PubmedArticleSet>'.encode())
+
+
+def make_searcher(tmp_path, monkeypatch, session):
+    def no_direct_request(*args, **kwargs):
+        raise AssertionError('E-utilities 请求应当经过 api_session')
+    monkeypatch.setattr(requests, 'get', no_direct_request)
+    monkeypatch.setattr(requests, 'post', no_direct_request)
+    searcher = PaperSearcher(str(tmp_path))
+    searcher.api_session = session
+    searcher.ncbi_limiter.acquire = lambda: None
+    return searcher
+
+
+def test_batch_requests_use_shared_session(tmp_path, monkeypatch):
+    session = FakeSession()
+    searcher = make_searcher(tmp_path, monkeypatch, session)
+    result = searcher.search_papers_batch(['heart failure', 'sepsis'], 'pubmed')
+    assert result['errors'] == {}
+    assert result['hits'] == {'heart failure': ['pubmed_1', 'pubmed_2'], 'sepsis': ['pubmed_2', 'pubmed_3']}
+    assert [paper['id'] for paper in result['papers']] == ['pubmed_1', 'pubmed_2', 'pubmed_3']
+    efetch = [params for url, params in session.calls if url.endswith('efetch.fcgi')]
+    assert len(efetch) == 1
+
+
+def test_failed_detail_fetch_is_reported_per_query(tmp_path, monkeypatch):
+    searcher = make_searcher(tmp_path, monkeypatch, FakeSession(fail={'3'}))
+    result = searcher.search_papers_batch(['heart failure', 'sepsis'], 'pmc')
+    assert result['hits'] == {'heart failure': ['pmc_1', 'pmc_2'], 'sepsis': ['pmc_2']}
+    assert list(result['errors']) == ['sepsis']
+    assert 'ConnectionError' in result['errors']['sepsis']
+    assert sorted(paper['id'] for paper in result['papers']) == ['pmc_1', 'pmc_2']
+
+
+def test_failed_efetch_chunk_keeps_other_chunks(tmp_path, monkeypatch):
+    searcher = make_searcher(tmp_path, monkeypatch, FakeSession(fail={'1'}))
+    failed = {}
+    papers = searcher.fetch_pubmed_details(['1', '2', '3'], batch_size=2, failed=failed)
+    assert [paper['pmid'] for paper in papers] == ['3']
+    assert set(failed) == {'1', '2'}
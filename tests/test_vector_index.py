@@ -0,0 +1,36 @@
+from src.library_io import main as library_io_main
+from src.paper_manager import PaperManager
+from src.vector_index import HashingEmbedding, VectorIndex
+
+
+def make_papers(ids):
+    return [{'id': paper_id, 'title': f'Paper {paper_id} on lung cancer', 'api_source': 'pubmed'} for paper_id in ids]
+
+
+def test_open_indexes_papers_added_without_index(tmp_path):
+    db_path = str(tmp_path / 'papers.db')
+    # 工作进程等没有向量索引的进程写入的论文
+    manager = PaperManager(db_path)
+    manager.add_papers(make_papers(['a', 'b']))
+    manager.close()
+
+    index = VectorIndex(str(tmp_path / 'vector_index'), backend=HashingEmbedding())
+    manager = PaperManager(db_path, vector_index=index)
+    try:
+        assert 'a' in index and 'b' in index
+        manager.add_papers(make_papers(['c']))
+        assert len(index) == 3
+        assert manager.index_missing_papers() == 0
+    finally:
+        manager.close()
+
+
+def test_reindex_command_rebuilds_index(tmp_path):
+    db_path = str(tmp_path / 'papers.db')
+    manager = PaperManager(db_path)
+    manager.add_papers(make_papers(['a', 'b', 'c']))
+    manager.close()
+
+    library_io_main(['reindex', '--db', db_path])
+    index = VectorIndex(str(tmp_path / 'vector_index'))
+    assert len(index) == 3